@@ -1,8 +1,10 @@
 """
 FastAPI Main Application
 """
-from fastapi import FastAPI
+import threading
+from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from api.models import HealthResponse
 from config.settings import settings
 from src.utils.logger import log
@@ -38,28 +40,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Include routers (lazy import to prevent startup delays)
-# Note: RAG endpoints will be loaded on first request
-_router_loaded = False
-
-async def load_router_on_demand():
-    """Load router on first request"""
-    global _router_loaded
-    if not _router_loaded:
-        try:
-            from api.routers import rag
-            app.include_router(rag.router)
-            _router_loaded = True
-            log.info("RAG router loaded successfully")
-        except Exception as e:
-            log.error(f"Failed to load RAG router: {e}")
-            log.warning("RAG API endpoints will not be available")
-
-# Add middleware to load router on first request
-@app.middleware("http")
-async def load_router_middleware(request, call_next):
-    await load_router_on_demand()
-    return await call_next(request)
+# Include routers once at import time
+rag = None
+try:
+    from api.routers import admin, rag, retrieval
+    app.include_router(rag.router)
+    # Lets this process act as the retrieval service for thin generation workers
+    # (disabled unless RETRIEVAL_SERVICE_KEY is set)
+    app.include_router(retrieval.router)
+    app.include_router(admin.router)
+    log.info("RAG router loaded successfully")
+except Exception as e:
+    log.error("Failed to load RAG router: {}", e)
+    log.warning("RAG API endpoints will not be available")
 
 
 @app.on_event("startup")
@@ -68,11 +61,27 @@ async def startup_event():
     try:
         log.info("=" * 50)
         log.info("Starting Hybrid RAG System API")
-        log.info(f"LLM Model: {settings.llm_model}")
-        log.info(f"Embedding Model: {settings.embedding_model}")
+        log.info("LLM Model: {}", settings.llm_model)
+        log.info("Embedding Model: {}", settings.embedding_model)
         log.info("=" * 50)
+        
+        if rag is None:
+            return
+        
+        if settings.warmup_on_startup:
+            # Load indexes in the background; /ready reports when done
+            threading.Thread(
+                target=rag.warmup,
+                name="rag-warmup",
+                daemon=True
+            ).start()
+        else:
+            rag.mark_ready()
+        
+        if settings.watch_folder_enabled:
+            rag.start_folder_watcher()
     except Exception as e:
-        log.error(f"Error during startup: {e}")
+        log.error("Error during startup: {}", e)
         raise
 
 
@@ -80,6 +89,8 @@ async def startup_event():
 async def shutdown_event():
     """Run on application shutdown"""
     log.info("Shutting down Hybrid RAG System API")
+    if rag is not None:
+        rag.stop_folder_watcher()
 
 
 @app.get("/", response_model=HealthResponse)
@@ -100,6 +111,28 @@ async def health_check():
     )
 
 
+@app.get("/ready", response_model=HealthResponse)
+async def readiness_check():
+    """Readiness probe: 200 only once indexes are loaded and warmed up"""
+    if rag is not None and rag.is_ready():
+        return HealthResponse(
+            status="ready",
+            message="Indexes are loaded and warmed up"
+        )
+    
+    if rag is None:
+        message = "RAG router failed to load"
+    elif rag.get_warmup_error():
+        message = f"Warmup failed: {rag.get_warmup_error()}"
+    else:
+        message = "Warmup in progress"
+    
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=HealthResponse(status="not_ready", message=message).model_dump()
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -10,6 +10,13 @@ class QueryRequest(BaseModel):
     question: str = Field(..., description="User question", min_length=1)
     top_k: Optional[int] = Field(default=5, description="Number of chunks to retrieve", ge=1, le=20)
     include_sources: bool = Field(default=True, description="Include source information")
+    tenant: Optional[str] = Field(default=None, description="Tenant corpus to search (default corpus when omitted)")
+    deadline_ms: Optional[int] = Field(
+        default=None,
+        description="End-to-end time budget in milliseconds (QUERY_DEADLINE_SECONDS when omitted)",
+        ge=100,
+        le=600000
+    )
 
 
 class SourceInfo(BaseModel):
@@ -25,6 +32,8 @@ class QueryResponse(BaseModel):
     confidence: float = Field(..., ge=0.0, le=1.0)
     retrieved_chunks: int
     model: str
+    degraded: bool = Field(default=False, description="Answer extracted from the documents instead of generated")
+    degraded_reason: Optional[str] = Field(default=None, description="deadline, timeout, provider_unavailable or provider_error")
 
 
 class HealthResponse(BaseModel):
@@ -43,7 +52,9 @@ class StatsResponse(BaseModel):
 
 class ReindexRequest(BaseModel):
     """Request model for reindexing"""
-    reset_existing: bool = Field(default=False, description="Reset existing index")
+    reset_existing: bool = Field(default=False, description="Rebuild from scratch into a new index generation")
+    tenant: Optional[str] = Field(default=None, description="Tenant corpus to reindex (default corpus when omitted)")
+    resume: bool = Field(default=True, description="Continue an interrupted reindex from its checkpoint")
 
 
 class ReindexResponse(BaseModel):
@@ -52,3 +63,92 @@ class ReindexResponse(BaseModel):
     message: str
     total_documents: int
     total_chunks: int
+    duplicates_removed: int = 0
+    generation: Optional[int] = None
+    resumed: bool = False
+
+
+class ReindexCheckpointResponse(BaseModel):
+    """Progress of an interrupted reindex"""
+    tenant: str
+    reset_existing: bool
+    attempts: int
+    documents_parsed: int
+    chunks_embedded: int
+    completed_indexes: List[str] = Field(description="Indexes fully written (dense, sparse)")
+    generation: Optional[int] = Field(default=None, description="Index generation a full rebuild is writing into")
+    updated_at: Optional[float] = None
+
+
+class GenerationResponse(BaseModel):
+    """Response model for index generation switches"""
+    status: str
+    message: str
+    generation: int
+
+
+class DocumentUpdateResponse(BaseModel):
+    """Response model for single-document updates and deletes"""
+    status: str
+    message: str
+    file_name: str
+    total_chunks: int
+
+
+class SearchRequest(BaseModel):
+    """Request model for retrieval-only search"""
+    query: str = Field(..., description="Search query", min_length=1)
+    top_k: Optional[int] = Field(default=None, description="Number of results (TOP_K_FINAL when omitted)", ge=1, le=100)
+    offset: int = Field(default=0, description="Number of top results to skip", ge=0, le=1000)
+    include_text: bool = Field(default=True, description="Include chunk text")
+    depth: Optional[int] = Field(default=None, description="Candidates per retrieval leg (at least offset + top_k)", ge=1, le=1100)
+    tenant: Optional[str] = Field(default=None, description="Tenant corpus to search (default corpus when omitted)")
+
+
+class BatchSearchRequest(BaseModel):
+    """Request model for searching several queries in one call"""
+    queries: List[str] = Field(..., description="Search queries", min_length=1)
+    top_k: Optional[int] = Field(default=None, description="Number of results per query", ge=1, le=100)
+    offset: int = Field(default=0, description="Number of top results to skip", ge=0, le=1000)
+    include_text: bool = Field(default=True, description="Include chunk text")
+    depth: Optional[int] = Field(default=None, description="Candidates per retrieval leg (at least offset + top_k)", ge=1, le=1100)
+    tenant: Optional[str] = Field(default=None, description="Tenant corpus to search (default corpus when omitted)")
+
+
+class SearchResponse(BaseModel):
+    """Ranked chunks with text, metadata and scores"""
+    results: List[Dict]
+    next_offset: Optional[int] = Field(default=None, description="Offset of the next page (/api/v1/search); null on the last page")
+
+
+class BatchSearchResponse(BaseModel):
+    """One ranked result list per query, in request order"""
+    results: List[List[Dict]]
+
+
+class ProfileRequest(BaseModel):
+    """Request model for starting a profiling session"""
+    requests: Optional[int] = Field(default=None, description="Profile the next N requests", ge=1)
+    seconds: Optional[float] = Field(default=None, description="Profile every request for this many seconds", gt=0)
+    deterministic: bool = Field(default=True, description="cProfile the profiled requests (pstats output)")
+    sampling: bool = Field(default=True, description="Sample their stacks (collapsed stacks for flame graphs)")
+    memory: bool = Field(default=False, description="Trace allocations with tracemalloc while the session runs")
+    sample_interval_ms: float = Field(default=5.0, description="Stack sampling interval", ge=1, le=1000)
+
+
+class ProfileStatusResponse(BaseModel):
+    """State and summary of the current or most recent profiling session"""
+    pid: int  # Worker process the session runs in
+    finished: bool
+    started_at: float
+    finished_at: Optional[float]
+    requests: Optional[int]
+    seconds: Optional[float]
+    deterministic: bool
+    sampling: bool
+    memory: bool
+    admitted: int
+    captured: int
+    cpu_seconds: float
+    samples: int
+    memory_stats: Optional[Dict]
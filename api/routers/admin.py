@@ -0,0 +1,132 @@
+"""
+Admin Router
+
+Operational endpoints, enabled only when ADMIN_API_KEY is set and called
+with that key in the X-Admin-Key header
+"""
+import os
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from api.models import ProfileRequest, ProfileStatusResponse
+from config.settings import settings
+from src.utils import profiling
+from src.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+
+def require_admin(x_admin_key: Optional[str] = Header(default=None)):
+    """404 while admin endpoints are disabled, 401 for a missing or wrong key"""
+    if not settings.admin_api_key:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Admin endpoints are disabled (ADMIN_API_KEY is not set)"
+        )
+    if not x_admin_key or not secrets.compare_digest(x_admin_key, settings.admin_api_key):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin key"
+        )
+
+
+router = APIRouter(prefix="/admin/v1", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+def _session(finished: bool = False) -> profiling.ProfileSession:
+    session = profiling.last_session()
+    if session is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No profiling session has been started in this worker (pid {os.getpid()})"
+        )
+    if finished and not session.finished:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Profiling session is still running in this worker (pid {session.pid}); wait for it or stop it first"
+        )
+    return session
+
+
+@router.post("/profile", response_model=ProfileStatusResponse)
+async def start_profiling(request: ProfileRequest):
+    """
+    Profile the next N query/search requests, or all of them for a time window
+    
+    - **requests**: Number of requests to profile
+    - **seconds**: Time window (also bounds a request-count session; PROFILING_MAX_SECONDS when omitted)
+    - **deterministic**: cProfile the profiled requests
+    - **sampling**: Sample their stacks for flame graphs
+    - **memory**: Trace allocations with tracemalloc
+    
+    The session runs in the worker that receives this call and profiles only
+    the requests that worker serves; the response's pid names the worker.
+    """
+    if not request.requests and not request.seconds:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Give requests, seconds or both"
+        )
+    if (request.requests or 0) > settings.profiling_max_requests or (request.seconds or 0) > settings.profiling_max_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.profiling_max_requests} requests and {settings.profiling_max_seconds:g} seconds"
+        )
+    try:
+        session = profiling.start(
+            requests=request.requests,
+            seconds=request.seconds or settings.profiling_max_seconds,
+            deterministic=request.deterministic,
+            sampling=request.sampling,
+            memory=request.memory,
+            sample_interval=request.sample_interval_ms / 1000
+        )
+    except profiling.ProfilingBusy as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    log.info("Profiling started in worker {}: {}", session.pid, request.model_dump())
+    return ProfileStatusResponse(**session.get_stats())
+
+
+@router.get("/profile", response_model=ProfileStatusResponse)
+async def get_profiling_status():
+    """State of the running or most recent session, with its memory summary"""
+    return ProfileStatusResponse(**_session().get_stats())
+
+
+@router.delete("/profile", response_model=ProfileStatusResponse)
+async def stop_profiling():
+    """End the running session early, keeping what it captured"""
+    profiling.stop()
+    return ProfileStatusResponse(**_session().get_stats())
+
+
+@router.get("/profile/pstats")
+async def download_pstats():
+    """cProfile statistics of a finished session in the pstats file format"""
+    data = _session(finished=True).pstats_bytes()
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The session captured no cProfile data"
+        )
+    return Response(
+        content=data,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="profile-{os.getpid()}.pstats"'}
+    )
+
+
+@router.get("/profile/report")
+async def pstats_report(limit: int = 40, sort: str = "cumulative"):
+    """Top functions of a finished session as text"""
+    try:
+        report = _session(finished=True).pstats_text(limit=limit, sort=sort)
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown sort key: {sort}")
+    return Response(content=report, media_type="text/plain")
+
+
+@router.get("/profile/collapsed")
+async def collapsed_stacks():
+    """Sampled stacks of a finished session in collapsed format (flamegraph.pl, speedscope)"""
+    return Response(content=_session(finished=True).collapsed(), media_type="text/plain")
@@ -1,60 +1,251 @@
 """
 RAG API Router
 """
-from fastapi import APIRouter, HTTPException, status
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+from fastapi import APIRouter, Header, HTTPException, status
 from fastapi.concurrency import run_in_threadpool
 from api.models import (
     QueryRequest, QueryResponse,
-    StatsResponse, ReindexRequest, ReindexResponse
+    SearchRequest, SearchResponse, BatchSearchRequest,
+    StatsResponse, ReindexRequest, ReindexResponse, ReindexCheckpointResponse,
+    DocumentUpdateResponse, GenerationResponse
 )
-from src.generation.rag_chain import RAGChain
-from src.core.document_loader import DocumentLoader
-from src.core.semantic_chunker import SemanticChunker
-from src.utils.logger import log
+from config.settings import settings
+from src.utils import admission, deadline, profiling
+from src.utils.logger import get_logger
+from src.utils.singleflight import SingleFlight, WaitTimeout
+
+# Heavy modules are imported where they are used: the query path
+# (chromadb, openai) loads during warmup, the ingestion path
+# (python-docx, text splitting) only when reindexing.
+
+log = get_logger(__name__)
 
 router = APIRouter(prefix="/api/v1", tags=["RAG"])
 
-# Global RAG chain instance (lazy loading)
+# Global RAG chain instance (built by warmup or on first use)
 _rag_chain = None
+_rag_chain_lock = threading.Lock()
+
+# Readiness state set once warmup has finished
+_ready = threading.Event()
+_warmup_error = None
+
+# Identical searches in flight at the same time share one retrieval
+_search_inflight = SingleFlight()
+
+# Watcher of data/raw/ in the one worker that owns it (WATCH_FOLDER_ENABLED)
+_folder_watcher = None
+_folder_watcher_lock = None
+
 
 def get_rag_chain():
-    """Get or initialize RAG chain (lazy loading)"""
+    """Get or initialize RAG chain (thread-safe)"""
     global _rag_chain
     if _rag_chain is None:
-        log.info("Initializing RAG chain...")
-        _rag_chain = RAGChain()
-        log.info("RAG chain initialized successfully")
+        with _rag_chain_lock:
+            if _rag_chain is None:
+                from src.generation.rag_chain import RAGChain
+                
+                log.info("Initializing RAG chain...")
+                _rag_chain = RAGChain()
+                log.info("RAG chain initialized successfully")
     return _rag_chain
 
 
-def _perform_reindexing(reset_existing: bool):
+def warmup():
+    """
+    Build the RAG chain and load both indexes, then mark the worker ready
+    
+    A failed attempt (index files still being written, a retrieval service
+    not up yet) is retried with exponential backoff, so the worker turns
+    ready once the cause goes away instead of failing /ready for good.
+    """
+    global _warmup_error
+    delay = settings.warmup_retry_seconds
+    attempt = 1
+    while True:
+        try:
+            log.info("Warming up RAG chain...")
+            get_rag_chain().warmup()
+            _warmup_error = None
+            _ready.set()
+            log.info("Worker is ready to serve traffic")
+            return
+        except Exception as e:
+            _warmup_error = str(e)
+            log.error("Warmup attempt {} failed: {}; retrying in {:.0f}s", attempt, e, delay)
+        time.sleep(delay)
+        delay = min(delay * 2, settings.warmup_retry_max_seconds)
+        attempt += 1
+
+
+def mark_ready():
+    """Mark the worker ready without warming up (lazy initialization)"""
+    _ready.set()
+
+
+def is_ready() -> bool:
+    """Whether warmup has completed"""
+    return _ready.is_set()
+
+
+def get_warmup_error():
+    """Error message from the last failed warmup, if any"""
+    return _warmup_error
+
+
+@contextmanager
+def tenant_errors():
+    """Report invalid tenants as 400 and unknown tenants as 404"""
+    from src.retrieval.tenants import InvalidTenantError, UnknownTenantError
+    
+    try:
+        yield
+    except InvalidTenantError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except UnknownTenantError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.args[0])
+
+
+def get_tenant_retriever(tenant: Optional[str]):
+    """Retriever of a tenant's corpus; 400 for invalid and 404 for unknown tenants"""
+    with tenant_errors():
+        return get_rag_chain().tenants.get(tenant)
+
+
+def require_local_indexes():
+    """Index management needs the indexes in this process, not behind RETRIEVAL_SERVICE_URL"""
+    if settings.retrieval_service_url:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Indexes are served by the retrieval service at {settings.retrieval_service_url}; "
+                   f"send this request there"
+        )
+
+
+def _tenant_data_path(tenant: Optional[str]) -> Path:
+    from src.retrieval.tenants import tenant_paths
+    
+    return Path(tenant_paths(tenant).data_path)
+
+
+def _perform_reindexing(reset_existing: bool, tenant: Optional[str] = None, resume: bool = True):
     """Synchronous reindexing function to be run in a thread"""
-    rag_chain = get_rag_chain()
+    # Embedding calls queue behind interactive queries
+    with admission.priority(admission.BATCH):
+        return _reindex(reset_existing, tenant, resume)
+
+
+def _reindex(reset_existing: bool, tenant: Optional[str], resume: bool = True):
+    from src.core.ingestion import IngestionBusy, NoDocumentsError, run_ingestion
     
-    # Reset if requested
-    if reset_existing:
-        rag_chain.retriever.reset()
-        log.info("Existing index reset")
+    retriever = get_tenant_retriever(tenant)
+    try:
+        # Checkpointed: a failed run continues where it stopped on the next call
+        return run_ingestion(retriever, tenant, reset_existing=reset_existing, resume=resume)
+    except NoDocumentsError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except IngestionBusy as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+def _validate_file_name(file_name: str):
+    from src.core.document_loader import SUPPORTED_EXTENSIONS
     
-    # Load documents
-    loader = DocumentLoader()
-    docs = loader.load_all_documents()
+    if Path(file_name).name != file_name or Path(file_name).suffix.lower() not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid document name: {file_name}"
+        )
+
+
+def _perform_document_update(file_name: str, tenant: Optional[str] = None) -> int:
+    """Reload one document from the data directory and swap its chunks into the index"""
+    with admission.priority(admission.BATCH):
+        return _update_document(file_name, tenant)
+
+
+def _update_document(file_name: str, tenant: Optional[str]) -> int:
+    from src.core.document_loader import DocumentLoader
+    from src.core.semantic_chunker import SemanticChunker
+    from src.core.deduplicator import ChunkDeduplicator
     
-    if not docs:
+    retriever = get_tenant_retriever(tenant)
+    file_path = _tenant_data_path(tenant) / file_name
+    if not file_path.exists():
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="No documents found in data/raw/ directory"
+            detail=f"Document not found in {file_path.parent}/: {file_name}"
         )
     
-    # Chunk documents
-    chunker = SemanticChunker()
-    chunks = chunker.chunk_documents(docs)
+    doc = DocumentLoader().load_document(str(file_path))
+    if doc is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Failed to parse document: {file_name}"
+        )
     
-    # Index chunks
-    rag_chain.retriever.index_chunks(chunks)
+    chunks = SemanticChunker().chunk_documents([doc])
+    if settings.dedup_enabled:
+        chunks = ChunkDeduplicator().deduplicate_chunks(chunks)
     
-    log.info(f"Reindexing completed: {len(docs)} documents, {len(chunks)} chunks")
-    return len(docs), len(chunks)
+    retriever.upsert_document(file_name, chunks)
+    return len(chunks)
+
+
+def _apply_watched_document(file_name: str, exists: bool):
+    """Index a document added or changed in data/raw/, or remove a deleted one"""
+    if exists:
+        total_chunks = _perform_document_update(file_name)
+        log.info("Indexed watched document {}: {} chunks", file_name, total_chunks)
+    else:
+        deleted = get_tenant_retriever(None).delete_document(file_name)
+        log.info("Removed watched document {}: {} chunks", file_name, deleted)
+
+
+def start_folder_watcher():
+    """Watch data/raw/ in this worker unless another worker already does"""
+    global _folder_watcher, _folder_watcher_lock
+    from src.core.folder_watcher import FolderWatcher, acquire_owner_lock
+    
+    if settings.retrieval_service_url:
+        log.warning("WATCH_FOLDER_ENABLED is ignored: indexes are served by the retrieval service")
+        return
+    index_dir = Path(settings.bm25_index_path).parent
+    lock_path = index_dir / "watch_folder.lock"
+    _folder_watcher_lock = acquire_owner_lock(str(lock_path))
+    if _folder_watcher_lock is None:
+        log.info("Another worker is watching the document folder")
+        return
+    
+    _folder_watcher = FolderWatcher(
+        settings.data_raw_path,
+        _apply_watched_document,
+        debounce=settings.watch_folder_debounce_seconds,
+        max_delay=settings.watch_folder_max_delay_seconds,
+        max_batch=settings.watch_folder_max_batch,
+        poll_interval=settings.watch_folder_poll_interval,
+        force_polling=settings.watch_folder_force_polling,
+        state_path=str(index_dir / "watch_folder.json"),
+        indexed=lambda: get_tenant_retriever(None).sources()
+    )
+    _folder_watcher.start()
+
+
+def stop_folder_watcher():
+    """Stop the watcher and release the folder to another worker"""
+    global _folder_watcher, _folder_watcher_lock
+    if _folder_watcher is not None:
+        _folder_watcher.stop()
+        _folder_watcher = None
+    if _folder_watcher_lock is not None:
+        _folder_watcher_lock.close()
+        _folder_watcher_lock = None
 
 
 @router.post("/query", response_model=QueryResponse)
@@ -65,37 +256,169 @@ async def query_documents(request: QueryRequest):
     - **question**: The question to ask
     - **top_k**: Number of relevant chunks to retrieve (1-20)
     - **include_sources**: Whether to include source citations
+    - **tenant**: Tenant corpus to search (default corpus when omitted)
+    - **deadline_ms**: End-to-end time budget; past it the answer is extracted, not generated
     """
+    # The budget starts when the request arrives, not when a worker picks it up
+    budget = request.deadline_ms / 1000 if request.deadline_ms else settings.query_deadline_seconds
+    expires_at = deadline.after(budget)
+    
     try:
-        log.info(f"API Query received: {request.question}")
+        log.info("API query received ({} chars)", len(request.question))
         
         rag_chain = get_rag_chain()
-        result = rag_chain.query(
-            question=request.question,
-            top_k=request.top_k,
-            include_sources=request.include_sources
-        )
+        await run_in_threadpool(get_tenant_retriever, request.tenant)
         
-        return QueryResponse(**result)
+        # Run in a worker thread so concurrent identical queries can coalesce
+        with tenant_errors():
+            result = await run_in_threadpool(
+                profiling.profiled(rag_chain.query),
+                question=request.question,
+                top_k=request.top_k,
+                include_sources=request.include_sources,
+                tenant=request.tenant,
+                deadline=expires_at
+            )
         
+        return QueryResponse(**result)
+    
+    except HTTPException:
+        raise
+    except deadline.DeadlineExceeded as e:
+        log.warning("Query deadline exceeded: {}", e)
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Query deadline exceeded: {str(e)}"
+        )
+    except admission.AdmissionRejected as e:
+        log.warning("Query rejected by admission control: {}", e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Server is overloaded: {str(e)}",
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
     except Exception as e:
-        log.error(f"Error processing query: {e}")
+        log.error("Error processing query: {}", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing query: {str(e)}"
         )
 
 
+def _search_batch(
+    request: Union[SearchRequest, BatchSearchRequest],
+    queries: List[str],
+    expires_at: Optional[float]
+) -> List[List[Dict]]:
+    retriever = get_tenant_retriever(request.tenant)
+    try:
+        with deadline.scope(expires_at):
+            return retriever.search_batch(
+                queries,
+                top_k=request.top_k,
+                offset=request.offset,
+                include_text=request.include_text,
+                depth=request.depth
+            )
+    finally:
+        get_rag_chain().tenants.enforce_budget(keep=request.tenant)
+
+
+def _coalesced_search(
+    request: Union[SearchRequest, BatchSearchRequest],
+    queries: List[str],
+    expires_at: Optional[float]
+) -> List[List[Dict]]:
+    if not settings.query_coalescing_enabled:
+        return _search_batch(request, queries, expires_at)
+    
+    key = (request.tenant, tuple(queries), request.top_k, request.offset, request.include_text, request.depth)
+    left = None if expires_at is None else expires_at - time.monotonic()
+    try:
+        return _search_inflight.do(key, lambda: _search_batch(request, queries, expires_at), timeout=left)
+    except WaitTimeout:
+        # This request's budget ran out first; search on its own (the dense leg is skipped)
+        return _search_batch(request, queries, expires_at)
+
+
+async def run_search(
+    request: Union[SearchRequest, BatchSearchRequest],
+    queries: List[str],
+    expires_at: Optional[float]
+) -> List[List[Dict]]:
+    """Search several queries of one tenant, with the errors of the search endpoints mapped to HTTP"""
+    try:
+        with tenant_errors():
+            return await run_in_threadpool(profiling.profiled(_coalesced_search), request, queries, expires_at)
+    except HTTPException:
+        raise
+    except deadline.DeadlineExceeded as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    except admission.AdmissionRejected as e:
+        log.warning("Search rejected by admission control: {}", e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Server is overloaded: {str(e)}",
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+    except Exception as e:
+        log.error("Error during search: {}", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error during search: {str(e)}"
+        )
+
+
+@router.post("/search", response_model=SearchResponse)
+async def search_documents(request: SearchRequest, x_deadline_ms: Optional[int] = Header(default=None)):
+    """
+    Ranked chunks without answer generation, one page at a time
+    
+    - **query**: Search query
+    - **top_k**: Results per page (1-100)
+    - **offset**: Number of top results to skip; use next_offset for the next page
+    - **include_text**: Include chunk text (metadata, RRF score and per-leg ranks only otherwise)
+    - **depth**: Candidates per retrieval leg (SEARCH_MAX_DEPTH when omitted); caps offset + top_k
+    - **tenant**: Tenant corpus to search (default corpus when omitted)
+    
+    Every page is cut from the ranking of the same depth, so pages neither
+    repeat nor skip chunks.
+    """
+    top_k = request.top_k or settings.top_k_final
+    depth = request.depth or settings.search_max_depth
+    if request.offset + top_k > depth:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"offset + top_k must not exceed the search depth ({depth})"
+        )
+    
+    # One extra result only tells whether a next page exists
+    page = request.model_copy(update={"top_k": top_k + 1, "depth": depth})
+    expires_at = deadline.after(x_deadline_ms / 1000 if x_deadline_ms else None)
+    results = (await run_search(page, [request.query], expires_at))[0]
+    
+    has_more = len(results) > top_k
+    return SearchResponse(
+        results=results[:top_k],
+        next_offset=request.offset + top_k if has_more else None
+    )
+
+
 @router.get("/stats", response_model=StatsResponse)
-async def get_statistics():
+async def get_statistics(tenant: Optional[str] = None):
     """
     Get system statistics
     
     Returns information about indexed documents and retrieval performance
+    (of one tenant's corpus when tenant is given)
     """
     try:
         rag_chain = get_rag_chain()
-        retrieval_stats = rag_chain.get_retriever_stats()
+        await run_in_threadpool(get_tenant_retriever, tenant)
+        with tenant_errors():
+            retrieval_stats = await run_in_threadpool(rag_chain.get_retriever_stats, tenant)
+        if _folder_watcher is not None and tenant is None:
+            retrieval_stats["watcher"] = _folder_watcher.get_stats()
         
         return StatsResponse(
             total_documents=retrieval_stats.get("dense", {}).get("total_chunks", 0),
@@ -103,9 +426,11 @@ async def get_statistics():
             sparse_chunks=retrieval_stats.get("sparse", {}).get("total_chunks", 0),
             retrieval_stats=retrieval_stats
         )
-        
+    
+    except HTTPException:
+        raise
     except Exception as e:
-        log.error(f"Error getting statistics: {e}")
+        log.error("Error getting statistics: {}", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error getting statistics: {str(e)}"
@@ -117,29 +442,156 @@ async def reindex_documents(request: ReindexRequest):
     """
     Reindex all documents
     
-    - **reset_existing**: If true, clears existing index before reindexing
+    - **reset_existing**: If true, builds a fresh index generation and switches to it
+      once complete (the live index keeps serving; the old one is kept for rollback)
+    - **tenant**: Tenant corpus to reindex from its own data directory
+    - **resume**: Continue an interrupted reindex with the same parameters from its
+      checkpoint (false discards it and starts over)
     """
+    require_local_indexes()
     try:
         log.info("Starting reindexing process...")
         
         # Run heavy reindexing logic in a separate thread
-        total_docs, total_chunks = await run_in_threadpool(
+        result = await run_in_threadpool(
             _perform_reindexing, 
-            reset_existing=request.reset_existing
+            reset_existing=request.reset_existing,
+            tenant=request.tenant,
+            resume=request.resume
         )
         
         return ReindexResponse(
             status="success",
-            message="Documents reindexed successfully",
-            total_documents=total_docs,
-            total_chunks=total_chunks
+            message="Documents reindexed successfully" + (" (resumed from checkpoint)" if result.resumed else ""),
+            total_documents=result.documents,
+            total_chunks=result.chunks,
+            duplicates_removed=result.duplicates_removed,
+            generation=result.generation,
+            resumed=result.resumed
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.error("Error during reindexing: {}", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error during reindexing: {str(e)}; call reindex again to resume from the checkpoint"
         )
+
+
+@router.get("/reindex/checkpoint", response_model=ReindexCheckpointResponse)
+async def get_reindex_checkpoint(tenant: Optional[str] = None):
+    """
+    Progress of an interrupted reindex that the next reindex call would resume
+    """
+    require_local_indexes()
+    from src.core.ingestion import checkpoint_status
+    
+    with tenant_errors():
+        progress = await run_in_threadpool(checkpoint_status, tenant)
+    if progress is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No interrupted reindex to resume"
+        )
+    return ReindexCheckpointResponse(
+        tenant=progress["params"]["tenant"],
+        reset_existing=progress["params"]["reset_existing"],
+        attempts=progress["attempts"],
+        documents_parsed=progress["documents_parsed"],
+        chunks_embedded=progress["chunks_embedded"],
+        completed_indexes=sorted(progress["stages"]),
+        generation=progress["generation"],
+        updated_at=progress["updated_at"]
+    )
+
+
+@router.post("/reindex/rollback", response_model=GenerationResponse)
+async def rollback_index(tenant: Optional[str] = None):
+    """
+    Switch serving back to the index generation replaced by the last full reindex
+    """
+    require_local_indexes()
+    retriever = await run_in_threadpool(get_tenant_retriever, tenant)
+    try:
+        generation = await run_in_threadpool(retriever.rollback)
         
+        return GenerationResponse(
+            status="success",
+            message="Rolled back to the previous index generation",
+            generation=generation
+        )
+    
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except Exception as e:
+        log.error("Error during rollback: {}", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error during rollback: {str(e)}"
+        )
+
+
+@router.post("/documents/{file_name}", response_model=DocumentUpdateResponse)
+async def update_document(file_name: str, tenant: Optional[str] = None):
+    """
+    Add or update a single document from data/raw/ (or the tenant's data directory)
+    
+    Only this document's chunks are re-embedded and replaced in the index
+    """
+    require_local_indexes()
+    _validate_file_name(file_name)
+    try:
+        total_chunks = await run_in_threadpool(_perform_document_update, file_name, tenant)
+        
+        return DocumentUpdateResponse(
+            status="success",
+            message="Document indexed successfully",
+            file_name=file_name,
+            total_chunks=total_chunks
+        )
+    
     except HTTPException:
         raise
     except Exception as e:
-        log.error(f"Error during reindexing: {e}")
+        log.error("Error updating document {}: {}", file_name, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error updating document: {str(e)}"
+        )
+
+
+@router.delete("/documents/{file_name}", response_model=DocumentUpdateResponse)
+async def delete_document(file_name: str, tenant: Optional[str] = None):
+    """
+    Remove a single document from the index
+    """
+    require_local_indexes()
+    _validate_file_name(file_name)
+    retriever = await run_in_threadpool(get_tenant_retriever, tenant)
+    try:
+        deleted = await run_in_threadpool(retriever.delete_document, file_name)
+    
+    except Exception as e:
+        log.error("Error deleting document {}: {}", file_name, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error during reindexing: {str(e)}"
+            detail=f"Error deleting document: {str(e)}"
         )
+    
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Document not indexed: {file_name}"
+        )
+    
+    return DocumentUpdateResponse(
+        status="success",
+        message="Document deleted successfully",
+        file_name=file_name,
+        total_chunks=deleted
+    )
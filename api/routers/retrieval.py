@@ -0,0 +1,94 @@
+"""
+Retrieval Service Router
+
+Serves HybridRetriever search to thin generation workers that run with
+RETRIEVAL_SERVICE_URL pointing here. Enabled only when RETRIEVAL_SERVICE_KEY
+is set; callers send that key in the X-Retrieval-Key header.
+"""
+import secrets
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from api.models import BatchSearchRequest, BatchSearchResponse, SearchRequest, SearchResponse
+from api.routers import rag
+from config.settings import settings
+from src.utils import deadline
+from src.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+
+def require_service_key(x_retrieval_key: Optional[str] = Header(default=None)):
+    """404 while the retrieval service is disabled, 401 for a missing or wrong key"""
+    if not settings.retrieval_service_key:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Retrieval service endpoints are disabled (RETRIEVAL_SERVICE_KEY is not set)"
+        )
+    if not x_retrieval_key or not secrets.compare_digest(x_retrieval_key, settings.retrieval_service_key):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid retrieval service key"
+        )
+
+
+router = APIRouter(prefix="/retrieval/v1", tags=["Retrieval"], dependencies=[Depends(require_service_key)])
+
+
+async def _run_search(
+    request: Union[SearchRequest, BatchSearchRequest],
+    queries: List[str],
+    deadline_ms: Optional[int]
+) -> List[List[dict]]:
+    # A worker that itself uses a retrieval service must not forward searches
+    rag.require_local_indexes()
+    # The caller's remaining budget counts from when the request arrived
+    expires_at = deadline.after(deadline_ms / 1000 if deadline_ms else None)
+    return await rag.run_search(request, queries, expires_at)
+
+
+@router.post("/search", response_model=SearchResponse)
+async def search(request: SearchRequest, x_deadline_ms: Optional[int] = Header(default=None)):
+    """
+    Hybrid search without answer generation
+    
+    - **query**: Search query
+    - **top_k**: Number of results
+    - **offset**: Number of top results to skip
+    - **include_text**: Include chunk text
+    - **depth**: Candidates per retrieval leg
+    - **tenant**: Tenant corpus to search (default corpus when omitted)
+    """
+    results = await _run_search(request, [request.query], x_deadline_ms)
+    return SearchResponse(results=results[0])
+
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_batch(request: BatchSearchRequest, x_deadline_ms: Optional[int] = Header(default=None)):
+    """
+    Hybrid search for several queries; dense queries share one embedding call
+    """
+    if len(request.queries) > settings.retrieval_batch_max_queries:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.retrieval_batch_max_queries} queries per batch"
+        )
+    results = await _run_search(request, request.queries, x_deadline_ms)
+    return BatchSearchResponse(results=results)
+
+
+@router.get("/stats")
+async def get_statistics(tenant: Optional[str] = None):
+    """Index statistics of one tenant's corpus and of the tenant registry"""
+    rag.require_local_indexes()
+    retriever = await run_in_threadpool(rag.get_tenant_retriever, tenant)
+    try:
+        stats = await run_in_threadpool(retriever.get_stats)
+        stats["tenants"] = rag.get_rag_chain().tenants.get_stats()
+        return stats
+    except Exception as e:
+        log.error("Error getting statistics: {}", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error getting statistics: {str(e)}"
+        )
@@ -0,0 +1,245 @@
+"""
+Recall/latency sweep over HNSW parameters for the dense index
+
+Loads the embeddings of a Chroma collection, holds out a sample of them as
+queries and computes their exact top-k neighbours by brute force. Then it
+builds an HNSW index for every (M, construction_ef) pair with hnswlib, the
+library Chroma uses for its index, and queries it once per search_ef. The
+report gives recall@k, p50/p99 query latency, build time and index size,
+and picks the cheapest configuration that meets the recall target.
+
+Usage:
+    python -m benchmarks.hnsw_sweep
+    python -m benchmarks.hnsw_sweep --collection documents --queries 200 --k 10 \\
+        --m 8 16 32 --construction-ef 64 100 200 --search-ef 10 32 64 128 --target-recall 0.95
+    python -m benchmarks.hnsw_sweep --synthetic 20000 --dim 256
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from itertools import product
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_collection_embeddings(persist_directory: str, collection_name: str, page_size: int = 5000) -> np.ndarray:
+    """All embeddings of a Chroma collection, read in pages"""
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+
+    client = chromadb.PersistentClient(
+        path=persist_directory,
+        settings=ChromaSettings(anonymized_telemetry=False)
+    )
+    collection = client.get_collection(name=collection_name)
+    pages = []
+    for offset in range(0, collection.count(), page_size):
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+    if not pages:
+        raise RuntimeError(f"Collection {collection_name} is empty")
+    return np.vstack(pages)
+
+
+def synthetic_embeddings(count: int, dim: int, clusters: int = 50, seed: int = 0) -> np.ndarray:
+    """Clustered random vectors, for trying the tool without an index"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, size=count)
+    return (centers[labels] + rng.normal(scale=0.5, size=(count, dim))).astype(np.float32)
+
+
+def split_queries(vectors: np.ndarray, num_queries: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Hold out num_queries vectors as queries; the rest is indexed"""
+    num_queries = min(num_queries, len(vectors) // 10 or 1)
+    order = np.random.default_rng(seed).permutation(len(vectors))
+    return vectors[order[num_queries:]], vectors[order[:num_queries]]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def exact_neighbors(base: np.ndarray, queries: np.ndarray, k: int, batch_size: int = 256) -> np.ndarray:
+    """Brute-force cosine top-k ids of every query (the ground truth)"""
+    base = _normalize(base)
+    queries = _normalize(queries)
+    k = min(k, len(base))
+    truth = []
+    for start in range(0, len(queries), batch_size):
+        scores = queries[start:start + batch_size] @ base.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        truth.append(np.take_along_axis(top, order, axis=1))
+    return np.vstack(truth)
+
+
+def build_index(base: np.ndarray, m: int, construction_ef: int, threads: int):
+    """Build a cosine HNSW index; returns (index, build seconds, size in bytes)"""
+    import hnswlib
+
+    index = hnswlib.Index(space="cosine", dim=base.shape[1])
+    started = time.perf_counter()
+    index.init_index(max_elements=len(base), ef_construction=construction_ef, M=m)
+    index.set_num_threads(threads)
+    index.add_items(base, np.arange(len(base)))
+    build_seconds = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.bin")
+        index.save_index(path)
+        size = os.path.getsize(path)
+    return index, build_seconds, size
+
+
+def measure(index, queries: np.ndarray, truth: np.ndarray, search_ef: int) -> Dict:
+    """Recall@k and per-query latency, querying one at a time as serving does"""
+    k = truth.shape[1]
+    if search_ef < k:
+        raise ValueError(f"search_ef ({search_ef}) must be at least k ({k})")
+    index.set_ef(search_ef)
+    index.set_num_threads(1)
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        labels, _ = index.knn_query(query, k=k)
+        latencies.append(time.perf_counter() - started)
+        hits += len(set(labels[0].tolist()) & set(expected.tolist()))
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "recall": hits / truth.size,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def sweep(
+    base: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    ms: List[int],
+    construction_efs: List[int],
+    search_efs: List[int],
+    threads: int
+) -> List[Dict]:
+    """
+    One result row per (M, construction_ef, search_ef)
+    
+    hnswlib searches with at least k candidates, so search_ef values below
+    k are measured as k; each effective value is reported once.
+    """
+    truth = exact_neighbors(base, queries, k)
+    effective_efs = sorted({max(search_ef, truth.shape[1]) for search_ef in search_efs})
+    rows = []
+    for m, construction_ef in product(ms, construction_efs):
+        index, build_seconds, size = build_index(base, m, construction_ef, threads)
+        for search_ef in effective_efs:
+            rows.append({
+                "M": m,
+                "construction_ef": construction_ef,
+                "search_ef": search_ef,
+                **measure(index, queries, truth, search_ef),
+                "build_seconds": build_seconds,
+                "index_bytes": size,
+            })
+    return rows
+
+
+def cheapest(rows: List[Dict], target_recall: float) -> Optional[Dict]:
+    """Fastest configuration meeting the recall target (then smallest, then quickest to build)"""
+    meeting = [row for row in rows if row["recall"] >= target_recall]
+    if not meeting:
+        return None
+    return min(meeting, key=lambda row: (row["p99_ms"], row["index_bytes"], row["build_seconds"]))
+
+
+def _live_collection() -> Tuple[str, str]:
+    """Chroma path and collection name of the live index generation"""
+    from config.settings import settings
+    from src.retrieval.generations import IndexGenerations
+
+    generations = IndexGenerations(
+        settings.index_generations_path,
+        collection_prefix="documents",
+        sparse_index_path=settings.bm25_index_path
+    )
+    return settings.chroma_db_path, generations.collection_name(generations.current)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep HNSW parameters for recall and latency")
+    parser.add_argument("--persist-directory", default=None, help="Chroma directory (default: CHROMA_DB_PATH)")
+    parser.add_argument("--collection", default=None, help="Collection to sample (default: live generation)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use this many random vectors instead of a collection")
+    parser.add_argument("--dim", type=int, default=1536, help="Dimension of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Number of held-out query vectors")
+    parser.add_argument("--k", type=int, default=10, help="Recall is measured at this k")
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32], help="M values")
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[64, 100, 200], help="construction_ef values")
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 32, 64, 128], help="search_ef values")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="Threads used to build indexes")
+    parser.add_argument("--target-recall", type=float, default=0.95, help="Recall the chosen configuration must reach")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        source = f"synthetic ({args.synthetic} x {args.dim})"
+        vectors = synthetic_embeddings(args.synthetic, args.dim, seed=args.seed)
+    else:
+        persist_directory, collection = _live_collection()
+        persist_directory = args.persist_directory or persist_directory
+        collection = args.collection or collection
+        source = f"{persist_directory}/{collection}"
+        vectors = load_collection_embeddings(persist_directory, collection)
+
+    base, queries = split_queries(vectors, args.queries, seed=args.seed)
+    below_k = sorted(ef for ef in args.search_ef if ef < args.k)
+    if below_k:
+        print(f"search_ef {below_k} is below k={args.k}; measured as {args.k}", file=sys.stderr)
+    rows = sweep(base, queries, args.k, args.m, args.construction_ef, args.search_ef, args.threads)
+    best = cheapest(rows, args.target_recall)
+
+    if args.json:
+        print(json.dumps({
+            "source": source,
+            "indexed": len(base),
+            "queries": len(queries),
+            "k": args.k,
+            "target_recall": args.target_recall,
+            "results": rows,
+            "chosen": best,
+        }, indent=2))
+    else:
+        print(f"{source}: {len(base)} vectors indexed, {len(queries)} queries, recall@{args.k}")
+        print(f"\n{'M':>4} {'c_ef':>5} {'s_ef':>5} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8} {'size MB':>8}")
+        for row in rows:
+            print(
+                f"{row['M']:>4} {row['construction_ef']:>5} {row['search_ef']:>5} {row['recall']:>7.3f} "
+                f"{row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f} {row['build_seconds']:>8.2f} "
+                f"{row['index_bytes'] / 1e6:>8.1f}"
+            )
+        if best:
+            print(f"\nCheapest configuration with recall >= {args.target_recall}:")
+            print(f"  HNSW_M={best['M']}")
+            print(f"  HNSW_CONSTRUCTION_EF={best['construction_ef']}")
+            print(f"  HNSW_SEARCH_EF={best['search_ef']}")
+        else:
+            print(f"\nNo configuration reaches recall {args.target_recall}")
+
+    sys.exit(0 if best else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Import-time profile for the API process
+
+Runs `python -X importtime` in a fresh interpreter, reports the total and the
+slowest modules, and fails when the serving path pulls in modules that should
+only be loaded lazily (query path at warmup, ingestion path at reindex).
+
+Usage:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --module api.main --top 20 --max-ms 1500
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that must not be imported when the API process boots
+DEFAULT_FORBIDDEN = [
+    "chromadb",
+    "openai",
+    "docx",
+    "pypdf",
+    "langchain_text_splitters",
+    "rank_bm25",
+]
+
+
+def profile_imports(module: str) -> List[Dict]:
+    """Import a module in a fresh interpreter and parse -X importtime output"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return entries
+
+
+def summarize(entries: List[Dict], module: str, top: int, forbidden: List[str]) -> Dict:
+    """Build the report: total time, slowest modules and forbidden imports"""
+    loaded = {e["module"] for e in entries}
+    root = next((e for e in entries if e["module"] == module), None)
+
+    return {
+        "module": module,
+        "total_ms": root["cumulative_ms"] if root else 0.0,
+        "modules_loaded": len(entries),
+        "slowest_self": sorted(entries, key=lambda e: e["self_ms"], reverse=True)[:top],
+        "slowest_cumulative": sorted(
+            (e for e in entries if e["module"] != module),
+            key=lambda e: e["cumulative_ms"],
+            reverse=True
+        )[:top],
+        "forbidden_loaded": sorted(
+            name for name in forbidden
+            if name in loaded or any(m.startswith(name + ".") for m in loaded)
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile import time of the API process")
+    parser.add_argument("--module", default="api.main", help="Module to import")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to show")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if total import time exceeds this")
+    parser.add_argument("--forbid", nargs="*", default=DEFAULT_FORBIDDEN, help="Modules that must not be imported")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = summarize(profile_imports(args.module), args.module, args.top, args.forbid)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Import of {report['module']}: {report['total_ms']:.1f} ms "
+              f"({report['modules_loaded']} modules)")
+        print("\nSlowest modules (cumulative):")
+        for e in report["slowest_cumulative"]:
+            print(f"  {e['cumulative_ms']:9.1f} ms  {e['module']}")
+        print("\nSlowest modules (self):")
+        for e in report["slowest_self"]:
+            print(f"  {e['self_ms']:9.1f} ms  {e['module']}")
+        if report["forbidden_loaded"]:
+            print(f"\nForbidden modules loaded: {', '.join(report['forbidden_loaded'])}")
+
+    failed = bool(report["forbidden_loaded"])
+    if args.max_ms is not None and report["total_ms"] > args.max_ms:
+        print(f"Import time {report['total_ms']:.1f} ms exceeds budget {args.max_ms:.1f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
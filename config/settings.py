@@ -12,19 +12,87 @@ class Settings(BaseSettings):
     # OpenAI Configuration
     openai_api_key: Optional[str] = Field(default=None, env="OPENAI_API_KEY")
     embedding_model: str = Field(default="text-embedding-3-large", env="EMBEDDING_MODEL")
+    embedding_batch_size: int = Field(default=100, env="EMBEDDING_BATCH_SIZE")
     llm_model: str = Field(default="gpt-4o-mini", env="LLM_MODEL")
     max_tokens: int = Field(default=2000, env="MAX_TOKENS")
     temperature: float = Field(default=0.1, env="TEMPERATURE")
     
+    # Provider Client Configuration
+    openai_max_connections: int = Field(default=20, env="OPENAI_MAX_CONNECTIONS")
+    openai_keepalive_connections: int = Field(default=10, env="OPENAI_KEEPALIVE_CONNECTIONS")
+    openai_keepalive_expiry: float = Field(default=60.0, env="OPENAI_KEEPALIVE_EXPIRY")
+    openai_http2: bool = Field(default=True, env="OPENAI_HTTP2")  # Used when h2 is installed
+    openai_connect_timeout: float = Field(default=5.0, env="OPENAI_CONNECT_TIMEOUT")
+    openai_embedding_timeout: float = Field(default=10.0, env="OPENAI_EMBEDDING_TIMEOUT")
+    openai_chat_timeout: float = Field(default=60.0, env="OPENAI_CHAT_TIMEOUT")
+    openai_max_retries: int = Field(default=2, env="OPENAI_MAX_RETRIES")
+    embedding_hedging_enabled: bool = Field(default=False, env="EMBEDDING_HEDGING_ENABLED")
+    embedding_hedge_percentile: float = Field(default=0.95, env="EMBEDDING_HEDGE_PERCENTILE")
+    circuit_breaker_enabled: bool = Field(default=True, env="CIRCUIT_BREAKER_ENABLED")
+    circuit_failure_threshold: int = Field(default=5, env="CIRCUIT_FAILURE_THRESHOLD")
+    circuit_reset_timeout: float = Field(default=30.0, env="CIRCUIT_RESET_TIMEOUT")
+    admission_control_enabled: bool = Field(default=True, env="ADMISSION_CONTROL_ENABLED")
+    admission_embedding_concurrency: int = Field(default=16, env="ADMISSION_EMBEDDING_CONCURRENCY")
+    admission_chat_concurrency: int = Field(default=8, env="ADMISSION_CHAT_CONCURRENCY")
+    admission_max_queue: int = Field(default=32, env="ADMISSION_MAX_QUEUE")
+    admission_max_wait: float = Field(default=2.0, env="ADMISSION_MAX_WAIT")  # Interactive requests
+    admission_batch_max_wait: float = Field(default=120.0, env="ADMISSION_BATCH_MAX_WAIT")  # Indexing
+    admission_batch_share: float = Field(default=0.5, env="ADMISSION_BATCH_SHARE")  # Max share of slots for batch
+    
     # Chunking Configuration
     chunk_size: int = Field(default=1000, env="CHUNK_SIZE")
     chunk_overlap: int = Field(default=150, env="CHUNK_OVERLAP")
+    chunk_length_unit: str = Field(default="chars", env="CHUNK_LENGTH_UNIT")  # chars | tokens
+    chunk_workers: int = Field(default=0, env="CHUNK_WORKERS")  # 0 = one per CPU
+    chunk_parallel_min_chars: int = Field(default=2000000, env="CHUNK_PARALLEL_MIN_CHARS")  # Smaller batches run serially
+    
+    # PDF Loading Configuration
+    pdf_pages_per_task: int = Field(default=32, env="PDF_PAGES_PER_TASK")
+    pdf_parallel_min_pages: int = Field(default=100, env="PDF_PARALLEL_MIN_PAGES")
+    pdf_workers: int = Field(default=0, env="PDF_WORKERS")  # 0 = one per CPU
+    
+    # Deduplication Configuration
+    dedup_enabled: bool = Field(default=True, env="DEDUP_ENABLED")
+    dedup_threshold: float = Field(default=0.9, env="DEDUP_THRESHOLD")  # Estimated Jaccard similarity
+    dedup_num_perm: int = Field(default=64, env="DEDUP_NUM_PERM")
+    dedup_shingle_size: int = Field(default=5, env="DEDUP_SHINGLE_SIZE")
     
     # Retrieval Configuration
     top_k_dense: int = Field(default=10, env="TOP_K_DENSE")
     top_k_sparse: int = Field(default=10, env="TOP_K_SPARSE")
     top_k_final: int = Field(default=5, env="TOP_K_FINAL")
     similarity_threshold: float = Field(default=0.3, env="SIMILARITY_THRESHOLD")
+    query_routing_enabled: bool = Field(default=True, env="QUERY_ROUTING_ENABLED")
+    route_max_terms: int = Field(default=4, env="ROUTE_MAX_TERMS")  # Longer queries always run both legs
+    route_min_rare_idf: float = Field(default=0.6, env="ROUTE_MIN_RARE_IDF")  # 0..1, 1 = every term is unique
+    route_min_score_gap: float = Field(default=1.5, env="ROUTE_MIN_SCORE_GAP")  # BM25 top-1 / top-2
+    hierarchical_retrieval_enabled: bool = Field(default=False, env="HIERARCHICAL_RETRIEVAL_ENABLED")
+    hierarchical_top_documents: int = Field(default=8, env="HIERARCHICAL_TOP_DOCUMENTS")
+    hierarchical_top_sections: int = Field(default=16, env="HIERARCHICAL_TOP_SECTIONS")
+    hierarchical_min_chunks: int = Field(default=5000, env="HIERARCHICAL_MIN_CHUNKS")  # Smaller corpora search flat
+    
+    # Remote Retrieval Configuration
+    retrieval_service_url: Optional[str] = Field(default=None, env="RETRIEVAL_SERVICE_URL")  # Unset = in-process indexes
+    retrieval_service_timeout: float = Field(default=10.0, env="RETRIEVAL_SERVICE_TIMEOUT")
+    retrieval_service_max_connections: int = Field(default=32, env="RETRIEVAL_SERVICE_MAX_CONNECTIONS")
+    retrieval_service_ready_timeout: float = Field(default=300.0, env="RETRIEVAL_SERVICE_READY_TIMEOUT")  # Warmup wait
+    retrieval_service_key: str = Field(default="", env="RETRIEVAL_SERVICE_KEY")  # Shared key; empty disables /retrieval/v1
+    retrieval_batch_max_queries: int = Field(default=64, env="RETRIEVAL_BATCH_MAX_QUERIES")
+    
+    # Query Execution Configuration
+    query_coalescing_enabled: bool = Field(default=True, env="QUERY_COALESCING_ENABLED")
+    query_deadline_seconds: float = Field(default=20.0, env="QUERY_DEADLINE_SECONDS")  # 0 = no deadline
+    query_min_generation_seconds: float = Field(default=2.0, env="QUERY_MIN_GENERATION_SECONDS")  # Extractive answer below this
+    extractive_answer_chunks: int = Field(default=3, env="EXTRACTIVE_ANSWER_CHUNKS")
+    extractive_sentences_per_chunk: int = Field(default=2, env="EXTRACTIVE_SENTENCES_PER_CHUNK")
+    search_max_depth: int = Field(default=100, env="SEARCH_MAX_DEPTH")  # Default candidates per leg of /api/v1/search; caps offset + top_k
+    
+    # Context Compression Configuration
+    context_compression_enabled: bool = Field(default=False, env="CONTEXT_COMPRESSION_ENABLED")
+    context_compression_sentences: int = Field(default=3, env="CONTEXT_COMPRESSION_SENTENCES")  # Best sentences kept per chunk
+    context_compression_neighbors: int = Field(default=1, env="CONTEXT_COMPRESSION_NEIGHBORS")  # Kept on each side of them
+    context_compression_semantic_weight: float = Field(default=0.5, env="CONTEXT_COMPRESSION_SEMANTIC_WEIGHT")  # 0 = BM25 only
+    context_compression_cache_size: int = Field(default=5000, env="CONTEXT_COMPRESSION_CACHE_SIZE")  # Cached sentence embeddings
     
     # Firebase Configuration
     firebase_project_id: Optional[str] = Field(default=None, env="FIREBASE_PROJECT_ID")
@@ -35,13 +103,50 @@ class Settings(BaseSettings):
     api_port: int = Field(default=8000, env="API_PORT")
     api_workers: int = Field(default=4, env="API_WORKERS")
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
+    log_file_level: str = Field(default="DEBUG", env="LOG_FILE_LEVEL")
+    log_enqueue: bool = Field(default=True, env="LOG_ENQUEUE")  # Write logs from a background thread
+    log_json: bool = Field(default=False, env="LOG_JSON")  # JSON lines in the log files
+    log_debug_sample_rate: float = Field(default=1.0, env="LOG_DEBUG_SAMPLE_RATE")
+    log_sample_rates: str = Field(default="", env="LOG_SAMPLE_RATES")  # e.g. "src.retrieval=0.01"
+    warmup_on_startup: bool = Field(default=True, env="WARMUP_ON_STARTUP")
+    warmup_embedding: bool = Field(default=True, env="WARMUP_EMBEDDING")
+    warmup_retry_seconds: float = Field(default=2.0, env="WARMUP_RETRY_SECONDS")  # First retry delay, doubled each time
+    warmup_retry_max_seconds: float = Field(default=60.0, env="WARMUP_RETRY_MAX_SECONDS")
+    admin_api_key: str = Field(default="", env="ADMIN_API_KEY")  # Empty disables the /admin endpoints
+    profiling_max_requests: int = Field(default=1000, env="PROFILING_MAX_REQUESTS")
+    profiling_max_seconds: float = Field(default=600, env="PROFILING_MAX_SECONDS")
     
     # Index Paths
     chroma_db_path: str = Field(default="./index/chroma_db", env="CHROMA_DB_PATH")
+    dense_write_batch_size: int = Field(default=100, env="DENSE_WRITE_BATCH_SIZE")
+    dense_adaptive_write_batch: bool = Field(default=True, env="DENSE_ADAPTIVE_WRITE_BATCH")
+    dense_write_target_seconds: float = Field(default=0.5, env="DENSE_WRITE_TARGET_SECONDS")
+    # HNSW build/search parameters; fixed when a collection is created (apply on the next full reindex)
+    hnsw_m: int = Field(default=16, env="HNSW_M")
+    hnsw_construction_ef: int = Field(default=100, env="HNSW_CONSTRUCTION_EF")
+    hnsw_search_ef: int = Field(default=10, env="HNSW_SEARCH_EF")
     bm25_index_path: str = Field(default="./index/bm25_index.json", env="BM25_INDEX_PATH")
+    bm25_num_shards: int = Field(default=1, env="BM25_NUM_SHARDS")
+    bm25_shard_processes: bool = Field(default=False, env="BM25_SHARD_PROCESSES")
+    bm25_max_segments: int = Field(default=10, env="BM25_MAX_SEGMENTS")
+    bm25_merge_factor: int = Field(default=4, env="BM25_MERGE_FACTOR")
+    bm25_merge_deletes_ratio: float = Field(default=0.3, env="BM25_MERGE_DELETES_RATIO")
+    bm25_background_merge: bool = Field(default=True, env="BM25_BACKGROUND_MERGE")
+    index_generations_path: str = Field(default="./index/generations.json", env="INDEX_GENERATIONS_PATH")
+    tenants_index_path: str = Field(default="./index/tenants", env="TENANTS_INDEX_PATH")
+    sparse_memory_budget_mb: float = Field(default=1024, env="SPARSE_MEMORY_BUDGET_MB")  # 0 = unlimited
     
     # Data Paths
     data_raw_path: str = Field(default="./data/raw", env="DATA_RAW_PATH")
+    tenants_data_path: str = Field(default="./data/tenants", env="TENANTS_DATA_PATH")
+    
+    # Watch Folder (index documents changed in data_raw_path without a reindex)
+    watch_folder_enabled: bool = Field(default=False, env="WATCH_FOLDER_ENABLED")
+    watch_folder_debounce_seconds: float = Field(default=2.0, env="WATCH_FOLDER_DEBOUNCE_SECONDS")
+    watch_folder_max_delay_seconds: float = Field(default=30.0, env="WATCH_FOLDER_MAX_DELAY_SECONDS")
+    watch_folder_max_batch: int = Field(default=32, env="WATCH_FOLDER_MAX_BATCH")
+    watch_folder_force_polling: bool = Field(default=False, env="WATCH_FOLDER_FORCE_POLLING")  # For network/container mounts
+    watch_folder_poll_interval: float = Field(default=1.0, env="WATCH_FOLDER_POLL_INTERVAL")
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,254 @@
+"""
+Exact and near-duplicate removal for documents and chunks
+"""
+import hashlib
+import json
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config.settings import settings
+from src.utils.logger import log
+
+# Mersenne prime for universal hashing; with 32-bit inputs and 31-bit
+# coefficients, a * h + b stays below 2**64
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+# Chunks with fewer shingles than this are only deduplicated exactly
+_MIN_SHINGLES = 8
+
+
+def _normalize(text: str) -> str:
+    """Collapse whitespace and case so trivial edits hash the same"""
+    return " ".join(text.split()).casefold()
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of normalized text"""
+    return hashlib.sha1(_normalize(text).encode("utf-8")).hexdigest()
+
+
+def get_source_refs(metadata: Dict) -> List[Dict]:
+    """Source references carried by a collapsed chunk (itself if none)"""
+    refs = metadata.get("source_refs")
+    if refs:
+        return json.loads(refs)
+    return [{
+        "source": metadata.get("source"),
+        "chunk_id": metadata.get("chunk_id"),
+        "section_title": metadata.get("section_title"),
+    }]
+
+
+def _set_source_refs(metadata: Dict, refs: List[Dict]):
+    if len(refs) > 1:
+        metadata["source_refs"] = json.dumps(refs, ensure_ascii=False)
+        metadata["duplicate_count"] = len(refs) - 1
+    else:
+        metadata.pop("source_refs", None)
+        metadata.pop("duplicate_count", None)
+
+
+def hand_off_chunks(chunks: List[Dict], source: str, replacements: List[Dict] = ()) -> List[Dict]:
+    """
+    Keep the other files that a removed document's chunks stand for
+    
+    chunks are the indexed chunks of source, which is being deleted or
+    replaced by replacements. A chunk whose source_refs name other files
+    would take them out of the index with it: if a replacement chunk has
+    the same text, those refs move onto it, otherwise the chunk is handed
+    to the first other file. Returns the handed-off chunks, to be indexed.
+    """
+    replacing = {content_hash(chunk["text"]): chunk for chunk in replacements}
+    handed = []
+    for chunk in chunks:
+        refs = [ref for ref in get_source_refs(chunk["metadata"]) if ref["source"] != source]
+        if not refs:
+            continue
+        
+        replacement = replacing.get(content_hash(chunk["text"]))
+        if replacement is not None:
+            _set_source_refs(replacement["metadata"], get_source_refs(replacement["metadata"]) + refs)
+            continue
+        
+        owner = refs[0]
+        metadata = dict(chunk["metadata"], source=owner["source"], chunk_id=owner["chunk_id"])
+        if owner.get("section_title") is not None:
+            metadata["section_title"] = owner["section_title"]
+        if metadata.get("file_path"):
+            metadata["file_path"] = str(Path(metadata["file_path"]).with_name(owner["source"]))
+        _set_source_refs(metadata, refs)
+        handed.append({"text": chunk["text"], "metadata": metadata})
+    return handed
+
+
+class ChunkDeduplicator:
+    """
+    Collapse duplicate documents and chunks before indexing
+    
+    Documents with identical text are dropped outright. Chunks are
+    deduplicated first by exact hash. Near-duplicates come next, found with
+    MinHash signatures over character shingles and banded LSH. Each
+    cluster keeps its first chunk, which records the collapsed copies in
+    its "source_refs" metadata (a JSON list, since Chroma metadata values
+    must be scalar).
+    """
+    
+    def __init__(
+        self,
+        threshold: float = None,
+        num_perm: int = None,
+        shingle_size: int = None,
+        seed: int = 1
+    ):
+        self.threshold = threshold if threshold is not None else settings.dedup_threshold
+        self.num_perm = num_perm or settings.dedup_num_perm
+        self.shingle_size = shingle_size or settings.dedup_shingle_size
+        
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 31, size=self.num_perm).astype(np.uint64)
+        self._b = rng.randint(0, 1 << 31, size=self.num_perm).astype(np.uint64)
+        self.bands, self.rows = self._choose_bands(self.num_perm, self.threshold)
+        
+        # Kept file name -> identical files dropped by deduplicate_documents
+        self.duplicate_files: Dict[str, List[str]] = {}
+    
+    @staticmethod
+    def _choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+        """
+        Pick LSH bands x rows so the candidate S-curve rises just below threshold
+        
+        A pair with Jaccard similarity s becomes a candidate with probability
+        1 - (1 - s^r)^b, whose inflection point is roughly (1/b)^(1/r).
+        """
+        for rows in range(num_perm, 0, -1):
+            if num_perm % rows:
+                continue
+            bands = num_perm // rows
+            if (1 / bands) ** (1 / rows) <= threshold - 0.1:
+                return bands, rows
+        return num_perm, 1
+    
+    def deduplicate_documents(self, documents: List[Dict]) -> List[Dict]:
+        """Drop documents whose full text is identical to an earlier one"""
+        kept = []
+        seen = {}
+        
+        for doc in documents:
+            digest = content_hash(doc.get("full_text", ""))
+            if digest in seen:
+                original = seen[digest]
+                original["metadata"].setdefault("duplicate_files", []).append(doc["file_name"])
+                self.duplicate_files.setdefault(original["file_name"], []).append(doc["file_name"])
+                log.info("Skipping duplicate document {} (same as {})", doc["file_name"], original["file_name"])
+                continue
+            seen[digest] = doc
+            kept.append(doc)
+        
+        return kept
+    
+    def deduplicate_chunks(self, chunks: List[Dict]) -> List[Dict]:
+        """Collapse exact and near-duplicate chunks into one representative each"""
+        representatives: List[Dict] = []
+        members: List[List[Dict]] = []
+        signatures: List[Optional[np.ndarray]] = []
+        exact_index: Dict[str, int] = {}
+        buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        near_duplicates = 0
+        
+        for chunk in chunks:
+            digest = content_hash(chunk["text"])
+            rep = exact_index.get(digest)
+            
+            signature = None
+            if rep is None:
+                signature = self._signature(chunk["text"])
+                if signature is not None:
+                    rep = self._find_near_duplicate(signature, signatures, buckets)
+                    if rep is not None:
+                        near_duplicates += 1
+            
+            if rep is not None:
+                members[rep].append(chunk)
+                continue
+            
+            rep = len(representatives)
+            representatives.append(chunk)
+            members.append([chunk])
+            signatures.append(signature)
+            exact_index[digest] = rep
+            if signature is not None:
+                for key in self._band_keys(signature):
+                    buckets.setdefault(key, []).append(rep)
+        
+        for chunk, group in zip(representatives, members):
+            if len(group) > 1 or any(
+                m["metadata"]["source"] in self.duplicate_files for m in group
+            ):
+                self._attach_source_refs(chunk, group)
+        
+        removed = len(chunks) - len(representatives)
+        log.info(
+            "Deduplicated chunks: {} -> {} ({} exact, {} near-duplicate)",
+            len(chunks), len(representatives), removed - near_duplicates, near_duplicates
+        )
+        return representatives
+    
+    def _signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature over character shingles, or None for very short text"""
+        normalized = _normalize(text)
+        n = self.shingle_size
+        shingles = {normalized[i:i + n] for i in range(max(0, len(normalized) - n + 1))}
+        if len(shingles) < _MIN_SHINGLES:
+            return None
+        
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return permuted.min(axis=0)
+    
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+    
+    def _find_near_duplicate(
+        self,
+        signature: np.ndarray,
+        signatures: List[Optional[np.ndarray]],
+        buckets: Dict[Tuple[int, bytes], List[int]]
+    ) -> Optional[int]:
+        """Return the representative whose estimated Jaccard meets the threshold"""
+        checked = set()
+        for key in self._band_keys(signature):
+            for candidate in buckets.get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                similarity = float(np.mean(signatures[candidate] == signature))
+                if similarity >= self.threshold:
+                    return candidate
+        return None
+    
+    def _attach_source_refs(self, chunk: Dict, group: List[Dict]):
+        refs = []
+        for member in group:
+            metadata = member["metadata"]
+            refs.append({
+                "source": metadata["source"],
+                "chunk_id": metadata["chunk_id"],
+                "section_title": metadata.get("section_title"),
+            })
+            # Identical documents dropped earlier share this chunk verbatim
+            for duplicate in self.duplicate_files.get(metadata["source"], ()):
+                refs.append({
+                    "source": duplicate,
+                    "chunk_id": duplicate + metadata["chunk_id"][len(metadata["source"]):],
+                    "section_title": metadata.get("section_title"),
+                })
+        
+        _set_source_refs(chunk["metadata"], refs)
@@ -1,5 +1,5 @@
 """
-Document Loader for DOCX files
+Document Loader for DOCX and PDF files
 """
 import os
 from pathlib import Path
@@ -9,38 +9,43 @@ from docx.document import Document as DocumentType
 from config.settings import settings
 from src.utils.logger import log
 
+SUPPORTED_EXTENSIONS = (".docx", ".pdf")
+
 
 class DocumentLoader:
-    """Load and parse DOCX documents"""
+    """Load and parse DOCX and PDF documents"""
     
     def __init__(self, data_path: str = None):
         self.data_path = data_path or settings.data_raw_path
         
     def load_all_documents(self) -> List[Dict]:
-        """Load all DOCX files from data directory"""
+        """Load all DOCX and PDF files from data directory"""
         documents = []
         data_dir = Path(self.data_path)
         
         if not data_dir.exists():
-            log.error(f"Data directory not found: {data_dir}")
+            log.error("Data directory not found: {}", data_dir)
             return documents
         
-        docx_files = list(data_dir.glob("*.docx"))
-        log.info(f"Found {len(docx_files)} DOCX files")
+        files = sorted(p for p in data_dir.iterdir() if p.suffix.lower() in SUPPORTED_EXTENSIONS)
+        log.info("Found {} document files", len(files))
         
-        for file_path in docx_files:
+        for file_path in files:
             try:
                 doc_data = self.load_document(str(file_path))
                 if doc_data:
                     documents.append(doc_data)
-                    log.info(f"Loaded: {file_path.name}")
+                    log.info("Loaded: {}", file_path.name)
             except Exception as e:
-                log.error(f"Failed to load {file_path.name}: {e}")
+                log.error("Failed to load {}: {}", file_path.name, e)
         
         return documents
     
     def load_document(self, file_path: str) -> Dict:
-        """Load a single DOCX document"""
+        """Load a single DOCX or PDF document"""
+        if Path(file_path).suffix.lower() == ".pdf":
+            return self._load_pdf(file_path)
+        
         try:
             doc = Document(file_path)
             file_name = Path(file_path).name
@@ -59,7 +64,17 @@ class DocumentLoader:
                 }
             }
         except Exception as e:
-            log.error(f"Error loading document {file_path}: {e}")
+            log.error("Error loading document {}: {}", file_path, e)
+            return None
+    
+    def _load_pdf(self, file_path: str) -> Dict:
+        # pypdf is only imported when a PDF is actually loaded
+        from src.core.pdf_loader import PDFLoader
+        
+        try:
+            return PDFLoader().load_document(file_path)
+        except Exception as e:
+            log.error("Error loading document {}: {}", file_path, e)
             return None
     
     def _extract_structured_content(self, doc: DocumentType) -> List[Dict]:
@@ -104,6 +119,6 @@ if __name__ == "__main__":
     loader = DocumentLoader()
     docs = loader.load_all_documents()
     
-    log.info(f"Total documents loaded: {len(docs)}")
+    log.info("Total documents loaded: {}", len(docs))
     for doc in docs:
-        log.info(f"- {doc['file_name']}: {doc['metadata']['total_paragraphs']} paragraphs")
+        log.info("- {}: {} paragraphs", doc["file_name"], doc["metadata"]["total_paragraphs"])
@@ -1,22 +1,31 @@
 """
 Embedding Management with OpenAI
 """
-from typing import List
-from openai import OpenAI
+from typing import Dict, List
 from config.settings import settings
-from src.utils.logger import log
+from src.core.openai_client import call_provider, deadline_client, get_openai_client
+from src.utils.deadline import bound
+from src.utils.logger import get_logger
+from src.utils.resilience import Hedger
+
+log = get_logger(__name__)
 
 
 class EmbeddingManager:
     """Manage embeddings using OpenAI API"""
     
     def __init__(self):
-        self.client = None
-        if settings.openai_api_key:
-            self.client = OpenAI(api_key=settings.openai_api_key)
+        self.client = get_openai_client()
         self.model = settings.embedding_model
-        log.info(f"Initialized EmbeddingManager with model: {self.model}" +
-                 (" (OpenAI client initialized)" if self.client else " (OpenAI client NOT initialized - API key missing)"))
+        
+        # Query embeddings sit on the request path; batches do not need hedging
+        self.hedger = None
+        if settings.embedding_hedging_enabled:
+            self.hedger = Hedger(percentile=settings.embedding_hedge_percentile)
+        log.info(
+            "Initialized EmbeddingManager with model: {} ({})",
+            self.model, "OpenAI client initialized" if self.client else "OpenAI client NOT initialized - API key missing"
+        )
     
     def embed_text(self, text: str) -> List[float]:
         """Generate embedding for a single text"""
@@ -25,16 +34,26 @@ class EmbeddingManager:
             return [0.0] * 1536  # OpenAI embedding size
         
         try:
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=text,
-                encoding_format="float"
-            )
+            # Bounded here: hedged calls run on threads that do not see the request deadline
+            timeout = bound(settings.openai_embedding_timeout)
+            client = deadline_client(self.client)
+            if self.hedger:
+                response = call_provider("embeddings", self.hedger.call, self._create, text, timeout, client)
+            else:
+                response = call_provider("embeddings", self._create, text, timeout, client)
             return response.data[0].embedding
         except Exception as e:
-            log.error(f"Error generating embedding: {e}")
+            log.error("Error generating embedding: {}", e)
             raise
     
+    def _create(self, texts, timeout: float = None, client=None):
+        return (client or self.client).embeddings.create(
+            model=self.model,
+            input=texts,
+            encoding_format="float",
+            timeout=settings.openai_embedding_timeout if timeout is None else timeout
+        )
+    
     def embed_texts(self, texts: List[str], batch_size: int = 100) -> List[List[float]]:
         """Generate embeddings for multiple texts in batches"""
         if not self.client:
@@ -46,20 +65,22 @@ class EmbeddingManager:
         for i in range(0, len(texts), batch_size):
             batch = texts[i:i + batch_size]
             try:
-                response = self.client.embeddings.create(
-                    model=self.model,
-                    input=batch,
-                    encoding_format="float"
+                response = call_provider(
+                    "embeddings", self._create, batch, bound(settings.openai_embedding_timeout), deadline_client(self.client)
                 )
                 batch_embeddings = [item.embedding for item in response.data]
                 all_embeddings.extend(batch_embeddings)
-                log.debug(f"Embedded batch {i//batch_size + 1}: {len(batch)} texts")
+                log.debug("Embedded batch {}: {} texts", i // batch_size + 1, len(batch))
             except Exception as e:
-                log.error(f"Error in batch {i//batch_size + 1}: {e}")
+                log.error("Error in batch {}: {}", i // batch_size + 1, e)
                 raise
         
-        log.info(f"Generated {len(all_embeddings)} embeddings")
+        log.debug("Generated {} embeddings", len(all_embeddings))
         return all_embeddings
+    
+    def get_stats(self) -> Dict:
+        """Get hedging statistics (empty when hedging is disabled)"""
+        return self.hedger.get_stats() if self.hedger else {}
 
 
 if __name__ == "__main__":
@@ -69,5 +90,5 @@ if __name__ == "__main__":
     test_text = "This is a test sentence for embedding generation."
     embedding = manager.embed_text(test_text)
     
-    log.info(f"Embedding dimension: {len(embedding)}")
-    log.info(f"First 5 values: {embedding[:5]}")
+    log.info("Embedding dimension: {}", len(embedding))
+    log.info("First 5 values: {}", embedding[:5])
@@ -0,0 +1,313 @@
+"""
+Watch a document folder and apply changed documents incrementally
+"""
+import importlib.util
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from src.core.document_loader import SUPPORTED_EXTENSIONS
+from src.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+
+def watchfiles_available() -> bool:
+    """Native file events (inotify on Linux) need the optional watchfiles package"""
+    return importlib.util.find_spec("watchfiles") is not None
+
+
+def acquire_owner_lock(path: str):
+    """
+    Non-blocking exclusive lock on a file, held until the returned handle is closed
+    
+    Returns None when another process holds it, so only one API worker
+    watches the folder.
+    """
+    lock_path = Path(path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    handle = open(lock_path, "a+")
+    try:
+        try:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except ImportError:
+            import msvcrt
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+class FolderWatcher:
+    """
+    Collect document changes in one folder and apply them in the background
+    
+    Events come from watchfiles (inotify on Linux) when it is installed,
+    and from polling file sizes and modification times otherwise or when
+    force_polling is set (network and container-mounted folders often
+    deliver no events). Bursts of events, such as a copy in progress or an
+    editor saving several times, are debounced: a batch is applied once the
+    folder has been quiet for `debounce` seconds, or at the latest
+    `max_delay` seconds after its oldest change.
+    
+    Batches run one at a time on a single thread and hold at most
+    max_batch documents; the rest wait for the next batch. apply(name,
+    exists) is called per changed file name, with exists False when the
+    file was removed. A failed document is logged and retried on its next
+    change.
+    
+    Changes made while no watcher ran are queued on start. The folder is
+    compared with the modification time and size recorded in state_path
+    for every applied document, and documents without a record with the
+    sources indexed() returns: unindexed files are added, indexed sources
+    without a file are removed.
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        apply: Callable[[str, bool], None],
+        debounce: float = 2.0,
+        max_delay: float = 30.0,
+        max_batch: int = 32,
+        poll_interval: float = 1.0,
+        force_polling: bool = False,
+        state_path: str = None,
+        indexed: Callable[[], Iterable[str]] = None
+    ):
+        self.path = Path(path)
+        self.apply = apply
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_batch = max(1, max_batch)
+        self.poll_interval = poll_interval
+        self.backend = "polling" if force_polling or not watchfiles_available() else "watchfiles"
+        self.state_path = Path(state_path) if state_path else None
+        self.indexed = indexed
+        
+        # file name -> (mtime_ns, size) when it was last applied
+        self._applied: Dict[str, Tuple[int, int]] = self._load_state()
+        self._state_lock = threading.Lock()
+        
+        # file name -> when it first changed since it was last applied
+        self._pending: Dict[str, float] = {}
+        self._last_event = 0.0
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+        
+        self.batches = 0
+        self.reconciled = 0
+        self.applied = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+    
+    def start(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._watch, name="folder-watcher-events", daemon=True),
+            threading.Thread(target=self._run, name="folder-watcher-apply", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        log.info("Watching {} for document changes ({}, debounce {}s)", self.path, self.backend, self.debounce)
+    
+    def stop(self, timeout: float = 10.0):
+        """Stop watching; a batch already being applied finishes first"""
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+    
+    @staticmethod
+    def relevant(name: str) -> bool:
+        """Supported documents, skipping hidden files and Office lock files (~$name.docx)"""
+        return Path(name).suffix.lower() in SUPPORTED_EXTENSIONS and not name.startswith((".", "~$"))
+    
+    def notify(self, names: Iterable[str]):
+        """Record changed file names (relative to the folder)"""
+        names = [name for name in names if self.relevant(name)]
+        if not names:
+            return
+        now = time.monotonic()
+        with self._condition:
+            for name in names:
+                self._pending.setdefault(name, now)
+            self._last_event = now
+            self._condition.notify()
+    
+    def _watch(self):
+        try:
+            current = self._scan()
+            try:
+                self.reconcile(current)
+            except Exception as e:
+                log.error("Could not reconcile {} with the index: {}", self.path, e)
+            if self.backend == "watchfiles":
+                self._watch_events()
+            else:
+                self._watch_polling(current)
+        except Exception as e:
+            self.last_error = str(e)
+            log.error("Folder watcher stopped: {}", e)
+    
+    def _watch_events(self):
+        import watchfiles
+        
+        # Debouncing happens in _run; keep watchfiles' own grouping short
+        for changes in watchfiles.watch(
+            self.path,
+            watch_filter=None,
+            debounce=200,
+            stop_event=self._stop,
+            recursive=False,
+            raise_interrupt=False
+        ):
+            self.notify(Path(changed).name for _, changed in changes)
+    
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        files = {}
+        try:
+            for entry in self.path.iterdir():
+                if self.relevant(entry.name):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except OSError as e:
+            log.warning("Could not scan {}: {}", self.path, e)
+        return files
+    
+    def _watch_polling(self, known: Dict[str, Tuple[int, int]]):
+        while not self._stop.wait(self.poll_interval):
+            current = self._scan()
+            changed = [name for name in current.keys() | known.keys() if current.get(name) != known.get(name)]
+            known = current
+            self.notify(changed)
+    
+    def _load_state(self) -> Dict[str, Tuple[int, int]]:
+        if self.state_path is None or not self.state_path.exists():
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return {name: tuple(signature) for name, signature in json.load(f).items()}
+        except (OSError, ValueError) as e:
+            log.warning("Could not read watch state {}: {}", self.state_path, e)
+            return {}
+    
+    def _save_state(self):
+        if self.state_path is None:
+            return
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_name(self.state_path.name + ".tmp")
+        with self._state_lock:
+            state = dict(self._applied)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+    
+    def _signature(self, name: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = (self.path / name).stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def reconcile(self, current: Dict[str, Tuple[int, int]] = None) -> List[str]:
+        """Queue documents added, changed or removed while nobody watched; returns their names"""
+        if self.state_path is None and self.indexed is None:
+            return []
+        current = self._scan() if current is None else current
+        indexed = set(self.indexed()) if self.indexed is not None else set()
+        
+        changed = []
+        adopted = False
+        with self._state_lock:
+            for name, signature in current.items():
+                if name in self._applied:
+                    if self._applied[name] != signature:
+                        changed.append(name)
+                elif name in indexed:
+                    # Indexed before its signature was recorded (reindexing, an older version)
+                    self._applied[name] = signature
+                    adopted = True
+                else:
+                    changed.append(name)
+            changed.extend(name for name in self._applied.keys() | indexed if name not in current)
+        
+        if adopted:
+            self._save_state()
+        self.reconciled = len(changed)
+        if changed:
+            log.info("Queued {} documents changed in {} while it was not watched", len(changed), self.path)
+            self.notify(changed)
+        return changed
+    
+    def _next_batch(self):
+        """Wait until pending changes have settled; None once stopped"""
+        with self._condition:
+            while not self._stop.is_set():
+                if not self._pending:
+                    self._condition.wait()
+                    continue
+                settled_at = min(
+                    self._last_event + self.debounce,
+                    min(self._pending.values()) + self.max_delay
+                )
+                remaining = settled_at - time.monotonic()
+                if remaining <= 0:
+                    batch = sorted(self._pending, key=self._pending.get)[:self.max_batch]
+                    for name in batch:
+                        del self._pending[name]
+                    return batch
+                self._condition.wait(remaining)
+            return None
+    
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self.batches += 1
+            for name in batch:
+                exists = (self.path / name).is_file()
+                # Taken before apply(): a write during it is picked up as a change
+                signature = self._signature(name) if exists else None
+                try:
+                    self.apply(name, exists)
+                    self.applied += 1
+                    with self._state_lock:
+                        if signature is not None:
+                            self._applied[name] = signature
+                        else:
+                            self._applied.pop(name, None)
+                except Exception as e:
+                    self.failed += 1
+                    self.last_error = f"{name}: {e}"
+                    log.error("Failed to {} watched document {}: {}", "index" if exists else "remove", name, e)
+            try:
+                self._save_state()
+            except OSError as e:
+                log.warning("Could not save watch state {}: {}", self.state_path, e)
+    
+    def get_stats(self) -> Dict:
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            "path": str(self.path),
+            "backend": self.backend,
+            "pending": pending,
+            "reconciled": self.reconciled,
+            "batches": self.batches,
+            "applied": self.applied,
+            "failed": self.failed,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,166 @@
+"""
+Bulk ingestion of a corpus directory, resumable after a failure or restart
+
+Run from the command line with:
+
+    python -m src.core.ingestion [--tenant hr] [--reset] [--fresh] [--status]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+from config.settings import settings
+from src.core.document_loader import SUPPORTED_EXTENSIONS, DocumentLoader
+from src.core.folder_watcher import acquire_owner_lock
+from src.core.ingestion_checkpoint import IngestionCheckpoint
+from src.retrieval.tenants import tenant_paths, validate_tenant
+from src.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+
+class NoDocumentsError(Exception):
+    """Raised when the corpus directory holds no loadable documents"""
+
+
+class IngestionBusy(Exception):
+    """Raised when another process is already ingesting the same corpus"""
+
+
+class IngestionResult(NamedTuple):
+    documents: int
+    chunks: int
+    duplicates_removed: int
+    generation: int
+    resumed: bool
+
+
+def checkpoint_path(tenant: Optional[str]) -> Path:
+    """Checkpoint directory of a tenant, next to its sparse index"""
+    return Path(tenant_paths(tenant).sparse_index_path).parent / "ingest_checkpoint"
+
+
+def checkpoint_status(tenant: Optional[str]) -> Optional[Dict]:
+    """Progress of an interrupted ingestion of the tenant, or None if there is none"""
+    return IngestionCheckpoint.status(str(checkpoint_path(tenant)))
+
+
+def load_documents(data_path: Path, checkpoint: IngestionCheckpoint) -> List[Dict]:
+    """Parse every document in data_path, reusing the checkpoint's parses of unchanged files"""
+    files = sorted(p for p in data_path.iterdir() if p.suffix.lower() in SUPPORTED_EXTENSIONS) if data_path.exists() else []
+    loader = DocumentLoader(data_path=str(data_path))
+    documents = []
+    reused = 0
+    
+    for file_path in files:
+        document = checkpoint.parsed_document(file_path)
+        if document is not None:
+            reused += 1
+        else:
+            try:
+                document = loader.load_document(str(file_path))
+            except Exception as e:
+                log.error("Failed to load {}: {}", file_path.name, e)
+                continue
+            if document is None:
+                continue
+            checkpoint.record_document(file_path, document)
+        documents.append(document)
+    
+    log.info("Loaded {} of {} documents ({} from the checkpoint)", len(documents), len(files), reused)
+    return documents
+
+
+def run_ingestion(retriever, tenant: Optional[str], reset_existing: bool, resume: bool = True) -> IngestionResult:
+    """
+    Load, chunk, embed and index a tenant's documents under a durable checkpoint
+    
+    A run that fails (provider errors, a restart) leaves its checkpoint on
+    disk; the next run with the same parameters continues from it unless
+    resume is False. Only one process ingests a corpus at a time.
+    """
+    from src.core.deduplicator import ChunkDeduplicator
+    from src.core.semantic_chunker import SemanticChunker
+    
+    path = checkpoint_path(tenant)
+    lock = acquire_owner_lock(str(path.with_name(path.name + ".lock")))
+    if lock is None:
+        raise IngestionBusy(f"Another process is already indexing corpus '{validate_tenant(tenant)}'")
+    
+    try:
+        data_path = Path(tenant_paths(tenant).data_path)
+        checkpoint = IngestionCheckpoint.open(str(path), {
+            "tenant": validate_tenant(tenant),
+            "data_path": str(data_path),
+            "reset_existing": reset_existing,
+            "embedding_model": settings.embedding_model,
+        }, resume=resume)
+        if checkpoint.abandoned_generation is not None:
+            # A discarded full rebuild never went live; its files are garbage
+            retriever.drop_unused(checkpoint.abandoned_generation)
+        
+        docs = load_documents(data_path, checkpoint)
+        if not docs:
+            checkpoint.clear()
+            raise NoDocumentsError(f"No documents found in {data_path}/ directory")
+        
+        # Drop exact duplicate documents before paying to chunk them
+        deduplicator = ChunkDeduplicator() if settings.dedup_enabled else None
+        if deduplicator:
+            docs = deduplicator.deduplicate_documents(docs)
+        
+        # Chunking is deterministic, so a resumed run gets the same chunks back
+        chunks = SemanticChunker().chunk_documents(docs)
+        total_chunks = len(chunks)
+        if deduplicator:
+            chunks = deduplicator.deduplicate_chunks(chunks)
+        
+        # A full rebuild goes into a new generation; the live one keeps serving
+        if reset_existing:
+            retriever.rebuild(chunks, checkpoint=checkpoint)
+        else:
+            retriever.index_chunks(chunks, checkpoint=checkpoint)
+        
+        resumed = checkpoint.resumed
+        checkpoint.clear()
+        log.info("Ingestion completed: {} documents, {} chunks{}", len(docs), len(chunks), " (resumed)" if resumed else "")
+        return IngestionResult(len(docs), len(chunks), total_chunks - len(chunks), retriever.generation, resumed)
+    finally:
+        lock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index a corpus directory, resuming an interrupted run")
+    parser.add_argument("--tenant", default=None, help="Tenant corpus to index (default corpus when omitted)")
+    parser.add_argument("--reset", action="store_true", help="Rebuild into a new index generation")
+    parser.add_argument("--fresh", action="store_true", help="Discard an interrupted run instead of resuming it")
+    parser.add_argument("--status", action="store_true", help="Only show the progress of an interrupted run")
+    args = parser.parse_args()
+    
+    if args.status:
+        status = checkpoint_status(args.tenant)
+        print(json.dumps(status, indent=2, ensure_ascii=False) if status else "No interrupted ingestion")
+        return
+    
+    from src.retrieval.tenants import TenantRegistry
+    
+    retriever = TenantRegistry().get(args.tenant)
+    try:
+        result = run_ingestion(retriever, args.tenant, reset_existing=args.reset, resume=not args.fresh)
+    except (NoDocumentsError, IngestionBusy) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"Ingestion failed: {e}; run the same command again to resume", file=sys.stderr)
+        sys.exit(1)
+    
+    print(
+        f"Indexed {result.documents} documents, {result.chunks} chunks "
+        f"({result.duplicates_removed} duplicates removed) into generation {result.generation}"
+        + (" after resuming" if result.resumed else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Durable checkpoints that let an interrupted reindex resume where it stopped
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from src.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+CHECKPOINT_VERSION = 1
+
+
+def _fingerprint(path: Path) -> List[int]:
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _write_json(path: Path, data):
+    """Write through a temporary file so a crash never leaves a torn file behind"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: Path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class IngestionCheckpoint:
+    """
+    On-disk record of one reindex run
+    
+    Layout of the checkpoint directory:
+        manifest.json   run parameters, parsed documents, finished index writes
+        documents/      one JSON file per parsed document
+        vectors/        embedding batches (.npy) with the keys of their texts (.json)
+    
+    A later run with the same parameters reuses the parsed documents whose
+    files did not change, every stored vector (keyed by chunk text) and the
+    index writes that already finished, including the half-built index
+    generation of a full rebuild. The directory is removed once a run
+    completes.
+    """
+    
+    def __init__(self, path: str, params: Dict):
+        self.path = Path(path)
+        self.params = params
+        self.manifest = self._new_manifest()
+        self.resumed = False
+        # Generation of a discarded checkpoint, for the caller to drop
+        self.abandoned_generation: Optional[int] = None
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._batches = 0
+    
+    def _new_manifest(self) -> Dict:
+        return {
+            "version": CHECKPOINT_VERSION,
+            "params": self.params,
+            "documents": {},
+            "stages": {},
+            "generation": None,
+            "attempts": 0,
+            "created_at": time.time(),
+        }
+    
+    @classmethod
+    def open(cls, path: str, params: Dict, resume: bool = True) -> "IngestionCheckpoint":
+        """Continue the checkpoint at path if it was made with the same parameters, else start over"""
+        checkpoint = cls(path, params)
+        existing = _read_json(checkpoint.path / "manifest.json")
+        if existing is not None:
+            if resume and existing.get("version") == CHECKPOINT_VERSION and existing.get("params") == params:
+                checkpoint.manifest = existing
+                checkpoint._load_vectors()
+                checkpoint.resumed = True
+                log.info(
+                    "Resuming ingestion: {} documents parsed, {} chunks embedded, stages done: {}",
+                    len(existing["documents"]), len(checkpoint._vectors), sorted(existing["stages"])
+                )
+            else:
+                log.info("Discarding ingestion checkpoint {}", checkpoint.path)
+                checkpoint.abandoned_generation = existing.get("generation")
+                checkpoint.clear()
+        
+        (checkpoint.path / "documents").mkdir(parents=True, exist_ok=True)
+        (checkpoint.path / "vectors").mkdir(parents=True, exist_ok=True)
+        checkpoint.manifest["attempts"] += 1
+        checkpoint._save()
+        return checkpoint
+    
+    @staticmethod
+    def status(path: str) -> Optional[Dict]:
+        """Progress of the checkpoint at path without loading its vectors; None if there is none"""
+        manifest = _read_json(Path(path) / "manifest.json")
+        if manifest is None:
+            return None
+        embedded = sum(
+            len(_read_json(keys_path) or [])
+            for keys_path in (Path(path) / "vectors").glob("*.json")
+        )
+        return {
+            "params": manifest["params"],
+            "attempts": manifest["attempts"],
+            "documents_parsed": len(manifest["documents"]),
+            "chunks_embedded": embedded,
+            "stages": manifest["stages"],
+            "generation": manifest["generation"],
+            "created_at": manifest["created_at"],
+            "updated_at": manifest.get("updated_at"),
+        }
+    
+    def _save(self):
+        self.manifest["updated_at"] = time.time()
+        _write_json(self.path / "manifest.json", self.manifest)
+    
+    def _load_vectors(self):
+        # A batch counts once its keys file exists; the keys are written after the vectors
+        for keys_path in sorted((self.path / "vectors").glob("*.json")):
+            keys = _read_json(keys_path)
+            try:
+                vectors = np.load(keys_path.with_suffix(".npy"))
+            except (OSError, ValueError):
+                continue
+            if keys is None or len(keys) != len(vectors):
+                continue
+            self._vectors.update(zip(keys, vectors))
+            self._batches = max(self._batches, int(keys_path.stem) + 1)
+    
+    def clear(self):
+        """Delete the checkpoint from disk"""
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.manifest = self._new_manifest()
+        self._vectors = {}
+        self._batches = 0
+    
+    # Documents
+    
+    def parsed_document(self, file_path: Path) -> Optional[Dict]:
+        """Stored parse of a document file, unless the file changed since"""
+        entry = self.manifest["documents"].get(file_path.name)
+        if entry is None or entry["fingerprint"] != _fingerprint(file_path):
+            return None
+        return _read_json(self.path / "documents" / entry["file"])
+    
+    def record_document(self, file_path: Path, document: Dict):
+        name = f"{_text_key(file_path.name)}.json"
+        _write_json(self.path / "documents" / name, document)
+        self.manifest["documents"][file_path.name] = {"fingerprint": _fingerprint(file_path), "file": name}
+        self._save()
+    
+    # Embeddings
+    
+    def vector(self, text: str) -> Optional[np.ndarray]:
+        return self._vectors.get(_text_key(text))
+    
+    def record_vectors(self, texts: List[str], vectors: List[List[float]]):
+        keys = [_text_key(text) for text in texts]
+        array = np.asarray(vectors, dtype=np.float32)
+        stem = self.path / "vectors" / f"{self._batches:06d}"
+        with open(stem.with_suffix(".npy.tmp"), "wb") as f:
+            np.save(f, array)
+        os.replace(stem.with_suffix(".npy.tmp"), stem.with_suffix(".npy"))
+        _write_json(stem.with_suffix(".json"), keys)
+        self._batches += 1
+        self._vectors.update(zip(keys, array))
+    
+    def embeddings(self, embedding_manager) -> "CheckpointedEmbeddings":
+        return CheckpointedEmbeddings(embedding_manager, self)
+    
+    # Index writes
+    
+    @property
+    def generation(self) -> Optional[int]:
+        """Index generation a full rebuild is writing into"""
+        return self.manifest["generation"]
+    
+    def set_generation(self, number: int):
+        self.manifest["generation"] = number
+        self._save()
+    
+    def stage_done(self, stage: str) -> bool:
+        return stage in self.manifest["stages"]
+    
+    def complete_stage(self, stage: str, count: int):
+        self.manifest["stages"][stage] = {"count": count, "completed_at": time.time()}
+        self._save()
+    
+    def get_stats(self) -> Dict:
+        return {
+            "resumed": self.resumed,
+            "attempts": self.manifest["attempts"],
+            "documents_parsed": len(self.manifest["documents"]),
+            "chunks_embedded": len(self._vectors),
+            "stages": sorted(self.manifest["stages"]),
+        }
+
+
+class CheckpointedEmbeddings:
+    """Embedding manager wrapper that stores every batch and never embeds a text twice"""
+    
+    def __init__(self, embedding_manager, checkpoint: IngestionCheckpoint):
+        self.embedding_manager = embedding_manager
+        self.checkpoint = checkpoint
+        self.reused = 0
+    
+    def embed_texts(self, texts: List[str], batch_size: int = 100) -> List[List[float]]:
+        missing = [text for text in dict.fromkeys(texts) if self.checkpoint.vector(text) is None]
+        self.reused += len(texts) - len(missing)
+        
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i:i + batch_size]
+            # Stored before the next batch is requested, so a failure loses at most one batch
+            self.checkpoint.record_vectors(batch, self.embedding_manager.embed_texts(batch, batch_size=batch_size))
+        
+        return [self.checkpoint.vector(text).tolist() for text in texts]
@@ -0,0 +1,142 @@
+"""
+Shared OpenAI client with a tuned, pooled HTTP transport
+"""
+import importlib.util
+import threading
+from typing import Dict, Optional
+import httpx
+import openai
+from openai import OpenAI
+from config.settings import settings
+from src.utils.admission import AdmissionController
+from src.utils.deadline import DeadlineExceeded, remaining
+from src.utils.logger import log
+from src.utils.resilience import CircuitBreaker
+
+_client: Optional[OpenAI] = None
+_client_lock = threading.Lock()
+_breakers: Dict[str, CircuitBreaker] = {}
+_admission: Dict[str, AdmissionController] = {}
+
+
+def _is_provider_failure(error: BaseException) -> bool:
+    """Connection problems, timeouts, rate limits and 5xx count against the provider"""
+    return isinstance(error, (
+        openai.APIConnectionError,
+        openai.RateLimitError,
+        openai.InternalServerError,
+    ))
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def _build_client() -> OpenAI:
+    http2 = settings.openai_http2 and http2_available()
+    http_client = httpx.Client(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.openai_max_connections,
+            max_keepalive_connections=settings.openai_keepalive_connections,
+            keepalive_expiry=settings.openai_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(settings.openai_chat_timeout, connect=settings.openai_connect_timeout),
+    )
+    log.info(
+        "Initialized shared OpenAI client (pool: {}, HTTP/2: {})",
+        settings.openai_max_connections, "on" if http2 else "off"
+    )
+    return OpenAI(
+        api_key=settings.openai_api_key,
+        http_client=http_client,
+        max_retries=settings.openai_max_retries,
+    )
+
+
+def get_openai_client() -> Optional[OpenAI]:
+    """Process-wide OpenAI client, or None when no API key is configured"""
+    global _client
+    if not settings.openai_api_key:
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_client()
+    return _client
+
+
+def deadline_client(client):
+    """
+    The client to call under the current request deadline
+    
+    The SDK retries timeouts with its own backoff, which would run a request
+    several times past its budget; under a deadline there is one attempt,
+    bounded by what is left of it.
+    """
+    if remaining() is None or not isinstance(client, OpenAI):
+        return client
+    return client.with_options(max_retries=0)
+
+
+def get_circuit_breaker(operation: str) -> CircuitBreaker:
+    """Circuit breaker for one provider operation ("embeddings", "chat")"""
+    breaker = _breakers.get(operation)
+    if breaker is None:
+        with _client_lock:
+            breaker = _breakers.setdefault(operation, CircuitBreaker(
+                name=f"openai-{operation}",
+                failure_threshold=settings.circuit_failure_threshold,
+                reset_timeout=settings.circuit_reset_timeout,
+                is_failure=_is_provider_failure
+            ))
+    return breaker
+
+
+def get_admission_controller(operation: str) -> AdmissionController:
+    """Concurrency limit and wait queue for one provider operation"""
+    controller = _admission.get(operation)
+    if controller is None:
+        concurrency = {
+            "embeddings": settings.admission_embedding_concurrency,
+            "chat": settings.admission_chat_concurrency,
+        }.get(operation, settings.admission_chat_concurrency)
+        with _client_lock:
+            controller = _admission.setdefault(operation, AdmissionController(
+                name=f"openai-{operation}",
+                max_concurrency=concurrency,
+                max_queue=settings.admission_max_queue,
+                max_wait=settings.admission_max_wait,
+                batch_max_wait=settings.admission_batch_max_wait,
+                batch_share=settings.admission_batch_share
+            ))
+    return controller
+
+
+def call_provider(operation: str, fn, *args, **kwargs):
+    """
+    Call the provider through its circuit breaker and admission control (if enabled)
+    
+    An open circuit fails fast before the call queues for a slot. A timed
+    out call raises DeadlineExceeded, like a request deadline running out.
+    """
+    if settings.admission_control_enabled:
+        args = (fn, *args)
+        fn = get_admission_controller(operation).call
+    try:
+        if not settings.circuit_breaker_enabled:
+            return fn(*args, **kwargs)
+        return get_circuit_breaker(operation).call(fn, *args, **kwargs)
+    except openai.APITimeoutError as e:
+        raise DeadlineExceeded(f"openai-{operation} timed out") from e
+
+
+def get_provider_stats() -> Dict:
+    """Circuit breaker state per operation"""
+    return {operation: breaker.get_stats() for operation, breaker in _breakers.items()}
+
+
+def get_admission_stats() -> Dict:
+    """Admission control state per operation"""
+    return {operation: controller.get_stats() for operation, controller in _admission.items()}
@@ -0,0 +1,170 @@
+"""
+Streaming PDF loader producing the same paragraph/heading records as DOCX
+"""
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+from pypdf import PdfReader
+from config.settings import settings
+from src.utils.logger import log
+
+# (page index, heading level (0 = paragraph), text)
+_RawRecord = Tuple[int, int, str]
+
+
+def _outline_headings(reader: PdfReader) -> Dict[int, List[Tuple[int, str]]]:
+    """Bookmarks as {page index: [(level, title), ...]}, in outline order"""
+    headings: Dict[int, List[Tuple[int, str]]] = {}
+    
+    def walk(items, level):
+        for item in items:
+            if isinstance(item, list):
+                walk(item, level + 1)
+                continue
+            try:
+                page = reader.get_destination_page_number(item)
+            except Exception:
+                continue
+            title = (item.title or "").strip()
+            if title and page is not None and page >= 0:
+                headings.setdefault(page, []).append((level, title))
+    
+    try:
+        walk(reader.outline, 1)
+    except Exception as e:
+        log.warning("Could not read PDF outline: {}", e)
+    return headings
+
+
+def _page_records(page_index: int, text: str, headings: List[Tuple[int, str]]) -> List[_RawRecord]:
+    """Headings that start on this page, then its text blocks as paragraphs"""
+    records = [(page_index, level, title) for level, title in headings]
+    # The bookmark title usually also appears as a line of page text, above the
+    # body; drop that one copy, and keep later lines that happen to match it
+    titles = [title for _, title in headings]
+    in_body = False
+    block = []
+    for line in (text or "").splitlines() + [""]:
+        line = line.strip()
+        if line and not in_body and line in titles:
+            titles.remove(line)
+        elif line:
+            block.append(line)
+            in_body = True
+        elif block:
+            # Blank lines end a block
+            records.append((page_index, 0, "\n".join(block)))
+            block = []
+    return records
+
+
+def _extract_range(
+    file_path: str,
+    start: int,
+    stop: int,
+    headings: Dict[int, List[Tuple[int, str]]]
+) -> List[_RawRecord]:
+    """Extract pages [start, stop) with a fresh reader (pypdf caches every object it parses)"""
+    reader = PdfReader(file_path)
+    records = []
+    for page_index in range(start, stop):
+        text = reader.pages[page_index].extract_text()
+        records.extend(_page_records(page_index, text, headings.get(page_index, [])))
+    return records
+
+
+class PDFLoader:
+    """
+    Load PDF files as a stream of paragraph records
+    
+    Pages are extracted in ranges of pages_per_task pages, each with its own
+    reader, so parser memory is bounded by a page range rather than the
+    file. Files with at least parallel_min_pages pages have their ranges
+    extracted in worker processes, with at most two ranges per worker in
+    flight; records are still yielded in page order.
+    Sections come from the PDF outline (bookmarks): each bookmark becomes
+    a heading record at the start of its target page.
+    """
+    
+    def __init__(self, pages_per_task: int = None, parallel_min_pages: int = None, workers: int = None):
+        self.pages_per_task = max(1, pages_per_task or settings.pdf_pages_per_task)
+        self.parallel_min_pages = parallel_min_pages or settings.pdf_parallel_min_pages
+        self.workers = workers if workers is not None else settings.pdf_workers
+    
+    def _resolve_workers(self, num_ranges: int) -> int:
+        """Number of extraction processes; 0 means one per CPU"""
+        workers = self.workers if self.workers > 0 else (os.cpu_count() or 1)
+        return max(1, min(workers, num_ranges))
+    
+    @staticmethod
+    def _read_layout(file_path: str) -> Tuple[int, Dict[int, List[Tuple[int, str]]]]:
+        """Page count and outline headings, with a reader that is dropped before extraction"""
+        reader = PdfReader(file_path)
+        return len(reader.pages), _outline_headings(reader)
+    
+    def _iter_raw(self, file_path: str, total_pages: int, headings: Dict[int, List[Tuple[int, str]]]) -> Iterator[_RawRecord]:
+        ranges = [
+            (start, min(start + self.pages_per_task, total_pages))
+            for start in range(0, total_pages, self.pages_per_task)
+        ]
+        workers = self._resolve_workers(len(ranges))
+        
+        if total_pages < self.parallel_min_pages or workers == 1:
+            for start, stop in ranges:
+                yield from _extract_range(file_path, start, stop, headings)
+            return
+        
+        log.debug("Extracting {} pages of {} in {} ranges ({} workers)", total_pages, Path(file_path).name, len(ranges), workers)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            in_flight = deque()
+            for start, stop in ranges:
+                range_headings = {page: headings[page] for page in range(start, stop) if page in headings}
+                in_flight.append(executor.submit(_extract_range, file_path, start, stop, range_headings))
+                if len(in_flight) >= workers * 2:
+                    yield from in_flight.popleft().result()
+            while in_flight:
+                yield from in_flight.popleft().result()
+    
+    def iter_content(self, file_path: str) -> Iterator[Dict]:
+        """Paragraph/heading records in document order, as DocumentLoader produces for DOCX"""
+        yield from self._iter_content(file_path, *self._read_layout(file_path))
+    
+    def _iter_content(self, file_path: str, total_pages: int, headings: Dict[int, List[Tuple[int, str]]]) -> Iterator[Dict]:
+        current_section = None
+        for paragraph_index, (page_index, level, text) in enumerate(self._iter_raw(file_path, total_pages, headings)):
+            is_heading = level > 0
+            if is_heading:
+                current_section = text
+            yield {
+                "text": text,
+                "paragraph_index": paragraph_index,
+                "is_heading": is_heading,
+                "heading_level": level,
+                "section": current_section,
+                "style": f"Heading {level}" if is_heading else "Normal",
+                "page": page_index + 1,
+            }
+    
+    def load_document(self, file_path: str) -> Dict:
+        """Load a single PDF document"""
+        file_name = Path(file_path).name
+        total_pages, headings = self._read_layout(file_path)
+        content = list(self._iter_content(file_path, total_pages, headings))
+        
+        return {
+            "file_name": file_name,
+            "file_path": file_path,
+            "content": content,
+            "full_text": "\n".join([p["text"] for p in content]),
+            "metadata": {
+                "source": file_name,
+                "total_paragraphs": len(content),
+                "total_pages": total_pages,
+            }
+        }
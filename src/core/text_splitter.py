@@ -0,0 +1,172 @@
+"""
+Boundary-aware text splitter with character or token lengths
+"""
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Callable, List, Tuple
+
+# Paragraph breaks and sentence ends (., !, ?, 。 followed by whitespace)
+_BOUNDARY_PATTERN = re.compile(r"\n+|(?<=[.!?。])[ \t]+")
+_WORD_PATTERN = re.compile(r"\S+\s*")
+
+# Rough token approximation used when tiktoken is unavailable:
+# one token per Hangul syllable, per Latin word, per number and per symbol
+_APPROX_TOKEN_PATTERN = re.compile(r"[가-힣]|[A-Za-z]+|\d+|[^\sA-Za-z\d가-힣]")
+
+LENGTH_UNITS = ("chars", "tokens")
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the tokenizer used by OpenAI embedding/LLM models, if available"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken, falling back to an approximation"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode_ordinary(text))
+    return len(_APPROX_TOKEN_PATTERN.findall(text))
+
+
+def _batch_lengths(texts: List[str], unit: str) -> List[int]:
+    """Measure many texts in one call"""
+    if unit == "chars":
+        return [len(t) for t in texts]
+    encoding = _get_encoding()
+    if encoding is not None:
+        return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+    return [len(_APPROX_TOKEN_PATTERN.findall(t)) for t in texts]
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text on paragraph and sentence boundaries, keeping trailing separators"""
+    units = []
+    start = 0
+    for match in _BOUNDARY_PATTERN.finditer(text):
+        end = match.end()
+        if end > start:
+            units.append(text[start:end])
+        start = end
+    if start < len(text):
+        units.append(text[start:])
+    return units
+
+
+def get_length_function(unit: str) -> Callable[[str], int]:
+    """Length function for the given unit ("chars" or "tokens")"""
+    if unit not in LENGTH_UNITS:
+        raise ValueError(f"Unknown length unit: {unit} (expected one of {LENGTH_UNITS})")
+    return len if unit == "chars" else count_tokens
+
+
+class TextSplitter:
+    """
+    Split text into overlapping chunks in a single linear pass
+    
+    Boundaries (paragraphs, then sentences) are computed once up front.
+    Units are packed greedily into a sliding window. When the window would
+    overflow, it is emitted as a chunk and trimmed from the left down to
+    the overlap. Units larger than a chunk are broken on words, then hard
+    split.
+    """
+    
+    def __init__(self, chunk_size: int, chunk_overlap: int, length_unit: str = "chars"):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(
+                f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})"
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length_unit = length_unit
+        self.length_function = get_length_function(length_unit)
+    
+    def split_text(self, text: str) -> List[str]:
+        """Split text into chunks no longer than chunk_size"""
+        units = self._measured_units(text)
+        
+        chunks = []
+        window = deque()
+        window_length = 0
+        
+        for unit, length in units:
+            if window and window_length + length > self.chunk_size:
+                self._emit(window, chunks)
+                # Keep the tail of the window as overlap for the next chunk
+                while window and (
+                    window_length > self.chunk_overlap
+                    or window_length + length > self.chunk_size
+                ):
+                    window_length -= window.popleft()[1]
+            
+            window.append((unit, length))
+            window_length += length
+        
+        if window:
+            self._emit(window, chunks)
+        
+        return chunks
+    
+    def _measured_units(self, text: str) -> List[Tuple[str, int]]:
+        """Boundary units with their lengths, with oversized units broken down"""
+        units = split_sentences(text)
+        measured = []
+        
+        for unit, length in zip(units, _batch_lengths(units, self.length_unit)):
+            if length <= self.chunk_size:
+                measured.append((unit, length))
+            else:
+                measured.extend(self._split_oversized(unit))
+        
+        return measured
+    
+    def _split_oversized(self, unit: str) -> List[Tuple[str, int]]:
+        """Break a unit longer than chunk_size into words, then character slices"""
+        pieces = []
+        words = _WORD_PATTERN.findall(unit)
+        
+        for word, length in zip(words, _batch_lengths(words, self.length_unit)):
+            if length <= self.chunk_size:
+                pieces.append((word, length))
+                continue
+            # A character can cost several tokens (Hangul is 2-3 in cl100k),
+            # so each slice is measured rather than cut at chunk_size characters
+            start = 0
+            while start < len(word):
+                end = self._slice_end(word, start)
+                piece = word[start:end]
+                pieces.append((piece, self.length_function(piece)))
+                start = end
+        
+        return pieces
+    
+    def _slice_end(self, word: str, start: int) -> int:
+        """End of the longest slice of word from start that fits chunk_size (at least one character)"""
+        def fits(end: int) -> bool:
+            return self.length_function(word[start:end]) <= self.chunk_size
+        
+        low, high = start + 1, min(start + self.chunk_size, len(word))
+        # Double the slice until it overflows, then bisect between the two
+        while fits(high):
+            if high == len(word):
+                return high
+            low, high = high, min(start + 2 * (high - start), len(word))
+        while high - low > 1:
+            middle = (low + high) // 2
+            if fits(middle):
+                low = middle
+            else:
+                high = middle
+        return low
+    
+    @staticmethod
+    def _emit(window: deque, chunks: List[str]):
+        text = "".join(unit for unit, _ in window).strip()
+        if text:
+            chunks.append(text)
@@ -0,0 +1,186 @@
+"""
+Query-focused compression of retrieved chunks before generation
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from config.settings import settings
+from src.core.embeddings import EmbeddingManager
+from src.core.text_splitter import split_sentences
+from src.generation.extractive import tokenize
+from src.retrieval.bm25_index import BM25Shard, BM25Statistics, ShardSummary
+from src.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+# Marks sentences left out between (or around) the kept ones
+GAP_MARKER = "…"
+
+
+class ContextCompressor:
+    """
+    Reduce each retrieved chunk to the sentences that answer the question
+    
+    Sentences are scored with BM25 over the sentences of all retrieved
+    chunks and, when embeddings are available, cosine similarity to the
+    question. Each chunk keeps its best sentences plus their neighbours.
+    Chunks are never dropped or reordered, so [문서 N] citations keep
+    pointing at the same sources. Sentence embeddings are cached, since
+    the same chunks come back for related questions.
+    """
+    
+    def __init__(
+        self,
+        embedding_manager: EmbeddingManager = None,
+        sentences: int = None,
+        neighbors: int = None,
+        semantic_weight: float = None,
+        cache_size: int = None
+    ):
+        self.embedding_manager = embedding_manager
+        self.sentences = sentences if sentences is not None else settings.context_compression_sentences
+        self.neighbors = neighbors if neighbors is not None else settings.context_compression_neighbors
+        self.semantic_weight = (
+            semantic_weight if semantic_weight is not None else settings.context_compression_semantic_weight
+        )
+        self.cache_size = cache_size if cache_size is not None else settings.context_compression_cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self.compressed_chunks = 0
+        self.input_chars = 0
+        self.output_chars = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.semantic_failures = 0
+    
+    def compress(self, question: str, chunks: List[Dict]) -> List[Dict]:
+        """Copies of the chunks with their text reduced to the selected sentences"""
+        units = [[s.strip() for s in split_sentences(chunk["text"]) if s.strip()] for chunk in chunks]
+        flat = [(index, position) for index, sentences in enumerate(units) for position in range(len(sentences))]
+        if not flat:
+            return [dict(chunk) for chunk in chunks]
+        scores = self._score(question, [units[index][position] for index, position in flat])
+        
+        ranked = [[] for _ in chunks]
+        for (index, position), score in zip(flat, scores):
+            ranked[index].append((-score, position))
+        
+        compressed = []
+        for chunk, sentences, candidates in zip(chunks, units, ranked):
+            keep = set()
+            for _, position in sorted(candidates)[:self.sentences]:
+                keep.update(range(max(0, position - self.neighbors), min(len(sentences), position + self.neighbors + 1)))
+            # A chunk that keeps everything keeps its own formatting
+            text = chunk["text"] if len(keep) == len(sentences) else self._join(sentences, keep)
+            compressed.append({**chunk, "text": text})
+        
+        input_chars = sum(len(chunk["text"]) for chunk in chunks)
+        output_chars = sum(len(chunk["text"]) for chunk in compressed)
+        with self._lock:
+            self.compressed_chunks += len(chunks)
+            self.input_chars += input_chars
+            self.output_chars += output_chars
+        log.debug("Compressed context from {} to {} chars", input_chars, output_chars)
+        return compressed
+    
+    @staticmethod
+    def _join(sentences: List[str], keep: set) -> str:
+        """Kept sentences in document order, with a marker wherever sentences were left out"""
+        parts = []
+        for position, sentence in enumerate(sentences):
+            if position in keep:
+                parts.append(sentence)
+            elif not parts or parts[-1] != GAP_MARKER:
+                parts.append(GAP_MARKER)
+        return " ".join(parts)
+    
+    def _score(self, question: str, sentences: List[str]):
+        """Relevance of each sentence: normalized BM25, blended with embedding similarity"""
+        shard = BM25Shard(list(range(len(sentences))), [tokenize(s) for s in sentences])
+        statistics = BM25Statistics()
+        statistics.add(ShardSummary(shard))
+        query_terms = tokenize(question)
+        
+        lexical = np.zeros(len(sentences))
+        hits = shard.top_k(
+            query_terms,
+            statistics.idf(query_terms),
+            statistics.avgdl or 1.0,
+            len(sentences),
+            statistics.k1,
+            statistics.b
+        )
+        for row, score in hits:
+            lexical[row] = score
+        if lexical.max() > 0:
+            lexical /= lexical.max()
+        
+        if self.semantic_weight <= 0:
+            return lexical
+        semantic = self._similarities(question, sentences)
+        if semantic is None:
+            return lexical
+        return (1 - self.semantic_weight) * lexical + self.semantic_weight * semantic
+    
+    def _similarities(self, question: str, sentences: List[str]) -> Optional[np.ndarray]:
+        """Cosine similarity of each sentence to the question; None without embeddings"""
+        if self.embedding_manager is None:
+            # Thin generation workers have no dense retriever to borrow one from
+            self.embedding_manager = EmbeddingManager()
+        if not self.embedding_manager.client:
+            return None
+        
+        try:
+            vectors = self._embed([question] + sentences)
+        except Exception as e:
+            # Lexical scores alone still make a usable selection
+            with self._lock:
+                self.semantic_failures += 1
+            log.warning("Sentence embeddings unavailable, compressing lexically: {}", e)
+            return None
+        
+        matrix = np.vstack(vectors)
+        norms = np.linalg.norm(matrix, axis=1)
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms[:, None]
+        return np.clip(matrix[1:] @ matrix[0], 0.0, None)
+    
+    def _embed(self, texts: List[str]) -> List[np.ndarray]:
+        """Embeddings of the texts, from the cache where possible"""
+        found = {}
+        with self._lock:
+            for text in texts:
+                if text in self._cache:
+                    self._cache.move_to_end(text)
+                    found[text] = self._cache[text]
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        
+        if missing:
+            vectors = self.embedding_manager.embed_texts(missing, batch_size=settings.embedding_batch_size)
+            for text, vector in zip(missing, vectors):
+                found[text] = np.asarray(vector, dtype=np.float32)
+            with self._lock:
+                for text in missing:
+                    self._cache[text] = found[text]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        
+        with self._lock:
+            self.cache_hits += len(texts) - len(missing)
+            self.cache_misses += len(missing)
+        return [found[text] for text in texts]
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "compressed_chunks": self.compressed_chunks,
+                "input_chars": self.input_chars,
+                "output_chars": self.output_chars,
+                "ratio": self.output_chars / self.input_chars if self.input_chars else 1.0,
+                "cached_sentences": len(self._cache),
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "semantic_failures": self.semantic_failures,
+            }
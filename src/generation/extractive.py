@@ -0,0 +1,56 @@
+"""
+Extractive answers from retrieved chunks, without an LLM call
+"""
+import math
+import re
+from typing import Dict, List, Set, Tuple
+from src.core.text_splitter import split_sentences
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Words and their character bigrams, so Korean words match despite different particles"""
+    tokens = []
+    for word in _WORD_PATTERN.findall(text.lower()):
+        tokens.append(word)
+        tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def _terms(text: str) -> Set[str]:
+    return set(tokenize(text))
+
+
+def rank_sentences(question: str, text: str) -> List[Tuple[float, int, str]]:
+    """Sentences of text as (score, position, sentence), most relevant to the question first"""
+    question_terms = _terms(question)
+    ranked = []
+    for position, sentence in enumerate(split_sentences(text)):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        terms = _terms(sentence)
+        # Overlap, damped so long sentences do not win on length alone
+        score = len(question_terms & terms) / math.sqrt(len(terms)) if terms else 0.0
+        ranked.append((score, position, sentence))
+    ranked.sort(key=lambda item: (-item[0], item[1]))
+    return ranked
+
+
+def extractive_answer(question: str, chunks: List[Dict], max_chunks: int = 3, sentences_per_chunk: int = 2) -> str:
+    """
+    The most relevant sentences of the top chunks, one line per chunk
+    
+    Citations use the [문서 N] numbering of the generation context, so
+    they point at the same sources an LLM answer would cite.
+    """
+    lines = []
+    for number, chunk in enumerate(chunks[:max_chunks], 1):
+        best = rank_sentences(question, chunk["text"])[:sentences_per_chunk]
+        if not best:
+            continue
+        # Keep the document's own order within a chunk
+        excerpt = " ".join(sentence for _, _, sentence in sorted(best, key=lambda item: item[1]))
+        lines.append(f"- {excerpt} [문서 {number}]")
+    return "\n".join(lines)
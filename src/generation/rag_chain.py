@@ -2,29 +2,62 @@
 RAG Chain for Grounded Answer Generation
 """
 from typing import List, Dict, Optional
-from openai import OpenAI
 from config.settings import settings
-from src.retrieval.hybrid_retriever import HybridRetriever
-from src.utils.logger import log
+from src.core.openai_client import call_provider, deadline_client, get_admission_stats, get_openai_client, get_provider_stats
+from src.core.deduplicator import get_source_refs
+from src.generation.extractive import extractive_answer
+from src.utils.admission import AdmissionRejected
+from src.utils.deadline import DeadlineExceeded, after, bound, remaining, scope
+from src.utils.logger import get_logger
+from src.utils.resilience import CircuitOpenError
+from src.utils.singleflight import SingleFlight, WaitTimeout
+
+log = get_logger(__name__)
+
+_DEGRADED_NOTICE = "※ 제한 시간 안에 답변을 생성하지 못해 관련 문서의 핵심 문장을 발췌했습니다."
 
 
 class RAGChain:
     """RAG Chain with grounded generation and citation"""
     
     def __init__(self):
-        self.client = None
-        if settings.openai_api_key:
-            self.client = OpenAI(api_key=settings.openai_api_key)
-        self.retriever = HybridRetriever()
+        self.client = get_openai_client()
+        self.remote = bool(settings.retrieval_service_url)
+        if self.remote:
+            # Thin generation worker: the indexes live in a retrieval service
+            from src.retrieval.remote_retriever import RemoteRetriever, RemoteTenantRegistry
+            
+            self.retriever = RemoteRetriever(settings.retrieval_service_url)
+            self.tenants = RemoteTenantRegistry(default=self.retriever)
+            log.info("Using remote retrieval service: {}", settings.retrieval_service_url)
+        else:
+            from src.retrieval.hybrid_retriever import HybridRetriever
+            from src.retrieval.tenants import TenantRegistry
+            
+            self.retriever = HybridRetriever()
+            self.tenants = TenantRegistry(default=self.retriever)
         self.model = settings.llm_model
-        log.info(f"Initialized RAGChain with model: {self.model}" + 
-                 (" (OpenAI client initialized)" if self.client else " (OpenAI client NOT initialized - API key missing)"))
+        self._inflight = SingleFlight()
+        
+        # Optional: only the sentences that answer the question reach the prompt
+        self.compressor = None
+        if settings.context_compression_enabled:
+            from src.generation.context_compressor import ContextCompressor
+            
+            embedding_manager = None if self.remote else self.retriever.dense_retriever.embedding_manager
+            self.compressor = ContextCompressor(embedding_manager=embedding_manager)
+        log.info(
+            "Initialized RAGChain with model: {} ({})",
+            self.model, "OpenAI client initialized" if self.client else "OpenAI client NOT initialized - API key missing"
+        )
     
     def query(
         self,
         question: str,
         top_k: int = None,
-        include_sources: bool = True
+        include_sources: bool = True,
+        tenant: Optional[str] = None,
+        deadline: Optional[float] = None
     ) -> Dict:
         """
         Process a query through the RAG pipeline
@@ -33,14 +66,64 @@ class RAGChain:
             question: User question
             top_k: Number of context chunks to use
             include_sources: Whether to include source information
-            
+            tenant: Corpus to search (default corpus when None)
+            deadline: Absolute time.monotonic() deadline for embedding,
+                retrieval and generation (QUERY_DEADLINE_SECONDS from now when None)
+        
         Returns:
             Dict with answer, sources, and metadata
         """
-        log.info(f"Processing query: {question}")
+        top_k = top_k or settings.top_k_final
+        retriever = self.tenants.get(tenant)
+        expires_at = deadline if deadline is not None else after(settings.query_deadline_seconds)
+        
+        try:
+            with scope(expires_at):
+                if not settings.query_coalescing_enabled:
+                    return self._run_query(question, top_k, include_sources, retriever)
+                
+                result = self._coalesced_query(question, top_k, include_sources, tenant, retriever)
+        finally:
+            self.tenants.enforce_budget(keep=tenant)
+        
+        # Callers must not share mutable containers
+        return {**result, "sources": [dict(s) for s in result["sources"]]}
+    
+    def _coalesced_query(self, question: str, top_k: int, include_sources: bool, tenant: Optional[str], retriever) -> Dict:
+        """Share one computation between identical questions in flight, within each caller's own deadline"""
+        key = (tenant, self._normalize_question(question), top_k, include_sources)
+        led = False
+        
+        def run():
+            nonlocal led
+            led = True
+            return self._run_query(question, top_k, include_sources, retriever)
+        
+        try:
+            result = self._inflight.do(key, run, timeout=remaining())
+        except WaitTimeout:
+            # This request's budget ran out first; answer from its own retrieval without generating
+            return self._run_query(question, top_k, include_sources, retriever, generate=False)
+        
+        left = remaining()
+        if not led and result.get("degraded_reason") in ("deadline", "timeout") and (
+            left is None or left >= settings.query_min_generation_seconds
+        ):
+            # The request that computed the answer had less time than this one
+            return self._run_query(question, top_k, include_sources, retriever)
+        return result
+    
+    @staticmethod
+    def _normalize_question(question: str) -> str:
+        """Normalize whitespace and case so trivially different questions coalesce"""
+        return " ".join(question.split()).casefold()
+    
+    def _run_query(self, question: str, top_k: int, include_sources: bool, retriever, generate: bool = True) -> Dict:
+        """Run retrieval and generation for a single question (extractive answer only when generate is False)"""
+        log.debug("Processing query: {:.80}", question)
         
         # Step 1: Retrieve relevant chunks
-        retrieved_chunks = self.retriever.search(question, top_k=top_k)
+        retrieved_chunks = retriever.search(question, top_k=top_k)
         
         if not retrieved_chunks:
             return {
@@ -51,13 +134,37 @@ class RAGChain:
                 "model": self.model
             }
         
-        log.info(f"Retrieved {len(retrieved_chunks)} relevant chunks")
+        log.debug("Retrieved {} relevant chunks", len(retrieved_chunks))
         
-        # Step 2: Build context from retrieved chunks
-        context = self._build_context(retrieved_chunks)
+        # Step 2: Build context from retrieved chunks (compressed to the relevant sentences if enabled)
+        context_chunks = retrieved_chunks
+        if self.compressor:
+            context_chunks = self.compressor.compress(question, retrieved_chunks)
+        context = self._build_context(context_chunks)
         
-        # Step 3: Generate answer with LLM
-        answer, confidence = self._generate_answer(question, context)
+        # Step 3: Generate answer with LLM, unless the deadline leaves no time for it
+        degraded_reason = None
+        left = remaining()
+        if not generate or (left is not None and left < settings.query_min_generation_seconds):
+            degraded_reason = "deadline"
+        else:
+            try:
+                answer, confidence = self._generate_answer(question, context)
+            except AdmissionRejected:
+                # Overload is reported to the caller (503), not as an answer
+                raise
+            except DeadlineExceeded:
+                degraded_reason = "timeout"
+            except CircuitOpenError:
+                degraded_reason = "provider_unavailable"
+            except Exception as e:
+                log.error("Error generating answer: {}", e)
+                degraded_reason = "provider_error"
+        
+        # Fallback: sentences extracted from the top chunks, with citations
+        if degraded_reason:
+            log.warning("Returning an extractive answer ({})", degraded_reason)
+            answer, confidence = self._extractive_answer(question, retrieved_chunks, context)
         
         # Step 4: Extract source citations
         sources = self._extract_sources(retrieved_chunks) if include_sources else []
@@ -67,7 +174,9 @@ class RAGChain:
             "sources": sources,
             "confidence": confidence,
             "retrieved_chunks": len(retrieved_chunks),
-            "model": self.model
+            "model": self.model if not degraded_reason else "extractive",
+            "degraded": degraded_reason is not None,
+            "degraded_reason": degraded_reason
         }
     
     def _build_context(self, chunks: List[Dict]) -> str:
@@ -85,8 +194,20 @@ class RAGChain:
         
         return "\n".join(context_parts)
     
+    def _extractive_answer(self, question: str, chunks: List[Dict], context: str) -> tuple[str, float]:
+        """Answer from the top chunks' most relevant sentences, flagged as such"""
+        excerpt = extractive_answer(
+            question,
+            chunks,
+            max_chunks=settings.extractive_answer_chunks,
+            sentences_per_chunk=settings.extractive_sentences_per_chunk
+        )
+        answer = f"{_DEGRADED_NOTICE}\n{excerpt}"
+        # Never as confident as a generated answer
+        return answer, min(0.5, self._calculate_confidence(answer, context))
+    
     def _generate_answer(self, question: str, context: str) -> tuple[str, float]:
-        """Generate grounded answer using LLM"""
+        """Generate grounded answer using LLM (provider errors propagate)"""
         
         # Return mock answer if OpenAI client is not available
         if not self.client:
@@ -122,28 +243,26 @@ class RAGChain:
 
 답변:"""
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=settings.temperature,
-                max_tokens=settings.max_tokens
-            )
-            
-            answer = response.choices[0].message.content
-            
-            # Calculate confidence based on response quality
-            confidence = self._calculate_confidence(answer, context)
-            
-            log.debug(f"Generated answer with confidence: {confidence:.2f}")
-            return answer, confidence
-            
-        except Exception as e:
-            log.error(f"Error generating answer: {e}")
-            return f"답변 생성 중 오류가 발생했습니다: {str(e)}", 0.0
+        response = call_provider(
+            "chat",
+            deadline_client(self.client).chat.completions.create,
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=settings.temperature,
+            max_tokens=settings.max_tokens,
+            timeout=bound(settings.openai_chat_timeout)
+        )
+        
+        answer = response.choices[0].message.content
+        
+        # Calculate confidence based on response quality
+        confidence = self._calculate_confidence(answer, context)
+        
+        log.debug("Generated answer with confidence: {:.2f}", confidence)
+        return answer, confidence
     
     def _calculate_confidence(self, answer: str, context: str) -> float:
         """
@@ -178,15 +297,17 @@ class RAGChain:
         sources_dict = {}
         
         for chunk in chunks:
-            source = chunk["metadata"]["source"]
-            if source not in sources_dict:
-                sources_dict[source] = {
-                    "file_name": source,
-                    "sections": set()
-                }
-            
-            section = chunk["metadata"].get("section_title", "Unknown")
-            sources_dict[source]["sections"].add(section)
+            # Collapsed duplicates cite every file they were found in
+            for ref in get_source_refs(chunk["metadata"]):
+                source = ref["source"]
+                if source not in sources_dict:
+                    sources_dict[source] = {
+                        "file_name": source,
+                        "sections": set()
+                    }
+                
+                section = ref.get("section_title") or "Unknown"
+                sources_dict[source]["sections"].add(section)
         
         # Convert to list format
         sources = []
@@ -198,9 +319,39 @@ class RAGChain:
         
         return sources
     
-    def get_retriever_stats(self) -> Dict:
+    def warmup(self):
+        """Warm indexes and provider connections before serving traffic"""
+        self.retriever.warmup()
+        
+        # One small embedding call opens the provider connection pool
+        # (a remote retrieval service embeds queries itself). Best effort:
+        # a provider hiccup must not keep a worker with loaded indexes unready.
+        if not self.remote:
+            embedding_manager = self.retriever.dense_retriever.embedding_manager
+            if settings.warmup_embedding and embedding_manager.client:
+                try:
+                    embedding_manager.embed_text("warmup")
+                except Exception as e:
+                    log.warning("Embedding provider warmup failed, continuing: {}", e)
+        
+        log.info("RAG chain warmup completed")
+    
+    def get_retriever_stats(self, tenant: Optional[str] = None) -> Dict:
         """Get retriever statistics"""
-        return self.retriever.get_stats()
+        stats = self.tenants.get(tenant).get_stats()
+        if not self.remote:
+            # A retrieval service reports its own tenants and embedding hedging
+            stats["tenants"] = self.tenants.get_stats()
+        stats["coalescing"] = self._inflight.get_stats()
+        if self.compressor:
+            stats["compression"] = self.compressor.get_stats()
+        stats["provider"] = {
+            "circuits": get_provider_stats(),
+            "admission": get_admission_stats(),
+        }
+        if not self.remote:
+            stats["provider"]["hedging"] = self.retriever.dense_retriever.embedding_manager.get_stats()
+        return stats
 
 
 if __name__ == "__main__":
@@ -222,9 +373,9 @@ if __name__ == "__main__":
         # Test query
         result = rag.query("이 문서의 주요 내용을 요약해주세요")
         
-        log.info(f"\n질문: 이 문서의 주요 내용을 요약해주세요")
-        log.info(f"\n답변: {result['answer']}")
-        log.info(f"\n신뢰도: {result['confidence']:.2f}")
-        log.info(f"\n출처: {result['sources']}")
+        log.info("\n질문: 이 문서의 주요 내용을 요약해주세요")
+        log.info("\n답변: {}", result["answer"])
+        log.info("\n신뢰도: {:.2f}", result["confidence"])
+        log.info("\n출처: {}", result["sources"])
     else:
         log.warning("No documents found. Please add DOCX files to data/raw/")
@@ -0,0 +1,282 @@
+"""
+BM25 shards, corpus-wide statistics and scatter-gather top-k scoring
+"""
+import math
+import multiprocessing
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Hashable, List, Tuple
+import numpy as np
+
+# Shards held by a worker process, keyed by the parent's shard key
+_WORKER_SHARDS: Dict[Hashable, "BM25Shard"] = {}
+
+# Rough per-term cost of a postings entry beyond its arrays (dict slot, key, tuple, array headers)
+TERM_OVERHEAD_BYTES = 300
+
+
+class BM25Shard:
+    """Inverted index over a slice of the corpus"""
+    
+    def __init__(self, doc_ids: List[int], tokenized_docs: List[List[str]]):
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        self.doc_lengths = np.array([len(doc) for doc in tokenized_docs], dtype=np.float64)
+        
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        for local_id, doc in enumerate(tokenized_docs):
+            for term, freq in Counter(doc).items():
+                entry = postings.setdefault(term, ([], []))
+                entry[0].append(local_id)
+                entry[1].append(freq)
+        
+        self.postings = {
+            term: (np.array(ids, dtype=np.int32), np.array(freqs, dtype=np.float32))
+            for term, (ids, freqs) in postings.items()
+        }
+    
+    def nbytes(self) -> int:
+        """Estimated memory held by this shard"""
+        postings = sum(ids.nbytes + freqs.nbytes for ids, freqs in self.postings.values())
+        return (
+            self.doc_ids.nbytes + self.doc_lengths.nbytes + postings
+            + len(self.postings) * TERM_OVERHEAD_BYTES
+        )
+    
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+    
+    def document_frequencies(self) -> Dict[str, int]:
+        """Number of documents in this shard containing each term"""
+        return {term: len(ids) for term, (ids, _) in self.postings.items()}
+    
+    def top_k(
+        self,
+        query_terms: List[str],
+        idf: Dict[str, float],
+        avgdl: float,
+        k: int,
+        k1: float,
+        b: float
+    ) -> List[Tuple[int, float]]:
+        """Score this shard with the given global statistics and return its top-k"""
+        if not len(self.doc_ids):
+            return []
+        
+        scores = np.zeros(len(self.doc_ids), dtype=np.float64)
+        norms = k1 * (1 - b + b * self.doc_lengths / avgdl)
+        
+        # Repeated query terms count once per occurrence, as in BM25Okapi
+        for term in query_terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            ids, freqs = posting
+            scores[ids] += idf.get(term, 0.0) * (freqs * (k1 + 1) / (freqs + norms[ids]))
+        
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        
+        return [(int(self.doc_ids[i]), float(scores[i])) for i in candidates]
+
+
+class ShardSummary:
+    """The part of a shard that global statistics need"""
+    
+    def __init__(self, shard: BM25Shard):
+        self.doc_count = len(shard)
+        self.total_length = float(shard.doc_lengths.sum())
+        self.doc_freqs = shard.document_frequencies()
+
+
+class BM25Statistics:
+    """
+    Corpus-wide BM25 statistics maintained incrementally as shards come and go
+    
+    Adding or removing a shard costs time proportional to that shard's
+    vocabulary. IDF is only computed for query terms. BM25Okapi's epsilon
+    floor for negative IDF needs the mean IDF over the whole vocabulary;
+    that is computed lazily, and only when a query contains such a term.
+    """
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.doc_count = 0
+        self.total_length = 0.0
+        self.doc_freqs: Counter = Counter()
+        self._lock = threading.Lock()
+        self._version = 0
+        self._floor_cache: Tuple[int, float] = (-1, 0.0)
+    
+    def add(self, summary: ShardSummary):
+        with self._lock:
+            self.doc_count += summary.doc_count
+            self.total_length += summary.total_length
+            self.doc_freqs.update(summary.doc_freqs)
+            self._version += 1
+    
+    def remove(self, summary: ShardSummary):
+        with self._lock:
+            self.doc_count -= summary.doc_count
+            self.total_length -= summary.total_length
+            self.doc_freqs.subtract(summary.doc_freqs)
+            for term in summary.doc_freqs:
+                if self.doc_freqs[term] <= 0:
+                    del self.doc_freqs[term]
+            self._version += 1
+    
+    @property
+    def avgdl(self) -> float:
+        return self.total_length / self.doc_count if self.doc_count else 0.0
+    
+    def _raw_idf(self, freq: int) -> float:
+        return math.log(self.doc_count - freq + 0.5) - math.log(freq + 0.5)
+    
+    def _negative_idf_floor(self) -> float:
+        """epsilon * mean IDF over the vocabulary, cached until statistics change"""
+        with self._lock:
+            version, floor = self._floor_cache
+            if version != self._version:
+                freqs = list(self.doc_freqs.values())
+                mean = sum(self._raw_idf(f) for f in freqs) / len(freqs) if freqs else 0.0
+                floor = self.epsilon * mean
+                self._floor_cache = (self._version, floor)
+            return floor
+    
+    def idf(self, terms) -> Dict[str, float]:
+        """IDF for the given terms (terms absent from the corpus are omitted)"""
+        result = {}
+        for term in set(terms):
+            freq = self.doc_freqs.get(term, 0)
+            if freq <= 0:
+                continue
+            value = self._raw_idf(freq)
+            result[term] = value if value >= 0 else self._negative_idf_floor()
+        return result
+    
+    def max_idf(self) -> float:
+        """IDF of a term that occurs in a single document"""
+        return self._raw_idf(1) if self.doc_count > 1 else 0.0
+    
+    def get_stats(self) -> Dict:
+        return {
+            "vocabulary_size": len(self.doc_freqs),
+            "avg_doc_length": self.avgdl,
+        }
+
+
+def _worker_add(key: Hashable, shard: BM25Shard):
+    _WORKER_SHARDS[key] = shard
+
+
+def _worker_remove(key: Hashable):
+    _WORKER_SHARDS.pop(key, None)
+
+
+def _worker_top_k(requests, query_terms, idf, avgdl, k1, b):
+    # A shard removed after the request was routed is simply skipped
+    return [
+        (key, _WORKER_SHARDS[key].top_k(query_terms, idf, avgdl, k, k1, b))
+        for key, k in requests
+        if key in _WORKER_SHARDS
+    ]
+
+
+class ShardScorer:
+    """
+    Scatter-gather scoring over a dynamic set of shards
+    
+    In-process by default. With processes > 0 each shard is shipped once to
+    one of N single-process workers, picked as the one holding the fewest
+    documents. Every query then sends one small request per worker, and
+    all workers score their shards in parallel.
+    """
+    
+    def __init__(self, processes: int = 0):
+        self._lock = threading.Lock()
+        self._local: Dict[Hashable, BM25Shard] = {}
+        self._executors: List[ProcessPoolExecutor] = []
+        self._worker_load: List[int] = []
+        self._placement: Dict[Hashable, int] = {}
+        
+        if processes > 0:
+            context = multiprocessing.get_context("spawn")
+            self._executors = [
+                ProcessPoolExecutor(max_workers=1, mp_context=context)
+                for _ in range(processes)
+            ]
+            self._worker_load = [0] * processes
+            # Start the workers now so the first query does not pay for it
+            for future in [executor.submit(len, ()) for executor in self._executors]:
+                future.result()
+    
+    @property
+    def is_parallel(self) -> bool:
+        return bool(self._executors)
+    
+    def add(self, key: Hashable, shard: BM25Shard):
+        """Register a shard; in process mode the caller may drop its copy afterwards"""
+        if not self._executors:
+            with self._lock:
+                self._local[key] = shard
+            return
+        
+        with self._lock:
+            worker = min(range(len(self._executors)), key=lambda i: self._worker_load[i])
+            self._worker_load[worker] += len(shard)
+            self._placement[key] = worker
+        self._executors[worker].submit(_worker_add, key, shard).result()
+    
+    def remove(self, key: Hashable, doc_count: int = 0):
+        """Unregister a shard"""
+        with self._lock:
+            self._local.pop(key, None)
+            worker = self._placement.pop(key, None)
+            if worker is not None:
+                self._worker_load[worker] -= doc_count
+        if worker is not None:
+            self._executors[worker].submit(_worker_remove, key).result()
+    
+    def top_k(
+        self,
+        requests: List[Tuple[Hashable, int]],
+        query_terms: List[str],
+        idf: Dict[str, float],
+        avgdl: float,
+        k1: float,
+        b: float
+    ) -> Dict[Hashable, List[Tuple[int, float]]]:
+        """Score the requested (shard key, k) pairs and return hits per shard"""
+        if not self._executors:
+            local = self._local
+            return {
+                key: local[key].top_k(query_terms, idf, avgdl, k, k1, b)
+                for key, k in requests
+                if key in local
+            }
+        
+        by_worker: Dict[int, List[Tuple[Hashable, int]]] = {}
+        for key, k in requests:
+            worker = self._placement.get(key)
+            if worker is not None:
+                by_worker.setdefault(worker, []).append((key, k))
+        
+        futures = [
+            self._executors[worker].submit(_worker_top_k, worker_requests, query_terms, idf, avgdl, k1, b)
+            for worker, worker_requests in by_worker.items()
+        ]
+        results = {}
+        for future in futures:
+            results.update(future.result())
+        return results
+    
+    def close(self, wait: bool = False):
+        """Stop worker processes"""
+        for executor in self._executors:
+            executor.shutdown(wait=wait, cancel_futures=True)
+        self._executors = []
+        self._local = {}
+        self._placement = {}
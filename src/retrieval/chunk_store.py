@@ -0,0 +1,449 @@
+"""
+Columnar, memory-mapped chunk store shared by the dense and sparse retrievers
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from src.utils.file_lock import exclusive_lock
+
+# Stored as its own blob rather than interned: every value is unique
+_ID_KEY = "chunk_id"
+_ABSENT = -1
+
+# Present while a compaction swaps its files in; lists the files to delete
+_JOURNAL = "compaction.json"
+_PENDING = ".compact"
+
+# Rows discard()ed since the last compaction, for other processes to replay
+_DISCARDED = "discarded.rows"
+
+
+def chunk_store_path(index_path: str) -> str:
+    """Default store location next to a sparse index: <stem>_chunks"""
+    path = Path(index_path)
+    return str(path.parent / f"{path.stem}_chunks")
+
+
+class _Column:
+    """Interned values of one metadata key plus an int32 code per chunk"""
+    
+    def __init__(self, key: str, values: List):
+        self.key = key
+        self.values = values
+        self.codes = {value: code for code, value in enumerate(values)}
+    
+    def encode(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+
+class ChunkStore:
+    """
+    Append-only columnar store of chunk text and metadata
+    
+    Each chunk gets an integer id: its row number. Text is one UTF-8 blob
+    with an end-offset column, so is chunk_id. Every other metadata key
+    is a column of int32 codes into a table of distinct values (-1 when
+    absent). Repeated values like source, file path or section title are
+    then stored once. The blobs and columns are memory-mapped, so only the
+    pages that are read become resident.
+    
+    Retrievers keep integer ids and only materialize text and metadata for
+    the final results. put() reuses the row of an unchanged chunk; a changed
+    chunk gets a new row, and the old one becomes garbage, as do the rows
+    of discard()ed chunks. compact() rewrites the files without the garbage;
+    row ids stay valid, a garbage row just becomes empty.
+    
+    Readers never lock: writers publish a new set of memory maps after each
+    append or compaction, and a read uses one published set throughout.
+    Several processes can share a store: writes hold a file lock and first
+    catch up with the files, and refresh() picks up other processes' writes.
+    """
+    
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._columns: Dict[str, _Column] = {}
+        self._maps: Dict[str, np.ndarray] = {}
+        self._count = 0
+        self._by_chunk_id: Dict[str, int] = {}
+        # Garbage rows a compaction already emptied (they have no chunk id)
+        self._emptied = 0
+        # The files as this process last saw them
+        self._version = None
+        self._discards_read = 0
+        with self._lock, self._exclusive():
+            self._reload()
+    
+    def _exclusive(self):
+        """File lock that keeps writers in other processes out"""
+        return exclusive_lock(str(self.path / "write.lock"))
+    
+    def _disk_version(self):
+        # Appends grow ids_end.bin, a compaction replaces it, both rewrite values.json
+        version = []
+        for path in (self._file("ids_end"), self.path / "values.json", self.path / _DISCARDED):
+            try:
+                stat = path.stat()
+                version.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                version.append(None)
+        return tuple(version)
+    
+    def refresh(self) -> bool:
+        """Pick up rows another process appended, discarded or compacted; returns True if there were any"""
+        if self._disk_version() == self._version:
+            return False
+        with self._lock, self._exclusive():
+            return self._reload()
+    
+    def _reload(self) -> bool:
+        """Bring the in-memory state up to date with the files (both locks held)"""
+        self._finish_compaction()
+        changed = self._disk_version() != self._version
+        if changed:
+            values_path = self.path / "values.json"
+            tables = {}
+            if values_path.exists():
+                with open(values_path, "r", encoding="utf-8") as f:
+                    tables = json.load(f)
+            self._columns = {key: _Column(key, values) for key, values in tables.items()}
+        
+        count = self._file_len("ids_end", np.int64)
+        self._truncate_partial_append(count)
+        if not changed:
+            return False
+        
+        previous, version = self._version, self._disk_version()
+        self._publish()
+        if previous and previous[0] and version[0] and previous[0][0] == version[0][0] and count >= self._count:
+            # Same ids file, only appended to: index the new rows
+            first = self._count
+        else:
+            first = 0
+            self._by_chunk_id = {}
+            self._emptied = 0
+        
+        ids_end = self._array("ids_end")
+        ids_blob = self._array("ids")
+        start = int(ids_end[first - 1]) if first else 0
+        for row, end in enumerate(ids_end[first:count].tolist(), first):
+            if end > start:
+                self._by_chunk_id[bytes(ids_blob[start:end]).decode("utf-8")] = row
+            else:
+                self._emptied += 1
+            start = end
+        self._count = count
+        self._replay_discards(from_start=first == 0)
+        self._version = version
+        return True
+    
+    def _replay_discards(self, from_start: bool):
+        path = self.path / _DISCARDED
+        size = path.stat().st_size if path.exists() else 0
+        start = 0 if from_start or size < self._discards_read else self._discards_read
+        if size > start:
+            rows = np.fromfile(path, dtype=np.int64, count=(size - start) // 8, offset=start)
+            for row in rows.tolist():
+                # A chunk added again since then has a newer row and stays
+                chunk_id = self._blob("ids", row) if row < self._count else None
+                if chunk_id and self._by_chunk_id.get(chunk_id) == row:
+                    del self._by_chunk_id[chunk_id]
+        self._discards_read = size
+    
+    def _finish_compaction(self):
+        """Complete a compaction that stopped while swapping its files in, or drop one that never got there"""
+        journal = self.path / _JOURNAL
+        pending = list(self.path.glob(f"*{_PENDING}"))
+        if not journal.exists():
+            for path in pending:
+                path.unlink()
+            return
+        with open(journal, "r", encoding="utf-8") as f:
+            obsolete = json.load(f)["obsolete"]
+        for path in pending:
+            os.replace(path, path.with_name(path.name[:-len(_PENDING)]))
+        for name in obsolete:
+            self._file(name).unlink(missing_ok=True)
+        journal.unlink()
+    
+    def _truncate_partial_append(self, count: int):
+        """Drop anything an interrupted append wrote past the last complete row"""
+        sizes = {"text_end": count * 8, "ids_end": count * 8}
+        sizes.update({f"meta_{key}": count * 4 for key in self._columns})
+        for name in ("text", "ids"):
+            ends = np.memmap(self._file(f"{name}_end"), dtype=np.int64, mode="r") if count else []
+            sizes[name] = int(ends[count - 1]) if count else 0
+            del ends
+        
+        for name, size in sizes.items():
+            path = self._file(name)
+            if path.exists() and path.stat().st_size > size:
+                os.truncate(path, size)
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def _file(self, name: str) -> Path:
+        return self.path / f"{name}.bin"
+    
+    def _file_len(self, name: str, dtype) -> int:
+        path = self._file(name)
+        return path.stat().st_size // np.dtype(dtype).itemsize if path.exists() else 0
+    
+    @staticmethod
+    def _dtype(name: str):
+        if name.endswith("_end"):
+            return np.int64
+        return np.int32 if name.startswith("meta_") else np.uint8
+    
+    def _publish(self):
+        """Map every file as it is now and make that the set readers use (writers only)"""
+        maps = {}
+        for path in self.path.glob("*.bin"):
+            dtype = self._dtype(path.stem)
+            if path.stat().st_size >= np.dtype(dtype).itemsize:
+                maps[path.stem] = np.memmap(path, dtype=dtype, mode="r")
+        self._maps = maps
+    
+    def _array(self, name: str, maps: Dict[str, np.ndarray] = None) -> np.ndarray:
+        """Read-only memory map of a file from the published set (or from maps)"""
+        array = (self._maps if maps is None else maps).get(name)
+        return array if array is not None else np.zeros(0, dtype=self._dtype(name))
+    
+    def _append(self, name: str, data: bytes):
+        # Readers keep using the published maps until the whole append is done
+        with open(self._file(name), "ab") as f:
+            f.write(data)
+    
+    def _blob(self, name: str, row: int) -> str:
+        maps = self._maps
+        ends = self._array(f"{name}_end", maps)
+        if row >= len(ends) and self.refresh():
+            # A row another process added since this one last looked
+            maps = self._maps
+            ends = self._array(f"{name}_end", maps)
+        start = int(ends[row - 1]) if row else 0
+        return bytes(self._array(name, maps)[start:int(ends[row])]).decode("utf-8")
+    
+    def text(self, row: int) -> str:
+        return self._blob("text", row)
+    
+    def chunk_id(self, row: int) -> str:
+        return self._blob("ids", row)
+    
+    def row_of(self, chunk_id: str) -> Optional[int]:
+        return self._by_chunk_id.get(chunk_id)
+    
+    def meta(self, row: int, key: str):
+        """One metadata value without materializing the whole dict"""
+        if key == _ID_KEY:
+            return self.chunk_id(row)
+        maps, columns = self._maps, self._columns
+        column = columns.get(key)
+        if column is None:
+            return None
+        codes = self._array(f"meta_{key}", maps)
+        code = int(codes[row]) if row < len(codes) else _ABSENT
+        return None if code == _ABSENT else column.values[code]
+    
+    def metadata(self, row: int) -> Dict:
+        maps, columns = self._maps, self._columns
+        metadata = {_ID_KEY: self.chunk_id(row)}
+        for key, column in list(columns.items()):
+            codes = self._array(f"meta_{key}", maps)
+            code = int(codes[row]) if row < len(codes) else _ABSENT
+            if code != _ABSENT:
+                metadata[key] = column.values[code]
+        return metadata
+    
+    def get(self, row: int) -> Dict:
+        """Materialize one chunk as {"text", "metadata"}"""
+        return {"text": self.text(row), "metadata": self.metadata(row)}
+    
+    def texts(self, rows: Iterable[int]) -> List[str]:
+        return [self.text(row) for row in rows]
+    
+    def _unchanged(self, row: int, chunk: Dict) -> bool:
+        metadata = {k: v for k, v in chunk["metadata"].items() if v is not None}
+        return self.text(row) == chunk["text"] and self.metadata(row) == metadata
+    
+    def put(self, chunks: List[Dict]) -> List[int]:
+        """Store chunks and return their row ids; unchanged chunks keep their row"""
+        with self._lock, self._exclusive():
+            self._reload()
+            rows = []
+            new_chunks = []
+            for chunk in chunks:
+                row = self._by_chunk_id.get(chunk["metadata"][_ID_KEY])
+                if row is not None and self._unchanged(row, chunk):
+                    rows.append(row)
+                else:
+                    rows.append(self._count + len(new_chunks))
+                    new_chunks.append(chunk)
+            
+            if new_chunks:
+                self._append_rows(new_chunks)
+            return rows
+    
+    def _append_rows(self, chunks: List[Dict]):
+        first_row = self._count
+        
+        keys = {key for chunk in chunks for key in chunk["metadata"] if key != _ID_KEY}
+        for key in keys - set(self._columns):
+            self._columns[key] = _Column(key, [])
+        
+        # New columns are back-filled as absent for earlier rows
+        codes = {key: np.full(len(chunks), _ABSENT, dtype=np.int32) for key in self._columns}
+        for key in self._columns:
+            missing = first_row - self._file_len(f"meta_{key}", np.int32)
+            if missing > 0:
+                self._append(f"meta_{key}", np.full(missing, _ABSENT, dtype=np.int32).tobytes())
+        
+        texts = []
+        chunk_ids = []
+        for i, chunk in enumerate(chunks):
+            texts.append(chunk["text"].encode("utf-8"))
+            chunk_ids.append(chunk["metadata"][_ID_KEY].encode("utf-8"))
+            for key, value in chunk["metadata"].items():
+                if key != _ID_KEY and value is not None:
+                    codes[key][i] = self._columns[key].encode(value)
+        
+        # Value tables first: a row must never reference an unknown code
+        self._write_values()
+        for key, column_codes in codes.items():
+            self._append(f"meta_{key}", column_codes.tobytes())
+        self._append_blobs("text", texts)
+        self._append_blobs("ids", chunk_ids)
+        
+        # Readers only see the new rows once the end offsets are in place
+        self._publish()
+        for i, chunk_id in enumerate(chunk_ids):
+            self._by_chunk_id[chunk_id.decode("utf-8")] = first_row + i
+        self._count += len(chunks)
+        self._version = self._disk_version()
+    
+    def _append_blobs(self, name: str, items: List[bytes]):
+        ends = self._array(f"{name}_end")
+        start = int(ends[-1]) if len(ends) else 0
+        self._append(name, b"".join(items))
+        self._append(f"{name}_end", (start + np.cumsum([len(item) for item in items], dtype=np.int64)).tobytes())
+    
+    def _write_values(self):
+        values_path = self.path / "values.json"
+        tmp_path = values_path.with_name("values.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({key: column.values for key, column in self._columns.items()}, f, ensure_ascii=False)
+        os.replace(tmp_path, values_path)
+    
+    def discard(self, chunk_ids: Iterable[str]):
+        """Mark the rows of deleted chunks as garbage for the next compaction"""
+        with self._lock, self._exclusive():
+            self._reload()
+            rows = [self._by_chunk_id.pop(chunk_id) for chunk_id in set(chunk_ids) if chunk_id in self._by_chunk_id]
+            if not rows:
+                return
+            with open(self.path / _DISCARDED, "ab") as f:
+                f.write(np.asarray(rows, dtype=np.int64).tobytes())
+            self._discards_read = (self.path / _DISCARDED).stat().st_size
+            self._version = self._disk_version()
+    
+    def garbage_ratio(self) -> float:
+        """Share of rows that no chunk id points to any more and that still take space"""
+        garbage = self._count - len(self._by_chunk_id) - self._emptied
+        return garbage / self._count if self._count else 0.0
+    
+    def compact(self) -> int:
+        """
+        Rewrite the files without garbage rows; returns how many were reclaimed
+        
+        Row ids do not change: a garbage row keeps its place in the offset and
+        code columns but its text, id and metadata are dropped, and so are
+        interned values no live row uses. The new files are written next to
+        the old ones and swapped in under a journal, so a crash midway is
+        completed when the store is next opened.
+        """
+        with self._lock, self._exclusive():
+            self._reload()
+            live = np.zeros(self._count, dtype=bool)
+            live[list(self._by_chunk_id.values())] = True
+            reclaimed = self._count - int(live.sum()) - self._emptied
+            if not reclaimed:
+                return 0
+            
+            maps = self._maps
+            files: Dict[str, bytes] = {}
+            for name in ("text", "ids"):
+                ends = np.asarray(self._array(f"{name}_end", maps))
+                starts = np.concatenate(([0], ends[:-1]))
+                blob = self._array(name, maps)
+                files[name] = b"".join(bytes(blob[start:end]) for start, end in zip(starts[live], ends[live]))
+                files[f"{name}_end"] = np.cumsum(np.where(live, ends - starts, 0), dtype=np.int64).tobytes()
+            
+            columns: Dict[str, _Column] = {}
+            for key, column in self._columns.items():
+                codes = np.full(self._count, _ABSENT, dtype=np.int32)
+                stored = self._array(f"meta_{key}", maps)[:self._count]
+                codes[:len(stored)] = stored
+                codes[~live] = _ABSENT
+                used = np.unique(codes[codes != _ABSENT])
+                if not len(used):
+                    continue
+                renumber = np.full(len(column.values), _ABSENT, dtype=np.int32)
+                renumber[used] = np.arange(len(used), dtype=np.int32)
+                files[f"meta_{key}"] = np.where(codes != _ABSENT, renumber[codes], _ABSENT).astype(np.int32).tobytes()
+                columns[key] = _Column(key, [column.values[code] for code in used.tolist()])
+            
+            self._swap_in(files, columns)
+            self._emptied += reclaimed
+            return reclaimed
+    
+    def _swap_in(self, files: Dict[str, bytes], columns: Dict[str, "_Column"]):
+        for name, data in files.items():
+            with open(self.path / f"{name}.bin{_PENDING}", "wb") as f:
+                f.write(data)
+        with open(self.path / f"values.json{_PENDING}", "w", encoding="utf-8") as f:
+            json.dump({key: column.values for key, column in columns.items()}, f, ensure_ascii=False)
+        
+        obsolete = [path.stem for path in self.path.glob("*.bin") if path.stem not in files]
+        with open(self.path / _JOURNAL, "w", encoding="utf-8") as f:
+            json.dump({"obsolete": obsolete}, f)
+        
+        self._finish_compaction()
+        # The discarded rows are empty now
+        (self.path / _DISCARDED).unlink(missing_ok=True)
+        self._discards_read = 0
+        self._columns = columns
+        self._publish()
+        self._version = self._disk_version()
+    
+    def clear(self):
+        """Delete every chunk"""
+        with self._lock, self._exclusive():
+            for path in self.path.glob("*.bin"):
+                path.unlink()
+            (self.path / "values.json").unlink(missing_ok=True)
+            (self.path / _DISCARDED).unlink(missing_ok=True)
+            self._discards_read = 0
+            self._columns = {}
+            self._maps = {}
+            self._by_chunk_id = {}
+            self._emptied = 0
+            self._count = 0
+            self._version = self._disk_version()
+    
+    def get_stats(self) -> Dict:
+        return {
+            "stored_chunks": self._count,
+            "live_chunks": len(self._by_chunk_id),
+            "text_bytes": self._file_len("text", np.uint8),
+            "interned_values": sum(len(column.values) for column in self._columns.values()),
+        }
@@ -1,20 +1,98 @@
 """
 Dense Retrieval using ChromaDB
 """
-from typing import List, Dict
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Tuple
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 from config.settings import settings
 from src.core.embeddings import EmbeddingManager
-from src.utils.logger import log
+from src.retrieval.chunk_store import ChunkStore
+from src.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+# Chroma's values for parameters missing from a collection's metadata
+_CHROMA_HNSW_DEFAULTS = {"hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 10}
+
+
+def hnsw_metadata(params: Dict = None) -> Dict:
+    """
+    Collection metadata for a cosine HNSW index
+    
+    params may override "M", "construction_ef" and "search_ef" for one
+    collection; anything not given comes from the settings.
+    """
+    params = params or {}
+    return {
+        "hnsw:space": "cosine",
+        "hnsw:M": int(params.get("M", settings.hnsw_m)),
+        "hnsw:construction_ef": int(params.get("construction_ef", settings.hnsw_construction_ef)),
+        "hnsw:search_ef": int(params.get("search_ef", settings.hnsw_search_ef)),
+    }
+
+
+def effective_hnsw(metadata: Dict) -> Dict:
+    """HNSW parameters a collection was actually created with"""
+    metadata = metadata or {}
+    return {key.split(":", 1)[1]: metadata.get(key, default) for key, default in _CHROMA_HNSW_DEFAULTS.items()}
+
+
+class _WriteBatchTuner:
+    """
+    Size Chroma write batches from measured insertion throughput
+    
+    Aims for each write to take about target_seconds, so a write overlaps
+    roughly one embedding call instead of stalling the pipeline.
+    """
+    
+    def __init__(self, initial: int, minimum: int, maximum: int, target_seconds: float, adaptive: bool):
+        self.batch_size = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.adaptive = adaptive
+        self.throughput = None  # chunks per second (exponential moving average)
+    
+    def record(self, count: int, seconds: float):
+        """Update throughput with one completed write"""
+        if seconds <= 0:
+            return
+        observed = count / seconds
+        self.throughput = observed if self.throughput is None else 0.7 * self.throughput + 0.3 * observed
+        if self.adaptive:
+            ideal = int(self.throughput * self.target_seconds)
+            self.batch_size = max(self.minimum, min(ideal, self.maximum))
 
 
 class DenseRetriever:
-    """Vector-based retrieval using ChromaDB"""
+    """
+    Vector-based retrieval using ChromaDB
+    
+    Chroma holds only ids, embeddings and the source of each chunk (for
+    per-document deletes). Text and metadata live in the chunk store.
     
-    def __init__(self, persist_directory: str = None):
+    Chroma copies the HNSW parameters into the index segment when the
+    collection is created, so changed parameters (including search_ef)
+    only take effect for collections created afterwards, i.e. on the next
+    full reindex.
+    """
+    
+    def __init__(
+        self,
+        persist_directory: str = None,
+        collection_name: str = "documents",
+        embedding_manager: EmbeddingManager = None,
+        chunk_store: ChunkStore = None,
+        hnsw_params: Dict = None
+    ):
         self.persist_directory = persist_directory or settings.chroma_db_path
-        self.embedding_manager = EmbeddingManager()
+        self.embedding_manager = embedding_manager or EmbeddingManager()
+        self.chunk_store = chunk_store or ChunkStore(
+            os.path.join(self.persist_directory, f"{collection_name}_chunks")
+        )
         
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
@@ -26,51 +104,125 @@ class DenseRetriever:
         )
         
         # Get or create collection
-        self.collection_name = "documents"
+        self.collection_name = collection_name
+        self.hnsw_metadata = hnsw_metadata(hnsw_params)
         try:
             self.collection = self.client.get_collection(name=self.collection_name)
-            log.info(f"Loaded existing collection: {self.collection_name}")
+            log.info("Loaded existing collection: {}", self.collection_name)
+            built = effective_hnsw(self.collection.metadata)
+            if built != effective_hnsw(self.hnsw_metadata):
+                log.info(
+                    "Collection {} was built with HNSW {}; the configured {} applies from the next full reindex",
+                    self.collection_name, built, effective_hnsw(self.hnsw_metadata)
+                )
         except:
             self.collection = self.client.create_collection(
                 name=self.collection_name,
-                metadata={"hnsw:space": "cosine"}
+                metadata=self.hnsw_metadata
             )
-            log.info(f"Created new collection: {self.collection_name}")
+            log.info("Created new collection: {}", self.collection_name)
+        else:
+            self._migrate_to_store()
+        
+        self.write_tuner = _WriteBatchTuner(
+            initial=settings.dense_write_batch_size,
+            minimum=10,
+            maximum=getattr(self.client, "max_batch_size", 5000),
+            target_seconds=settings.dense_write_target_seconds,
+            adaptive=settings.dense_adaptive_write_batch
+        )
     
-    def index_chunks(self, chunks: List[Dict]):
-        """Index document chunks with embeddings"""
+    def index_chunks(self, chunks: List[Dict], embedding_manager=None):
+        """Index document chunks with embeddings (from embedding_manager if given)"""
+        embedding_manager = embedding_manager or self.embedding_manager
         if not chunks:
             log.warning("No chunks to index")
             return
         
-        log.info(f"Starting to index {len(chunks)} chunks...")
-        
-        # Prepare data for indexing
-        texts = [chunk["text"] for chunk in chunks]
-        metadatas = [chunk["metadata"] for chunk in chunks]
-        ids = [chunk["metadata"]["chunk_id"] for chunk in chunks]
+        log.info("Starting to index {} chunks...", len(chunks))
         
-        # Generate embeddings
-        log.info("Generating embeddings...")
-        embeddings = self.embedding_manager.embed_texts(texts)
+        # Pipeline: embed batch N+1 while batch N is written by a single writer
+        # thread. upsert keeps reruns after a failure idempotent.
+        embed_batch_size = settings.embedding_batch_size
+        pending = {"ids": [], "metadatas": [], "embeddings": []}
+        in_flight = None
         
-        # Add to collection in batches
-        batch_size = 100
-        for i in range(0, len(chunks), batch_size):
-            end_idx = min(i + batch_size, len(chunks))
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma-writer") as writer:
+            for i in range(0, len(chunks), embed_batch_size):
+                batch = chunks[i:i + embed_batch_size]
+                texts = [chunk["text"] for chunk in batch]
+                
+                embeddings = embedding_manager.embed_texts(texts, batch_size=embed_batch_size)
+                self.chunk_store.put(batch)
+                
+                pending["ids"].extend(chunk["metadata"]["chunk_id"] for chunk in batch)
+                pending["metadatas"].extend({"source": chunk["metadata"].get("source", "")} for chunk in batch)
+                pending["embeddings"].extend(embeddings)
+                
+                # Hand off full write batches; at most one write is in flight
+                while len(pending["ids"]) >= self.write_tuner.batch_size:
+                    if in_flight is not None:
+                        in_flight.result()
+                    in_flight = writer.submit(
+                        self._write_batch,
+                        self._take(pending, self.write_tuner.batch_size)
+                    )
             
-            self.collection.add(
-                embeddings=embeddings[i:end_idx],
-                documents=texts[i:end_idx],
-                metadatas=metadatas[i:end_idx],
-                ids=ids[i:end_idx]
-            )
-            log.debug(f"Indexed batch {i//batch_size + 1}")
+            if in_flight is not None:
+                in_flight.result()
+            if pending["ids"]:
+                self._write_batch(self._take(pending, len(pending["ids"])))
         
-        log.info(f"Successfully indexed {len(chunks)} chunks")
+        log.info("Successfully indexed {} chunks", len(chunks))
     
-    def search(self, query: str, top_k: int = None) -> List[Dict]:
-        """Search for similar chunks"""
+    @staticmethod
+    def _take(pending: Dict[str, list], count: int) -> Dict[str, list]:
+        """Remove and return the first count items of each pending column"""
+        batch = {}
+        for key, values in pending.items():
+            batch[key] = values[:count]
+            del values[:count]
+        return batch
+    
+    def _write_batch(self, batch: Dict[str, list]):
+        """Upsert one batch and feed its throughput to the batch size tuner"""
+        started = time.perf_counter()
+        self.collection.upsert(**batch)
+        elapsed = time.perf_counter() - started
+        
+        self.write_tuner.record(len(batch["ids"]), elapsed)
+        log.debug(
+            "Wrote {} chunks in {:.2f}s (next write batch: {})",
+            len(batch["ids"]), elapsed, self.write_tuner.batch_size
+        )
+    
+    def _ids_for_source(self, source: str) -> List[str]:
+        return self.collection.get(where={"source": source}, include=[])["ids"]
+    
+    def delete_by_source(self, source: str) -> int:
+        """Delete all chunks of one source document"""
+        ids = self._ids_for_source(source)
+        if ids:
+            self.collection.delete(ids=ids)
+        log.info("Deleted {} dense chunks for {}", len(ids), source)
+        return len(ids)
+    
+    def replace_source(self, source: str, chunks: List[Dict]):
+        """Upsert the new chunks of a source document, then drop its stale ones"""
+        stale_ids = set(self._ids_for_source(source))
+        if chunks:
+            self.index_chunks(chunks)
+        stale_ids -= {chunk["metadata"]["chunk_id"] for chunk in chunks}
+        if stale_ids:
+            self.collection.delete(ids=list(stale_ids))
+        log.info("Replaced dense chunks for {}: {} chunks, {} removed", source, len(chunks), len(stale_ids))
+    
+    def search_ids(self, query: str, top_k: int = None) -> List[Tuple[int, float]]:
+        """Search for similar chunks; returns (chunk-store row, similarity) pairs"""
+        return self.search_ids_batch([query], top_k)[0]
+    
+    def search_ids_batch(self, queries: List[str], top_k: int = None) -> List[List[Tuple[int, float]]]:
+        """Search several queries with one embedding call and one index query"""
         top_k = top_k or settings.top_k_dense
         
         # Get actual collection size
@@ -81,47 +233,111 @@ class DenseRetriever:
         
         if actual_top_k == 0:
             log.warning("No documents in collection")
-            return []
+            return [[] for _ in queries]
         
-        # Generate query embedding
-        query_embedding = self.embedding_manager.embed_text(query)
+        # Generate query embeddings
+        query_embeddings = self.embed_queries(queries)
         
         # Search in collection
         results = self.collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=query_embeddings,
             n_results=actual_top_k,
-            include=["documents", "metadatas", "distances"]
+            include=["distances"]
         )
         
+        # Convert distance to similarity
+        batch_hits = []
+        for ids, distances in zip(results["ids"], results["distances"]):
+            hits = []
+            for chunk_id, distance in zip(ids, distances):
+                row = self.chunk_store.row_of(chunk_id)
+                if row is not None:
+                    hits.append((row, 1 - distance))
+            batch_hits.append(hits)
+        return batch_hits
+    
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Query embeddings; a batch is one provider call"""
+        if len(queries) == 1:
+            return [self.embedding_manager.embed_text(queries[0])]
+        return self.embedding_manager.embed_texts(queries, batch_size=len(queries))
+    
+    def iter_embeddings(self, page_size: int = 5000) -> Iterator[Tuple[List[str], List[List[float]]]]:
+        """Stored (chunk ids, embeddings) pages of the whole collection"""
+        for offset in range(0, self.collection.count(), page_size):
+            page = self.collection.get(include=["embeddings"], limit=page_size, offset=offset)
+            yield page["ids"], page["embeddings"]
+    
+    def _migrate_to_store(self, page_size: int = 5000):
+        """Copy chunks that only exist in Chroma (collections indexed before the store) into it, once at load"""
+        if self.collection.count() <= self.chunk_store.get_stats()["live_chunks"]:
+            return
+        copied = 0
+        for offset in range(0, self.collection.count(), page_size):
+            page = self.collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            missing = [
+                {"text": text, "metadata": {**metadata, "chunk_id": chunk_id}}
+                for chunk_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+                if text is not None and self.chunk_store.row_of(chunk_id) is None
+            ]
+            if missing:
+                self.chunk_store.put(missing)
+                copied += len(missing)
+        if copied:
+            log.info("Copied {} chunks from {} into the chunk store", copied, self.collection_name)
+    
+    def search(self, query: str, top_k: int = None) -> List[Dict]:
+        """Search for similar chunks"""
         # Format results
         formatted_results = []
-        for i in range(len(results["ids"][0])):
+        for row, similarity in self.search_ids(query, top_k):
+            chunk = self.chunk_store.get(row)
             formatted_results.append({
-                "chunk_id": results["ids"][0][i],
-                "text": results["documents"][0][i],
-                "metadata": results["metadatas"][0][i],
-                "similarity": 1 - results["distances"][0][i],  # Convert distance to similarity
+                "chunk_id": chunk["metadata"]["chunk_id"],
+                "text": chunk["text"],
+                "metadata": chunk["metadata"],
+                "similarity": similarity,
                 "retrieval_method": "dense"
             })
         
-        log.debug(f"Dense search returned {len(formatted_results)} results")
+        log.debug("Dense search returned {} results", len(formatted_results))
         return formatted_results
     
+    def warmup(self):
+        """Touch the collection so the HNSW index is loaded before the first query"""
+        count = self.collection.count()
+        if count:
+            self.collection.peek(limit=1)
+        log.info("Dense index warmed up: {} chunks", count)
+    
     def reset_collection(self):
         """Clear all data from collection"""
         self.client.delete_collection(name=self.collection_name)
         self.collection = self.client.create_collection(
             name=self.collection_name,
-            metadata={"hnsw:space": "cosine"}
+            metadata=self.hnsw_metadata
         )
         log.info("Collection reset successfully")
     
+    def drop_collection(self, name: str = None):
+        """Delete a collection (this one by default) and its data"""
+        name = name or self.collection_name
+        try:
+            self.client.delete_collection(name=name)
+            log.info("Dropped collection: {}", name)
+        except ValueError:
+            log.warning("Collection not found: {}", name)
+    
     def get_stats(self) -> Dict:
         """Get collection statistics"""
         count = self.collection.count()
         return {
             "total_chunks": count,
-            "collection_name": self.collection_name
+            "collection_name": self.collection_name,
+            "hnsw": effective_hnsw(self.collection.metadata),
+            "write_batch_size": self.write_tuner.batch_size,
+            "write_throughput": self.write_tuner.throughput,
+            "chunk_store": self.chunk_store.get_stats()
         }
 
 
@@ -143,4 +359,4 @@ if __name__ == "__main__":
     # Test search
     results = retriever.search("주요 내용은?", top_k=3)
     for r in results:
-        log.info(f"Similarity: {r['similarity']:.4f} - {r['text'][:100]}...")
+        log.info("Similarity: {:.4f} - {}...", r["similarity"], r["text"][:100])
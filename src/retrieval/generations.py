@@ -0,0 +1,108 @@
+"""
+Versioned index generations for blue/green reindexing
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from src.utils.logger import log
+
+
+class IndexGenerations:
+    """
+    Manifest naming the live and the previous index generation
+
+    Every full rebuild writes a new generation: its own Chroma collection
+    and its own sparse index path. Serving switches to it only once both
+    sides are complete, so queries never see a half-built index. The
+    previous generation stays on disk for rollback; older ones are dropped.
+
+    Generation 0 is the unversioned layout (the "documents" collection and
+    the configured BM25 path), so existing indexes keep working.
+    """
+
+    def __init__(self, manifest_path: str, collection_prefix: str, sparse_index_path: str):
+        self.manifest_path = Path(manifest_path)
+        self.collection_prefix = collection_prefix
+        self.sparse_index_path = Path(sparse_index_path)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._state = {"current": 0, "previous": None, "next": 1}
+        self.refresh()
+
+    def collection_name(self, generation: int) -> str:
+        if generation == 0:
+            return self.collection_prefix
+        return f"{self.collection_prefix}_g{generation}"
+
+    def sparse_path(self, generation: int) -> str:
+        if generation == 0:
+            return str(self.sparse_index_path)
+        path = self.sparse_index_path
+        return str(path.with_name(f"{path.stem}_g{generation}{path.suffix}"))
+
+    @property
+    def current(self) -> int:
+        return self._state["current"]
+
+    @property
+    def previous(self) -> Optional[int]:
+        return self._state["previous"]
+
+    def refresh(self) -> bool:
+        """Re-read the manifest if another process changed it; returns True if it did"""
+        try:
+            mtime = self.manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._mtime:
+            return False
+
+        with self._lock:
+            try:
+                with open(self.manifest_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError) as e:
+                log.warning("Failed to read index generations manifest: {}", e)
+                return False
+            self._state = state
+            self._mtime = mtime
+        return True
+
+    def _write(self, state: Dict):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.manifest_path)
+        self._state = state
+        self._mtime = self.manifest_path.stat().st_mtime_ns
+
+    def allocate(self) -> int:
+        """Reserve the number of a new, not yet live generation"""
+        self.refresh()
+        with self._lock:
+            generation = self._state["next"]
+            self._write({**self._state, "next": generation + 1})
+        return generation
+
+    def activate(self, generation: int) -> Optional[int]:
+        """Make a generation live; returns the generation that is no longer kept"""
+        self.refresh()
+        with self._lock:
+            retired = self._state["previous"]
+            self._write({**self._state, "current": generation, "previous": self._state["current"]})
+        log.info("Index generation {} is now live", generation)
+        return retired
+
+    def rollback(self) -> int:
+        """Swap the live and the previous generation; returns the new live one"""
+        self.refresh()
+        with self._lock:
+            previous = self._state["previous"]
+            if previous is None:
+                raise ValueError("No previous index generation to roll back to")
+            self._write({**self._state, "current": previous, "previous": self._state["current"]})
+        log.info("Rolled back to index generation {}", previous)
+        return previous
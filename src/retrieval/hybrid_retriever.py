@@ -1,40 +1,351 @@
 """
 Hybrid Retrieval combining Dense and Sparse methods
 """
-from typing import List, Dict
+import shutil
+import threading
+from typing import List, Dict, NamedTuple, Optional, Tuple
 from collections import defaultdict
+import numpy as np
 from config.settings import settings
+from src.core.deduplicator import hand_off_chunks
+from src.core.ingestion_checkpoint import IngestionCheckpoint
+from src.retrieval.chunk_store import ChunkStore, chunk_store_path
 from src.retrieval.dense_retriever import DenseRetriever
+from src.retrieval.generations import IndexGenerations
+from src.retrieval.query_router import QueryRouter
+from src.retrieval.section_index import SectionIndex, section_index_path
 from src.retrieval.sparse_retriever import SparseRetriever
-from src.utils.logger import log
+from src.retrieval.sparse_segments import remove_index_files
+from src.utils.deadline import DeadlineExceeded
+from src.utils.logger import get_logger
+from src.utils.resilience import CircuitOpenError
+
+log = get_logger(__name__)
+
+
+class _Generation(NamedTuple):
+    """Dense and sparse retrievers of one index generation and their shared chunk store"""
+    number: int
+    dense: DenseRetriever
+    sparse: SparseRetriever
+    store: ChunkStore
+    sections: SectionIndex
 
 
 class HybridRetriever:
     """Combine dense and sparse retrieval with RRF (Reciprocal Rank Fusion)"""
     
-    def __init__(self):
-        self.dense_retriever = DenseRetriever()
-        self.sparse_retriever = SparseRetriever()
-        log.info("Initialized HybridRetriever")
+    def __init__(
+        self,
+        collection_prefix: str = "documents",
+        sparse_index_path: str = None,
+        generations_path: str = None,
+        hnsw_params: Dict = None
+    ):
+        # Applied to the dense collection of every new generation
+        self.hnsw_params = hnsw_params
+        self.generations = IndexGenerations(
+            generations_path or settings.index_generations_path,
+            collection_prefix=collection_prefix,
+            sparse_index_path=sparse_index_path or settings.bm25_index_path
+        )
+        # Serializes writes and generation switches; searches never take it
+        self._lock = threading.RLock()
+        self._active: Optional[_Generation] = None
+        self._previous: Optional[_Generation] = None
+        self._active = self._open(self.generations.current)
+        # Bumped by every write; a background section build only publishes if it is unchanged
+        self._sections_version = 0
+        self._sections_event = threading.Event()
+        self._sections_thread = None
+        self.router = QueryRouter(
+            max_terms=settings.route_max_terms,
+            min_rare_idf=settings.route_min_rare_idf,
+            min_score_gap=settings.route_min_score_gap
+        )
+        log.info("Initialized HybridRetriever (index generation {})", self._active.number)
+    
+    @property
+    def dense_retriever(self) -> DenseRetriever:
+        return self._active.dense
+    
+    @property
+    def sparse_retriever(self) -> SparseRetriever:
+        return self._active.sparse
+    
+    @property
+    def generation(self) -> int:
+        return self._active.number
+    
+    def _open(self, number: int) -> _Generation:
+        # All generations share one embedding client
+        embedding_manager = self._active.dense.embedding_manager if self._active else None
+        # Both sides store chunk text and metadata once, in the same store
+        sparse_path = self.generations.sparse_path(number)
+        store = ChunkStore(chunk_store_path(sparse_path))
+        return _Generation(
+            number,
+            DenseRetriever(
+                collection_name=self.generations.collection_name(number),
+                embedding_manager=embedding_manager,
+                chunk_store=store,
+                hnsw_params=self.hnsw_params
+            ),
+            SparseRetriever(index_path=sparse_path, chunk_store=store),
+            store,
+            SectionIndex(
+                section_index_path(sparse_path),
+                top_documents=settings.hierarchical_top_documents,
+                top_sections=settings.hierarchical_top_sections
+            )
+        )
+    
+    def _sections(self, generation: _Generation):
+        """Section index build to search with, or None for the flat path"""
+        if not settings.hierarchical_retrieval_enabled:
+            return None
+        snapshot = generation.sections.current()
+        if snapshot is None or snapshot.chunk_count < settings.hierarchical_min_chunks:
+            return None
+        return snapshot
+    
+    def _section_inputs(self, generation: _Generation) -> Optional[Dict]:
+        """Rows, embeddings and terms to build the section index from, or None below hierarchical_min_chunks"""
+        store = generation.store
+        if store.get_stats()["live_chunks"] < settings.hierarchical_min_chunks:
+            return None
+        rows = []
+        pages = []
+        for ids, page in generation.dense.iter_embeddings(page_size=1000):
+            keep = [i for i, chunk_id in enumerate(ids) if store.row_of(chunk_id) is not None]
+            rows.extend(store.row_of(ids[i]) for i in keep)
+            pages.append(np.asarray([page[i] for i in keep], dtype=np.float32))
+        
+        return {
+            "rows": rows,
+            "embeddings": np.vstack(pages) if pages else np.zeros((0, 0), dtype=np.float32),
+            "sources": [store.meta(row, "source") for row in rows],
+            "sections": [store.meta(row, "section_title") for row in rows],
+            "tokenized": [generation.sparse.tokenize(store.text(row)) for row in rows],
+        }
+    
+    def _build_sections(self, generation: _Generation):
+        """Derive the section index from the embeddings stored in Chroma (no provider calls)"""
+        if not settings.hierarchical_retrieval_enabled:
+            return
+        # Supersedes any background build still reading the older state
+        self._sections_version += 1
+        inputs = self._section_inputs(generation)
+        if inputs is None:
+            generation.sections.clear()
+        else:
+            generation.sections.build(**inputs)
     
-    def index_chunks(self, chunks: List[Dict]):
+    def _schedule_sections(self):
+        """Rebuild the section index in the background after a document update"""
+        if not settings.hierarchical_retrieval_enabled:
+            return
+        self._sections_version += 1
+        self._sections_event.set()
+        if self._sections_thread is None:
+            self._sections_thread = threading.Thread(
+                target=self._sections_loop,
+                name="section-builder",
+                daemon=True
+            )
+            self._sections_thread.start()
+    
+    def _sections_loop(self):
+        while True:
+            self._sections_event.wait()
+            self._sections_event.clear()
+            try:
+                self.rebuild_sections()
+            except Exception as e:
+                log.error("Background section index build failed: {}", e)
+    
+    def rebuild_sections(self) -> bool:
+        """
+        Rebuild the section index of the live generation
+        
+        The corpus is read without holding the write lock, so document
+        updates are not held up by it. Returns False when a write made in
+        the meantime superseded the build (that write schedules the next).
+        """
+        with self._lock:
+            generation = self._current()
+            version = self._sections_version
+        inputs = self._section_inputs(generation)
+        with self._lock:
+            if version != self._sections_version or generation is not self._active:
+                return False
+            if inputs is None:
+                generation.sections.clear()
+            else:
+                generation.sections.build(**inputs)
+        return True
+    
+    def _current(self) -> _Generation:
+        """Live generation, following switches made by other worker processes"""
+        if self.generations.refresh() and self.generations.current != self._active.number:
+            with self._lock:
+                if self.generations.current != self._active.number:
+                    self._switch_to(self.generations.current)
+        return self._active
+    
+    def _switch_to(self, number: int, target: _Generation = None):
+        if target is None:
+            if self._previous is not None and self._previous.number == number:
+                target = self._previous
+            else:
+                target = self._open(number)
+        if self._previous is not None and self._previous is not target:
+            self._previous.sparse.close()
+        
+        # A single attribute swap: in-flight searches finish on the old generation
+        self._previous, self._active = self._active, target
+        log.info("Serving index generation {}", number)
+    
+    def index_chunks(self, chunks: List[Dict], checkpoint: IngestionCheckpoint = None):
         """Index chunks in both dense and sparse retrievers"""
         log.info("Indexing chunks in hybrid retriever...")
         
-        # Index in dense retriever
-        self.dense_retriever.index_chunks(chunks)
-        
-        # Index in sparse retriever
-        self.sparse_retriever.index_chunks(chunks)
+        with self._lock:
+            self._index_into(self._current(), chunks, checkpoint)
         
         log.info("Hybrid indexing completed")
     
+    def _index_into(self, generation: _Generation, chunks: List[Dict], checkpoint: IngestionCheckpoint = None):
+        """Write chunks to both sides of a generation, skipping the sides a checkpoint has finished"""
+        embedding_manager = None
+        if checkpoint is not None:
+            # Stored vectors are reused; new ones are stored batch by batch
+            embedding_manager = checkpoint.embeddings(generation.dense.embedding_manager)
+        
+        if checkpoint is None or not checkpoint.stage_done("dense"):
+            generation.dense.index_chunks(chunks, embedding_manager=embedding_manager)
+            if checkpoint is not None:
+                checkpoint.complete_stage("dense", len(chunks))
+        
+        if checkpoint is None or not checkpoint.stage_done("sparse"):
+            generation.sparse.index_chunks(chunks)
+            if checkpoint is not None:
+                checkpoint.complete_stage("sparse", len(chunks))
+        
+        self._build_sections(generation)
+    
+    def rebuild(self, chunks: List[Dict], checkpoint: IngestionCheckpoint = None) -> int:
+        """
+        Build a new index generation and switch to it once both sides are complete
+        
+        The live generation keeps serving while the new one is built. The
+        replaced generation is kept for rollback; the one before it is dropped.
+        With a checkpoint, a failed build is kept on disk and the next run
+        continues it instead of starting a new generation.
+        """
+        with self._lock:
+            self._current()
+            number = checkpoint.generation if checkpoint is not None else None
+            if number is not None and number == self._active.number:
+                # Switched to before the checkpoint could be cleared
+                return number
+            if number is None or number == self.generations.previous:
+                number = self.generations.allocate()
+                if checkpoint is not None:
+                    checkpoint.set_generation(number)
+            log.info("Building index generation {} with {} chunks...", number, len(chunks))
+            
+            target = self._open(number)
+            try:
+                self._index_into(target, chunks, checkpoint)
+            except Exception:
+                log.error("Index generation {} failed; still serving {}", number, self._active.number)
+                target.sparse.close()
+                if checkpoint is None:
+                    self._drop(number)
+                raise
+            
+            retired = self.generations.activate(number)
+            self._switch_to(number, target)
+            if retired is not None and retired not in (self._active.number, self._previous.number):
+                self._drop(retired)
+        
+        return number
+    
+    def rollback(self) -> int:
+        """Switch back to the previous generation (the current one becomes previous)"""
+        with self._lock:
+            self._current()
+            number = self.generations.rollback()
+            self._switch_to(number)
+        return number
+    
+    def drop_unused(self, number: int) -> bool:
+        """Drop a generation that is neither live nor kept for rollback (an abandoned build)"""
+        with self._lock:
+            self._current()
+            if number in (self.generations.current, self.generations.previous):
+                return False
+            self._drop(number)
+        return True
+    
+    def _drop(self, number: int):
+        """Delete the files and collection of a generation that is no longer served"""
+        self._active.dense.drop_collection(self.generations.collection_name(number))
+        remove_index_files(self.generations.sparse_path(number))
+        shutil.rmtree(chunk_store_path(self.generations.sparse_path(number)), ignore_errors=True)
+        shutil.rmtree(section_index_path(self.generations.sparse_path(number)), ignore_errors=True)
+        log.info("Dropped index generation {}", number)
+    
+    def upsert_document(self, source: str, chunks: List[Dict]):
+        """Add or update one document in both retrievers"""
+        with self._lock:
+            active = self._current()
+            # Searches use the flat path until the section index is rebuilt
+            active.sections.invalidate()
+            handed = hand_off_chunks(active.sparse.source_chunks(source), source, chunks)
+            active.dense.replace_source(source, chunks)
+            active.sparse.replace_source(source, chunks)
+            self._index_handed_off(active, handed)
+            self._schedule_sections()
+        log.info("Upserted document {}: {} chunks", source, len(chunks))
+    
+    def delete_document(self, source: str) -> int:
+        """Delete one document from both retrievers; returns the chunk count"""
+        with self._lock:
+            active = self._current()
+            active.sections.invalidate()
+            handed = hand_off_chunks(active.sparse.source_chunks(source), source)
+            deleted = max(
+                active.dense.delete_by_source(source),
+                active.sparse.delete_by_source(source)
+            )
+            self._index_handed_off(active, handed)
+            self._schedule_sections()
+        log.info("Deleted document {}: {} chunks", source, deleted)
+        return deleted
+    
+    def sources(self) -> List[str]:
+        """Source documents in the live generation"""
+        return self._current().sparse.sources()
+    
+    def _index_handed_off(self, active: _Generation, chunks: List[Dict]):
+        """Index deduplicated chunks that moved to the other files they came from"""
+        if not chunks:
+            return
+        active.dense.index_chunks(chunks)
+        active.sparse.add_chunks(chunks)
+        log.info("Handed {} deduplicated chunks to their other source files", len(chunks))
+    
     def search(
         self,
         query: str,
         top_k: int = None,
         dense_weight: float = 0.6,
-        sparse_weight: float = 0.4
+        sparse_weight: float = 0.4,
+        offset: int = 0,
+        include_text: bool = True,
+        depth: int = None
     ) -> List[Dict]:
         """
         Hybrid search using Reciprocal Rank Fusion (RRF)
@@ -44,46 +355,156 @@ class HybridRetriever:
             top_k: Number of final results
             dense_weight: Weight for dense retrieval
             sparse_weight: Weight for sparse retrieval
+            offset: Number of top results to skip (pagination)
+            include_text: Whether to load chunk text (metadata and scores only otherwise)
+            depth: Candidates per leg (at least offset + top_k); pages cut
+                from the same depth come from the same ranking
+        """
+        return self.search_batch([query], top_k, dense_weight, sparse_weight, offset, include_text, depth)[0]
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        top_k: int = None,
+        dense_weight: float = 0.6,
+        sparse_weight: float = 0.4,
+        offset: int = 0,
+        include_text: bool = True,
+        depth: int = None
+    ) -> List[List[Dict]]:
+        """
+        Hybrid search for several queries at once
+        
+        The queries that need the dense leg share one embedding call and
+        one index query. Results are in the order of the queries.
         """
         top_k = top_k or settings.top_k_final
+        # Each leg must reach at least as deep as the requested page
+        depth = max(depth or 0, offset + top_k)
+        dense_depth = max(settings.top_k_dense, depth)
+        sparse_depth = max(settings.top_k_sparse, depth)
         
-        # Get results from both retrievers
-        dense_results = self.dense_retriever.search(
-            query,
-            top_k=settings.top_k_dense
-        )
-        sparse_results = self.sparse_retriever.search(
-            query,
-            top_k=settings.top_k_sparse
-        )
+        # Both sides come from the same generation, even across a switch
+        active = self._current()
+        # Rows the dense side of another worker added since the last search
+        active.store.refresh()
         
-        log.debug(f"Dense: {len(dense_results)} results, Sparse: {len(sparse_results)} results")
+        # With a section index, dense and sparse scoring run inside candidate sections
+        sections = self._sections(active)
         
-        # Apply RRF (Reciprocal Rank Fusion)
-        fused_results = self._reciprocal_rank_fusion(
-            dense_results,
-            sparse_results,
-            dense_weight,
-            sparse_weight
-        )
+        # Pick the legs each query needs; keyword lookups skip the embedding call
+        decisions = []
+        sparse_hits = []
+        scoped_sparse = []
+        for query in queries:
+            decision = None
+            if settings.query_routing_enabled:
+                features = active.sparse.query_features(query)
+                decision = self.router.pre_route(features)
+            # Keyword-style queries need the flat sparse hits to be routed
+            needs_routing = settings.query_routing_enabled and decision is None
+            
+            # Get (row, score) pairs from the retrievers; no text is loaded yet
+            hits = []
+            wants_sparse = decision is None or decision.route != QueryRouter.DENSE
+            if needs_routing or (wants_sparse and sections is None):
+                hits = active.sparse.search_ids(
+                    query,
+                    top_k=sparse_depth
+                )
+            if needs_routing:
+                decision = self.router.route(features, hits)
+            decisions.append(decision)
+            sparse_hits.append(hits)
+            scoped_sparse.append(
+                sections is not None and not needs_routing and wants_sparse
+            )
         
-        # Filter by similarity threshold (lowered to be more permissive)
-        # Keep results if they have any positive score from either method
-        filtered_results = [
-            r for r in fused_results
-            if r.get("rrf_score", 0) > 0  # RRF score is always present after fusion
+        dense_hits = [[] for _ in queries]
+        needs_dense = [
+            i for i, decision in enumerate(decisions)
+            if decision is None or decision.route != QueryRouter.SPARSE
         ]
+        dense_skipped = set()
+        try:
+            if needs_dense and sections is not None:
+                embeddings = active.dense.embed_queries([queries[i] for i in needs_dense])
+                for i, embedding in zip(needs_dense, embeddings):
+                    query = queries[i]
+                    positions = active.sections.select(sections, embedding, active.sparse.tokenize(query))
+                    dense_hits[i] = SectionIndex.dense_hits(sections, embedding, positions, dense_depth)
+                    if scoped_sparse[i]:
+                        sparse_hits[i] = active.sparse.search_rows(
+                            query,
+                            SectionIndex.rows(sections, positions),
+                            top_k=sparse_depth
+                        )
+            elif needs_dense:
+                batch_hits = active.dense.search_ids_batch(
+                    [queries[i] for i in needs_dense],
+                    top_k=dense_depth
+                )
+                for i, hits in zip(needs_dense, batch_hits):
+                    dense_hits[i] = hits
+        except (DeadlineExceeded, CircuitOpenError) as e:
+            # No time or no provider for the query embeddings: answer from the sparse leg alone
+            log.warning("Dense retrieval skipped for {} queries: {}", len(needs_dense), e)
+            dense_skipped.update(needs_dense)
+            for i in needs_dense:
+                dense_hits[i] = []
+                if scoped_sparse[i]:
+                    sparse_hits[i] = active.sparse.search_ids(queries[i], top_k=sparse_depth)
         
-        # Return top-k results
-        final_results = filtered_results[:top_k]
+        results = []
+        for i, (decision, dense, sparse) in enumerate(zip(decisions, dense_hits, sparse_hits)):
+            route = decision.route if decision else QueryRouter.HYBRID
+            if i in dense_skipped:
+                route = "sparse_fallback"
+            if decision is not None:
+                self.router.record(decision)
+                log.debug("Routed query to {} ({})", decision.route, decision.reason)
+            log.debug("Dense: {} results, Sparse: {} results", len(dense), len(sparse))
+            
+            # Apply RRF (Reciprocal Rank Fusion)
+            fused = self._reciprocal_rank_fusion(
+                dense,
+                sparse,
+                dense_weight,
+                sparse_weight
+            )
+            
+            # Keep results if they have any positive score from either method
+            fused = [entry for entry in fused if entry["rrf_score"] > 0]
+            
+            # Materialize text and metadata for the requested page only
+            results.append([
+                self._materialize(active.store, entry, route, include_text)
+                for entry in fused[offset:offset + top_k]
+            ])
         
-        log.info(f"Hybrid search returned {len(final_results)} results")
-        return final_results
+        log.debug("Hybrid search returned {} result lists", len(results))
+        return results
+    
+    @staticmethod
+    def _materialize(store: ChunkStore, entry: Dict, route: str, include_text: bool = True) -> Dict:
+        row = entry.pop("row")
+        metadata = store.metadata(row)
+        result = {"chunk_id": metadata["chunk_id"]}
+        if include_text:
+            result["text"] = store.text(row)
+        result["metadata"] = metadata
+        if "similarity" in entry:
+            result["similarity"] = entry.pop("similarity")
+        if "score" in entry:
+            result["score"] = entry.pop("score")
+        result.update(entry)
+        result["retrieval_method"] = route
+        return result
     
     def _reciprocal_rank_fusion(
         self,
-        dense_results: List[Dict],
-        sparse_results: List[Dict],
+        dense_hits: List[Tuple[int, float]],
+        sparse_hits: List[Tuple[int, float]],
         dense_weight: float,
         sparse_weight: float,
         k: int = 60
@@ -95,61 +516,74 @@ class HybridRetriever:
         Args:
             k: Constant for RRF (typically 60)
         """
-        chunk_scores = defaultdict(lambda: {"score": 0, "data": None})
+        fused = defaultdict(lambda: {"rrf_score": 0, "dense_rank": None, "sparse_rank": None})
         
         # Process dense results
-        for rank, result in enumerate(dense_results, start=1):
-            chunk_id = result["chunk_id"]
-            rrf_score = dense_weight / (k + rank)
-            chunk_scores[chunk_id]["score"] += rrf_score
-            chunk_scores[chunk_id]["data"] = result
-            chunk_scores[chunk_id]["dense_rank"] = rank
+        for rank, (row, similarity) in enumerate(dense_hits, start=1):
+            entry = fused[row]
+            entry["rrf_score"] += dense_weight / (k + rank)
+            entry["dense_rank"] = rank
+            entry["similarity"] = similarity
         
         # Process sparse results
-        for rank, result in enumerate(sparse_results, start=1):
-            chunk_id = result["chunk_id"]
-            rrf_score = sparse_weight / (k + rank)
-            chunk_scores[chunk_id]["score"] += rrf_score
-            
-            # If not seen in dense results, add it
-            if chunk_scores[chunk_id]["data"] is None:
-                chunk_scores[chunk_id]["data"] = result
-            
-            chunk_scores[chunk_id]["sparse_rank"] = rank
+        for rank, (row, score) in enumerate(sparse_hits, start=1):
+            entry = fused[row]
+            entry["rrf_score"] += sparse_weight / (k + rank)
+            entry["sparse_rank"] = rank
+            entry["score"] = score
         
         # Sort by fused score
-        sorted_results = sorted(
-            chunk_scores.items(),
-            key=lambda x: x[1]["score"],
-            reverse=True
+        ranked = sorted(fused.items(), key=lambda item: item[1]["rrf_score"], reverse=True)
+        return [{"row": row, **entry} for row, entry in ranked]
+    
+    def sparse_memory_bytes(self) -> int:
+        """Estimated memory of the loaded sparse indexes (live and rollback generation)"""
+        return sum(
+            generation.sparse.memory_bytes()
+            for generation in (self._active, self._previous)
+            if generation is not None
         )
-        
-        # Format final results
-        final_results = []
-        for chunk_id, data in sorted_results:
-            result = data["data"]
-            result["rrf_score"] = data["score"]
-            result["dense_rank"] = data.get("dense_rank", None)
-            result["sparse_rank"] = data.get("sparse_rank", None)
-            result["retrieval_method"] = "hybrid"
-            final_results.append(result)
-        
-        return final_results
+    
+    def unload_sparse(self) -> bool:
+        """Release the in-memory sparse indexes; they reload on the next search"""
+        unloaded = False
+        for generation in (self._active, self._previous):
+            if generation is not None:
+                unloaded = generation.sparse.unload() or unloaded
+        return unloaded
+    
+    def warmup(self):
+        """Load both indexes so the first query does not pay the cold-start cost"""
+        active = self._current()
+        active.dense.warmup()
+        active.sparse.warmup()
     
     def get_stats(self) -> Dict:
         """Get statistics from both retrievers"""
-        dense_stats = self.dense_retriever.get_stats()
-        sparse_stats = self.sparse_retriever.get_stats()
+        active = self._current()
+        dense_stats = active.dense.get_stats()
+        sparse_stats = active.sparse.get_stats()
         
         return {
             "dense": dense_stats,
-            "sparse": sparse_stats
+            "sparse": sparse_stats,
+            "routing": self.router.get_stats(),
+            "sections": active.sections.get_stats(),
+            "generation": {
+                "current": active.number,
+                "previous": self.generations.previous,
+            }
         }
     
     def reset(self):
-        """Reset both retrievers"""
-        self.dense_retriever.reset_collection()
-        self.sparse_retriever.reset()
+        """Reset both retrievers of the live generation"""
+        with self._lock:
+            active = self._current()
+            active.dense.reset_collection()
+            active.sparse.reset()
+            active.store.clear()
+            active.sections.clear()
+            self._sections_version += 1
         log.info("Hybrid retriever reset completed")
 
 
@@ -171,6 +605,6 @@ if __name__ == "__main__":
     # Test search
     results = retriever.search("주요 내용은?", top_k=5)
     for i, r in enumerate(results, 1):
-        log.info(f"{i}. RRF Score: {r['rrf_score']:.4f}")
-        log.info(f"   Dense Rank: {r.get('dense_rank', 'N/A')}, Sparse Rank: {r.get('sparse_rank', 'N/A')}")
-        log.info(f"   {r['text'][:100]}...\n")
+        log.info("{}. RRF Score: {:.4f}", i, r["rrf_score"])
+        log.info("   Dense Rank: {}, Sparse Rank: {}", r.get("dense_rank", "N/A"), r.get("sparse_rank", "N/A"))
+        log.info("   {}...\n", r["text"][:100])
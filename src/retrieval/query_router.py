@@ -0,0 +1,87 @@
+"""
+Adaptive query routing between the dense and sparse retrieval legs
+"""
+import threading
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+class QueryFeatures(NamedTuple):
+    """Cheap lexical features of a query, computed from BM25 statistics"""
+    terms: int
+    known_terms: int
+    # Query IDF relative to a query of equally many unique (df = 1) terms, 0..1
+    rare_idf_mass: float
+
+
+class RouteDecision(NamedTuple):
+    route: str
+    reason: str
+
+
+class QueryRouter:
+    """
+    Decide which retrieval legs a query needs
+    
+    - dense: no query term occurs in the BM25 vocabulary, so the sparse leg
+      cannot contribute.
+    - sparse: a short query made of rare terms (codes, identifiers, names)
+      whose BM25 top-1 clearly beats the top-2. The embedding round trip
+      would not change the answer.
+    - hybrid: everything else.
+    
+    The sparse leg runs first because it is local and cheap; its score gap
+    is the last signal before paying for the embedding call.
+    """
+    
+    DENSE = "dense"
+    SPARSE = "sparse"
+    HYBRID = "hybrid"
+    
+    def __init__(self, max_terms: int = 4, min_rare_idf: float = 0.6, min_score_gap: float = 1.5):
+        self.max_terms = max_terms
+        self.min_rare_idf = min_rare_idf
+        self.min_score_gap = min_score_gap
+        self._lock = threading.Lock()
+        self._routes: Counter = Counter()
+        self._reasons: Counter = Counter()
+    
+    def pre_route(self, features: QueryFeatures) -> Optional[RouteDecision]:
+        """Decision that needs no sparse search, or None"""
+        if features.known_terms == 0:
+            return RouteDecision(self.DENSE, "no_known_terms")
+        if features.terms > self.max_terms:
+            return RouteDecision(self.HYBRID, "long_query")
+        if features.rare_idf_mass < self.min_rare_idf:
+            return RouteDecision(self.HYBRID, "common_terms")
+        return None
+    
+    def route(self, features: QueryFeatures, sparse_hits: List[Tuple[int, float]]) -> RouteDecision:
+        """Final decision once the sparse hits of a keyword-style query are known"""
+        decision = self.pre_route(features)
+        if decision is not None:
+            return decision
+        if not sparse_hits:
+            return RouteDecision(self.HYBRID, "no_sparse_hits")
+        if len(sparse_hits) == 1:
+            return RouteDecision(self.SPARSE, "single_sparse_hit")
+        top1, top2 = sparse_hits[0][1], sparse_hits[1][1]
+        if top2 <= 0 or top1 / top2 >= self.min_score_gap:
+            return RouteDecision(self.SPARSE, "clear_sparse_winner")
+        return RouteDecision(self.HYBRID, "close_sparse_scores")
+    
+    def record(self, decision: RouteDecision):
+        with self._lock:
+            self._routes[decision.route] += 1
+            self._reasons[decision.reason] += 1
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            total = sum(self._routes.values())
+            return {
+                "queries": total,
+                "routes": dict(self._routes),
+                "reasons": dict(self._reasons),
+                # Share of queries that skipped the embedding call
+                "embedding_skip_ratio": self._routes[self.SPARSE] / total if total else 0.0,
+            }
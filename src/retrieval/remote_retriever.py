@@ -0,0 +1,200 @@
+"""
+Client for a remote retrieval service
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+import httpx
+from config.settings import settings
+from src.retrieval.tenants import DEFAULT_TENANT, InvalidTenantError, UnknownTenantError, validate_tenant
+from src.utils.admission import AdmissionRejected
+from src.utils.deadline import DeadlineExceeded, bound, remaining
+from src.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+API_PREFIX = "/retrieval/v1"
+
+# Remaining request budget, so the service stops work the caller no longer waits for
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+# Shared key the service requires (RETRIEVAL_SERVICE_KEY on both sides)
+SERVICE_KEY_HEADER = "X-Retrieval-Key"
+
+
+class RetrievalServiceError(RuntimeError):
+    """The retrieval service could not be reached or failed the request"""
+
+
+class _ServiceConnection:
+    """Pooled keep-alive HTTP connections to one retrieval service, shared by all tenants"""
+    
+    def __init__(self, base_url: str, client: httpx.Client = None):
+        self.base_url = base_url.rstrip("/")
+        self.client = client or httpx.Client(
+            base_url=self.base_url,
+            limits=httpx.Limits(
+                max_connections=settings.retrieval_service_max_connections,
+                max_keepalive_connections=settings.retrieval_service_max_connections,
+            ),
+            timeout=httpx.Timeout(settings.retrieval_service_timeout, connect=settings.openai_connect_timeout),
+        )
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self._total_seconds = 0.0
+    
+    def request(self, method: str, path: str, **kwargs) -> Dict:
+        timeout = bound(settings.retrieval_service_timeout)
+        headers = {**kwargs.pop("headers", {}), SERVICE_KEY_HEADER: settings.retrieval_service_key}
+        left = remaining()
+        if left is not None:
+            headers[DEADLINE_HEADER] = str(max(1, int(left * 1000)))
+        kwargs["headers"] = headers
+        started = time.perf_counter()
+        try:
+            response = self.client.request(method, path, timeout=timeout, **kwargs)
+        except httpx.TimeoutException as e:
+            self._record(started, failed=True)
+            raise DeadlineExceeded(f"Retrieval service {self.base_url} timed out") from e
+        except httpx.HTTPError as e:
+            self._record(started, failed=True)
+            raise RetrievalServiceError(f"Retrieval service {self.base_url} unreachable: {e}") from e
+        self._record(started, failed=response.status_code >= 500)
+        
+        if response.status_code == 200:
+            return response.json()
+        detail = self._detail(response)
+        if response.status_code == 400:
+            raise InvalidTenantError(detail)
+        if response.status_code == 404:
+            raise UnknownTenantError(detail)
+        if response.status_code == 503:
+            # The service's own admission control rejected the embedding call
+            raise AdmissionRejected(detail, retry_after=float(response.headers.get("Retry-After", 1)))
+        if response.status_code == 504:
+            raise DeadlineExceeded(detail)
+        raise RetrievalServiceError(f"Retrieval service returned {response.status_code}: {detail}")
+    
+    @staticmethod
+    def _detail(response: httpx.Response) -> str:
+        try:
+            return str(response.json().get("detail", response.text))
+        except ValueError:
+            return response.text
+    
+    def _record(self, started: float, failed: bool):
+        with self._lock:
+            self.requests += 1
+            self.errors += failed
+            self._total_seconds += time.perf_counter() - started
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "url": self.base_url,
+                "requests": self.requests,
+                "errors": self.errors,
+                "avg_latency_ms": self._total_seconds / self.requests * 1000 if self.requests else 0.0,
+            }
+
+
+class RemoteRetriever:
+    """
+    HybridRetriever search API of one tenant, served by a retrieval service
+    
+    Generation workers use it in place of an in-process HybridRetriever, so
+    they never load the indexes. Index management (reindex, document
+    updates, rollback) stays with the retrieval service.
+    """
+    
+    def __init__(self, base_url: str = None, tenant: Optional[str] = None, connection: _ServiceConnection = None):
+        self.connection = connection or _ServiceConnection(base_url or settings.retrieval_service_url)
+        self.tenant = validate_tenant(tenant)
+    
+    def _tenant_param(self) -> Optional[str]:
+        return None if self.tenant == DEFAULT_TENANT else self.tenant
+    
+    def for_tenant(self, tenant: Optional[str]) -> "RemoteRetriever":
+        """Retriever of another tenant on the same service and connection pool"""
+        return RemoteRetriever(tenant=tenant, connection=self.connection)
+    
+    def search(
+        self,
+        query: str,
+        top_k: int = None,
+        offset: int = 0,
+        include_text: bool = True,
+        depth: int = None
+    ) -> List[Dict]:
+        response = self.connection.request("POST", f"{API_PREFIX}/search", json={
+            "query": query,
+            "top_k": top_k,
+            "offset": offset,
+            "include_text": include_text,
+            "depth": depth,
+            "tenant": self._tenant_param(),
+        })
+        return response["results"]
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        top_k: int = None,
+        offset: int = 0,
+        include_text: bool = True,
+        depth: int = None
+    ) -> List[List[Dict]]:
+        """Search several queries in one round trip (split to the service's batch limit)"""
+        results = []
+        step = max(1, settings.retrieval_batch_max_queries)
+        for start in range(0, len(queries), step):
+            response = self.connection.request("POST", f"{API_PREFIX}/search/batch", json={
+                "queries": queries[start:start + step],
+                "top_k": top_k,
+                "offset": offset,
+                "include_text": include_text,
+                "depth": depth,
+                "tenant": self._tenant_param(),
+            })
+            results.extend(response["results"])
+        return results
+    
+    def get_stats(self) -> Dict:
+        params = {"tenant": self._tenant_param()} if self._tenant_param() else None
+        stats = self.connection.request("GET", f"{API_PREFIX}/stats", params=params)
+        stats["remote"] = self.connection.get_stats()
+        return stats
+    
+    def warmup(self, timeout: float = None):
+        """Wait until the retrieval service reports ready"""
+        timeout = settings.retrieval_service_ready_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if self.connection.client.get("/ready").status_code == 200:
+                    log.info("Retrieval service {} is ready", self.connection.base_url)
+                    return
+            except httpx.HTTPError as e:
+                log.debug("Retrieval service not reachable yet: {}", e)
+            if time.monotonic() >= deadline:
+                raise RetrievalServiceError(f"Retrieval service {self.connection.base_url} not ready after {timeout:.0f}s")
+            time.sleep(1.0)
+
+
+class RemoteTenantRegistry:
+    """TenantRegistry counterpart for generation workers; the service owns loading and unloading"""
+    
+    def __init__(self, default: RemoteRetriever):
+        self.default = default
+    
+    def get(self, tenant: Optional[str] = None) -> RemoteRetriever:
+        """Tenant ids are validated here; unknown tenants surface on the first request"""
+        tenant = validate_tenant(tenant)
+        return self.default if tenant == DEFAULT_TENANT else self.default.for_tenant(tenant)
+    
+    def enforce_budget(self, keep: Optional[str] = None) -> int:
+        return 0
+    
+    def get_stats(self) -> Dict:
+        return self.default.get_stats().get("tenants", {})
@@ -0,0 +1,278 @@
+"""
+Document- and section-level centroids for two-stage (coarse-to-fine) retrieval
+"""
+import json
+import math
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from src.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+_MANIFEST = "sections.json"
+
+
+def section_index_path(index_path: str) -> str:
+    """Default location next to a sparse index: <stem>_sections"""
+    path = Path(index_path)
+    return str(path.parent / f"{path.stem}_sections")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+class _Snapshot:
+    """One immutable build of the section index, loaded from disk"""
+    
+    def __init__(self, directory: Path, manifest: Dict):
+        build = manifest["build"]
+        self.build = build
+        # Chunk embeddings and rows ordered by section, so a section is one contiguous slice
+        self.embeddings = np.load(directory / f"embeddings_{build}.npy", mmap_mode="r")
+        self.rows = np.load(directory / f"rows_{build}.npy", mmap_mode="r")
+        self.section_centroids = np.load(directory / f"section_centroids_{build}.npy")
+        self.doc_centroids = np.load(directory / f"doc_centroids_{build}.npy")
+        
+        sections = manifest["sections"]
+        self.bounds = np.array([[s["start"], s["end"]] for s in sections], dtype=np.int64).reshape(-1, 2)
+        self.lengths = np.array([s["length"] for s in sections], dtype=np.float64)
+        self.doc_sections = [tuple(d["sections"]) for d in manifest["documents"]]
+        self.avg_length = float(self.lengths.mean()) if len(self.lengths) else 0.0
+        self.terms = {
+            term: (np.array([s for s, _ in postings], dtype=np.int64), np.array([tf for _, tf in postings], dtype=np.float64))
+            for term, postings in manifest["terms"].items()
+        }
+    
+    @property
+    def chunk_count(self) -> int:
+        return len(self.rows)
+    
+    def lexical_sections(self, query_terms: Sequence[str], k: int, k1: float = 1.2, b: float = 0.75) -> np.ndarray:
+        """Top-k sections by BM25 over whole sections (section-level term statistics)"""
+        num_sections = len(self.lengths)
+        scores = np.zeros(num_sections, dtype=np.float64)
+        norms = k1 * (1 - b + b * self.lengths / max(self.avg_length, 1e-9))
+        for term in set(query_terms):
+            postings = self.terms.get(term)
+            if postings is None:
+                continue
+            sections, freqs = postings
+            idf = math.log((num_sections - len(sections) + 0.5) / (len(sections) + 0.5) + 1)
+            scores[sections] += idf * freqs * (k1 + 1) / (freqs + norms[sections])
+        
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        return matched
+
+
+class SectionIndex:
+    """
+    Coarse stage of hierarchical retrieval
+    
+    Holds one centroid per document and per section (the normalized mean of
+    their chunk embeddings), section-level term statistics and a copy of
+    the chunk embeddings grouped by section. Everything is derived from the
+    embeddings already stored in Chroma, so building it makes no provider
+    calls.
+    
+    A query first picks the top_documents closest documents, keeps the
+    top_sections closest sections within them, and adds the sections that
+    best match its terms. The fine stage then scores only the chunks of
+    those sections, so its cost follows the size of the selected sections
+    instead of the corpus.
+    
+    Builds are written under a new build number and published by replacing
+    the manifest; other processes pick them up on their next search. The
+    index must be rebuilt after every write, and invalidate() removes the
+    manifest first so searches fall back to the flat path meanwhile.
+    """
+    
+    def __init__(self, path: str, top_documents: int = 8, top_sections: int = 16):
+        self.path = Path(path)
+        self.top_documents = top_documents
+        self.top_sections = top_sections
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+        self._mtime = None
+        self.selections = 0
+        self._candidate_fraction = 0.0
+    
+    @property
+    def manifest_path(self) -> Path:
+        return self.path / _MANIFEST
+    
+    def current(self) -> Optional[_Snapshot]:
+        """Latest published build, or None while there is none"""
+        try:
+            mtime = self.manifest_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._snapshot, self._mtime = None, None
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        with open(self.manifest_path, "r", encoding="utf-8") as f:
+                            self._snapshot = _Snapshot(self.path, json.load(f))
+                        self._mtime = mtime
+                    except (OSError, ValueError) as e:
+                        log.warning("Could not load section index {}: {}", self.path, e)
+                        return None
+        return self._snapshot
+    
+    def build(
+        self,
+        rows: Sequence[int],
+        embeddings: np.ndarray,
+        sources: Sequence[str],
+        sections: Sequence[str],
+        tokenized: Sequence[List[str]]
+    ):
+        """Write a new build from chunk rows, their embeddings, document, section and terms"""
+        if not len(rows):
+            self.clear()
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        # Never reuse a build number: readers may still map the older files
+        build = self._last_build() + 1
+        
+        # Group chunks by document, then by section, in order of first appearance
+        groups: Dict[str, Dict[str, List[int]]] = {}
+        for i in np.argsort(np.asarray(rows), kind="stable").tolist():
+            groups.setdefault(sources[i] or "", {}).setdefault(sections[i] or "", []).append(i)
+        
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(rows), -1))
+        order = []
+        documents = []
+        section_entries = []
+        section_centroids = []
+        doc_centroids = []
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for source, source_sections in groups.items():
+            first_section = len(section_entries)
+            for title, members in source_sections.items():
+                start = len(order)
+                order.extend(members)
+                terms = Counter(term for i in members for term in tokenized[i])
+                for term, freq in terms.items():
+                    postings.setdefault(term, []).append((len(section_entries), freq))
+                section_entries.append({
+                    "title": title,
+                    "start": start,
+                    "end": len(order),
+                    "length": sum(terms.values()),
+                })
+                section_centroids.append(vectors[members].mean(axis=0))
+            doc_members = order[section_entries[first_section]["start"]:]
+            doc_centroids.append(vectors[doc_members].mean(axis=0))
+            documents.append({"source": source, "sections": [first_section, len(section_entries)]})
+        
+        dim = vectors.shape[1] if vectors.ndim == 2 else 0
+        arrays = {
+            "embeddings": vectors[order] if order else np.zeros((0, dim), dtype=np.float32),
+            "rows": np.asarray(rows, dtype=np.int64)[order] if order else np.zeros(0, dtype=np.int64),
+            "section_centroids": _normalize(np.array(section_centroids, dtype=np.float32).reshape(-1, dim)),
+            "doc_centroids": _normalize(np.array(doc_centroids, dtype=np.float32).reshape(-1, dim)),
+        }
+        for name, array in arrays.items():
+            np.save(self.path / f"{name}_{build}.npy", array)
+        
+        manifest = {"build": build, "documents": documents, "sections": section_entries, "terms": postings}
+        tmp_path = self.manifest_path.with_name(_MANIFEST + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+        self._remove_builds(keep=build)
+        log.info("Built section index: {} documents, {} sections, {} chunks", len(documents), len(section_entries), len(order))
+    
+    def _last_build(self) -> int:
+        suffixes = (path.stem.rsplit("_", 1)[-1] for path in self.path.glob("*_*.npy"))
+        return max((int(suffix) for suffix in suffixes if suffix.isdigit()), default=0)
+    
+    def _remove_builds(self, keep: int):
+        for path in self.path.glob("*_*.npy"):
+            if not path.stem.endswith(f"_{keep}"):
+                try:
+                    path.unlink()
+                except OSError:
+                    # Still mapped by a reader (Windows); removed by a later build
+                    pass
+    
+    def invalidate(self):
+        """Stop serving the current build until the next one is written"""
+        self.manifest_path.unlink(missing_ok=True)
+        self._snapshot, self._mtime = None, None
+    
+    def clear(self):
+        self.invalidate()
+        if self.path.exists():
+            self._remove_builds(keep=-1)
+    
+    def select(self, snapshot: _Snapshot, query_embedding: Sequence[float], query_terms: Sequence[str]) -> np.ndarray:
+        """Positions (into the snapshot's chunk arrays) of the chunks in the selected sections"""
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        
+        num_docs = len(snapshot.doc_centroids)
+        top_docs = np.arange(num_docs)
+        if num_docs > self.top_documents:
+            top_docs = np.argpartition(-(snapshot.doc_centroids @ query), self.top_documents - 1)[:self.top_documents]
+        
+        candidates = np.concatenate([
+            np.arange(*snapshot.doc_sections[doc]) for doc in top_docs.tolist()
+        ]) if len(top_docs) else np.zeros(0, dtype=np.int64)
+        if len(candidates) > self.top_sections:
+            scores = snapshot.section_centroids[candidates] @ query
+            candidates = candidates[np.argpartition(-scores, self.top_sections - 1)[:self.top_sections]]
+        
+        # Exact term matches the centroids would miss (codes, names)
+        lexical = snapshot.lexical_sections(query_terms, max(1, self.top_sections // 2))
+        selected = np.union1d(candidates, lexical).astype(np.int64)
+        
+        positions = np.concatenate([
+            np.arange(start, end) for start, end in snapshot.bounds[selected].tolist()
+        ]) if len(selected) else np.zeros(0, dtype=np.int64)
+        
+        with self._lock:
+            self.selections += 1
+            fraction = len(positions) / snapshot.chunk_count if snapshot.chunk_count else 0.0
+            self._candidate_fraction += (fraction - self._candidate_fraction) / self.selections
+        return positions
+    
+    @staticmethod
+    def rows(snapshot: _Snapshot, positions: np.ndarray) -> List[int]:
+        """Chunk-store rows of selected positions"""
+        return snapshot.rows[positions].tolist()
+    
+    @staticmethod
+    def dense_hits(snapshot: _Snapshot, query_embedding: Sequence[float], positions: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Exact cosine top-k among the selected chunks, as (chunk-store row, similarity)"""
+        if not len(positions):
+            return []
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        similarities = snapshot.embeddings[positions] @ query
+        top = np.arange(len(positions))
+        if len(top) > k:
+            top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top], kind="stable")]
+        return [(int(snapshot.rows[positions[i]]), float(similarities[i])) for i in top]
+    
+    def get_stats(self) -> Dict:
+        snapshot = self.current()
+        if snapshot is None:
+            return {"built": False}
+        return {
+            "built": True,
+            "documents": len(snapshot.doc_centroids),
+            "sections": len(snapshot.lengths),
+            "chunks": snapshot.chunk_count,
+            "selections": self.selections,
+            # Share of the corpus the fine stage scored, averaged over queries
+            "avg_candidate_fraction": self._candidate_fraction,
+        }
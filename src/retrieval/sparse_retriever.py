@@ -1,150 +1,245 @@
 """
 Sparse Retrieval using BM25
 """
-import json
-from pathlib import Path
-from typing import List, Dict
-from rank_bm25 import BM25Okapi
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Tuple
 from config.settings import settings
-from src.utils.logger import log
+from src.retrieval.bm25_index import BM25Shard
+from src.retrieval.chunk_store import ChunkStore, chunk_store_path
+from src.retrieval.query_router import QueryFeatures
+from src.retrieval.sparse_segments import SegmentedIndex
+from src.utils.logger import get_logger
+
+log = get_logger(__name__)
 
 
 class SparseRetriever:
     """Keyword-based retrieval using BM25"""
     
-    def __init__(self, index_path: str = None):
+    def __init__(
+        self,
+        index_path: str = None,
+        num_shards: int = None,
+        shard_processes: bool = None,
+        chunk_store: ChunkStore = None
+    ):
         self.index_path = index_path or settings.bm25_index_path
-        self.bm25 = None
-        self.chunks = []
-        self.tokenized_corpus = []
+        self.chunk_store = chunk_store
+        self.num_shards = num_shards or settings.bm25_num_shards
+        self.shard_processes = (
+            shard_processes if shard_processes is not None else settings.bm25_shard_processes
+        )
+        self.index = None
+        self._index_lock = threading.Lock()
     
     def _tokenize(self, text: str) -> List[str]:
         """Simple tokenization (can be improved with better tokenizer)"""
         # Basic tokenization: lowercase and split by whitespace
         return text.lower().split()
     
+    def _get_index(self) -> SegmentedIndex:
+        """Open the segmented index, loading it from disk on first use"""
+        if self.index is not None:
+            # Other workers and the folder watcher change the index on disk
+            self.index.refresh()
+        else:
+            with self._index_lock:
+                if self.index is None:
+                    if self.chunk_store is None:
+                        self.chunk_store = ChunkStore(chunk_store_path(self.index_path))
+                    index = SegmentedIndex(
+                        self.index_path,
+                        tokenize=self._tokenize,
+                        store=self.chunk_store,
+                        num_shards=self.num_shards,
+                        processes=self.shard_processes,
+                        max_segments=settings.bm25_max_segments,
+                        merge_factor=settings.bm25_merge_factor,
+                        deletes_ratio=settings.bm25_merge_deletes_ratio,
+                        background_merge=settings.bm25_background_merge
+                    )
+                    self._load_index(index)
+                    self.index = index
+        return self.index
+    
+    @contextmanager
+    def _using(self):
+        """The index for one operation; unload() cannot close it until the operation ends"""
+        index = self._get_index()
+        while not index.acquire():
+            # Unloaded meanwhile: load it again
+            index = self._get_index()
+        try:
+            yield index
+        finally:
+            index.release()
+    
     def index_chunks(self, chunks: List[Dict]):
-        """Index document chunks for BM25 search"""
+        """Replace the whole index with the given chunks"""
         if not chunks:
             log.warning("No chunks to index")
             return
         
-        log.info(f"Starting BM25 indexing for {len(chunks)} chunks...")
-        
-        self.chunks = chunks
-        
-        # Tokenize all documents
-        self.tokenized_corpus = [
-            self._tokenize(chunk["text"]) for chunk in chunks
-        ]
+        log.info("Starting BM25 indexing for {} chunks...", len(chunks))
         
-        # Build BM25 index
-        self.bm25 = BM25Okapi(self.tokenized_corpus)
+        with self._using() as index:
+            index.replace_all(chunks)
         
-        # Save index
-        self._save_index()
-        
-        log.info(f"Successfully indexed {len(chunks)} chunks with BM25")
+        log.info("Successfully indexed {} chunks with BM25", len(chunks))
     
-    def search(self, query: str, top_k: int = None) -> List[Dict]:
-        """Search using BM25 algorithm"""
+    def add_chunks(self, chunks: List[Dict]):
+        """Add chunks as a new segment (chunks with existing ids are updated)"""
+        if not chunks:
+            return
+        with self._using() as index:
+            index.add(chunks)
+        log.info("Added {} chunks to sparse index", len(chunks))
+    
+    def replace_source(self, source: str, chunks: List[Dict]):
+        """Atomically replace all chunks of one source document"""
+        with self._using() as index:
+            index.replace_source(source, chunks)
+        log.info("Replaced sparse chunks for {}: {} chunks", source, len(chunks))
+    
+    def delete_by_source(self, source: str) -> int:
+        """Delete all chunks of one source document"""
+        with self._using() as index:
+            deleted = index.delete_source(source)
+        log.info("Deleted {} sparse chunks for {}", deleted, source)
+        return deleted
+    
+    def source_chunks(self, source: str) -> List[Dict]:
+        """Indexed chunks of one source document"""
+        with self._using() as index:
+            return index.source_chunks(source)
+    
+    def sources(self) -> List[str]:
+        """Source documents with indexed chunks"""
+        with self._using() as index:
+            return index.sources()
+    
+    def search_ids(self, query: str, top_k: int = None) -> List[Tuple[int, float]]:
+        """Search using BM25 algorithm; returns (chunk-store row, score) pairs"""
         top_k = top_k or settings.top_k_sparse
         
-        if self.bm25 is None:
-            self._load_index()
-        
-        if self.bm25 is None:
-            log.error("BM25 index not initialized")
-            return []
+        with self._using() as index:
+            if not index.live_count():
+                log.warning("Sparse index is empty")
+                return []
+            
+            # Tokenize query
+            tokenized_query = self._tokenize(query)
+            
+            # Scatter to all segments and merge their top-k (non-zero scores only)
+            return index.search(tokenized_query, top_k)
+    
+    def search_rows(self, query: str, rows: List[int], top_k: int = None) -> List[Tuple[int, float]]:
+        """
+        BM25 over the given chunk-store rows only, scored with corpus-wide statistics
         
-        # Tokenize query
+        Used by the fine stage of hierarchical retrieval; the cost follows
+        the number of rows, not the corpus.
+        """
+        top_k = top_k or settings.top_k_sparse
+        with self._using() as index:
+            statistics = index.statistics
         tokenized_query = self._tokenize(query)
+        idf = statistics.idf(tokenized_query)
+        if not idf or not rows:
+            return []
         
-        # Get BM25 scores
-        scores = self.bm25.get_scores(tokenized_query)
-        
-        # Get top-k indices
-        top_indices = sorted(
-            range(len(scores)),
-            key=lambda i: scores[i],
-            reverse=True
-        )[:top_k]
+        shard = BM25Shard(rows, [self._tokenize(self.chunk_store.text(row)) for row in rows])
+        hits = shard.top_k(tokenized_query, idf, statistics.avgdl, top_k, statistics.k1, statistics.b)
+        return sorted(hits, key=lambda hit: hit[1], reverse=True)
+    
+    def tokenize(self, text: str) -> List[str]:
+        """Terms as the index sees them"""
+        return self._tokenize(text)
+    
+    def query_features(self, query: str) -> QueryFeatures:
+        """Lexical features for query routing; no scoring involved"""
+        terms = set(self._tokenize(query))
+        with self._using() as index:
+            statistics = index.statistics
+        idf = statistics.idf(terms)
+        max_idf = statistics.max_idf()
+        rare_idf_mass = sum(idf.values()) / (len(terms) * max_idf) if terms and max_idf > 0 else 0.0
+        return QueryFeatures(len(terms), len(idf), rare_idf_mass)
+    
+    def search(self, query: str, top_k: int = None) -> List[Dict]:
+        """Search using BM25 algorithm"""
+        top_hits = self.search_ids(query, top_k)
         
         # Format results
         results = []
-        for idx in top_indices:
-            if scores[idx] > 0:  # Only include non-zero scores
-                chunk = self.chunks[idx]
-                results.append({
-                    "chunk_id": chunk["metadata"]["chunk_id"],
-                    "text": chunk["text"],
-                    "metadata": chunk["metadata"],
-                    "score": float(scores[idx]),
-                    "retrieval_method": "sparse"
-                })
+        for row, score in top_hits:
+            chunk = self.chunk_store.get(row)
+            results.append({
+                "chunk_id": chunk["metadata"]["chunk_id"],
+                "text": chunk["text"],
+                "metadata": chunk["metadata"],
+                "score": score,
+                "retrieval_method": "sparse"
+            })
         
-        log.debug(f"Sparse search returned {len(results)} results")
+        log.debug("Sparse search returned {} results", len(results))
         return results
     
-    def _save_index(self):
-        """Save chunks to disk (index is rebuilt on load)"""
+    def _load_index(self, index: SegmentedIndex):
+        """Load segments from disk (postings are rebuilt on load)"""
         try:
-            Path(self.index_path).parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(self.index_path, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'chunks': self.chunks
-                }, f, ensure_ascii=False, indent=2)
-            
-            log.info(f"Sparse index data saved to {self.index_path}")
-        except Exception as e:
-            log.error(f"Failed to save Sparse index: {e}")
-    
-    def _load_index(self):
-        """Load chunks from disk and rebuild BM25 index"""
-        try:
-            if not Path(self.index_path).exists():
-                log.warning(f"Sparse index not found at {self.index_path}")
+            if not index.load():
+                log.warning("Sparse index not found at {}", self.index_path)
                 return
-            
-            with open(self.index_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.chunks = data['chunks']
-            
-            # Rebuild index
-            if self.chunks:
-                self.tokenized_corpus = [
-                    self._tokenize(chunk["text"]) for chunk in self.chunks
-                ]
-                self.bm25 = BM25Okapi(self.tokenized_corpus)
-                log.info(f"BM25 index rebuilt from {len(self.chunks)} chunks")
-            
+            log.info("BM25 index loaded: {} chunks", index.live_count())
         except Exception as e:
-            log.error(f"Failed to load Sparse index: {e}")
+            log.error("Failed to load Sparse index: {}", e)
+    
+    def warmup(self):
+        """Load and rebuild the BM25 index ahead of the first query"""
+        index = self._get_index()
+        log.info("Sparse index warmed up: {} chunks", index.live_count())
     
     def get_stats(self) -> Dict:
         """Get index statistics"""
-        if self.bm25 is None:
-            self._load_index()
-        
+        index = self._get_index()
         return {
-            "total_chunks": len(self.chunks) if self.chunks else 0,
-            "index_path": self.index_path
+            "total_chunks": index.live_count(),
+            "index_path": self.index_path,
+            **index.get_stats(),
+            "chunk_store": self.chunk_store.get_stats()
         }
     
+    def close(self):
+        """Stop background merging and shard workers"""
+        if self.index is not None:
+            self.index.close()
+    
+    def memory_bytes(self) -> int:
+        """Estimated memory of the loaded index (0 when not loaded)"""
+        index = self.index
+        return index.memory_bytes() if index is not None else 0
+    
+    def unload(self) -> bool:
+        """Release the in-memory index; the next search loads it again from disk"""
+        with self._index_lock:
+            index, self.index = self.index, None
+        if index is None:
+            return False
+        # Searches still holding it finish first
+        index.retire()
+        log.info("Unloaded sparse index: {}", self.index_path)
+        return True
+    
     def reset(self):
-        """Reset index and delete file"""
-        self.bm25 = None
-        self.chunks = []
-        self.tokenized_corpus = []
-        
+        """Reset index and delete its files"""
         try:
-            path = Path(self.index_path)
-            if path.exists():
-                path.unlink()
-                log.info(f"Deleted sparse index file: {self.index_path}")
+            with self._using() as index:
+                index.clear()
+            log.info("Deleted sparse index files: {}", self.index_path)
         except Exception as e:
-            log.error(f"Failed to delete sparse index file: {e}")
+            log.error("Failed to delete sparse index files: {}", e)
         
         log.info("Sparse retriever reset completed")
 
@@ -166,4 +261,4 @@ if __name__ == "__main__":
     # Test search
     results = retriever.search("주요 내용", top_k=3)
     for r in results:
-        log.info(f"Score: {r['score']:.4f} - {r['text'][:100]}...")
+        log.info("Score: {:.4f} - {}...", r["score"], r["text"][:100])
@@ -0,0 +1,620 @@
+"""
+LSM-style sparse index: immutable segments, tombstones and background merging
+"""
+import heapq
+import json
+import math
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+import numpy as np
+from src.retrieval.bm25_index import TERM_OVERHEAD_BYTES, BM25Shard, BM25Statistics, ShardScorer, ShardSummary
+from src.retrieval.chunk_store import ChunkStore
+from src.utils.file_lock import exclusive_lock
+from src.utils.logger import log
+
+MANIFEST_VERSION = 2
+
+# Rough per-chunk cost of the chunk_id -> location bookkeeping
+_CHUNK_OVERHEAD_BYTES = 200
+
+
+def segment_dir_for(manifest_path: str) -> Path:
+    """Directory holding the segment files of the index at manifest_path"""
+    path = Path(manifest_path)
+    return path.parent / f"{path.stem}_segments"
+
+
+def remove_index_files(manifest_path: str):
+    """Delete an index's manifest and segment files without loading it"""
+    Path(manifest_path).unlink(missing_ok=True)
+    shutil.rmtree(segment_dir_for(manifest_path), ignore_errors=True)
+
+
+class Segment:
+    """Immutable batch of chunk-store rows with BM25 postings over local ids"""
+    
+    def __init__(
+        self,
+        segment_id: Optional[int],
+        rows: List[int],
+        store: ChunkStore,
+        tokenize: Callable[[str], List[str]]
+    ):
+        self.rows = np.asarray(rows, dtype=np.int64)
+        if segment_id is not None:
+            self.assign(segment_id)
+        
+        self.shard: Optional[BM25Shard] = BM25Shard(
+            list(range(len(self.rows))),
+            [tokenize(text) for text in store.texts(self.rows.tolist())]
+        )
+        self.summary = ShardSummary(self.shard)
+        self.nbytes = self.shard.nbytes() + self.rows.nbytes
+    
+    def assign(self, segment_id: int):
+        """Give a segment built ahead of time its id"""
+        self.segment_id = segment_id
+        self.file_name = f"seg_{segment_id:06d}.json"
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+class SegmentedIndex:
+    """
+    Sparse index made of immutable segments
+    
+    - A full rebuild writes one segment per shard.
+    - Adding documents writes one small new segment.
+    - Deleting marks (segment, local id) pairs as tombstones.
+    - Updating a chunk tombstones its old location and adds the new one.
+    - A merge policy rewrites segments with many tombstones and folds
+      small segments together once there are too many; once no segment
+      needs merging, the chunk store is compacted if enough of its rows
+      are garbage.
+    
+    Every change writes only the new segment files and a small manifest, so
+    its cost is proportional to the change rather than to the corpus.
+    Readers take a snapshot of the segment/tombstone maps, which writers
+    replace rather than mutate. Like Lucene, BM25 statistics keep counting
+    tombstoned chunks until their segment is merged away. Segments only
+    hold chunk-store rows; text and metadata live in the shared ChunkStore.
+    
+    Other processes (API workers, the folder watcher, ingestion) can change
+    the same index. Changes hold a file lock and start by catching up with
+    the manifest; refresh() does the same for readers when it changed.
+    """
+    
+    def __init__(
+        self,
+        manifest_path: str,
+        tokenize: Callable[[str], List[str]],
+        store: ChunkStore,
+        num_shards: int = 1,
+        processes: bool = False,
+        max_segments: int = 10,
+        merge_factor: int = 4,
+        deletes_ratio: float = 0.3,
+        background_merge: bool = True
+    ):
+        self.manifest_path = Path(manifest_path)
+        self.segment_dir = segment_dir_for(manifest_path)
+        self.tokenize = tokenize
+        self.store = store
+        self.num_shards = max(1, num_shards)
+        self.max_segments = max(self.num_shards, max_segments)
+        self.merge_factor = max(2, merge_factor)
+        self.deletes_ratio = deletes_ratio
+        
+        self.statistics = BM25Statistics()
+        self.scorer = ShardScorer(self.num_shards if processes and self.num_shards > 1 else 0)
+        
+        # Copy-on-write snapshots read by searches without locking
+        self._segments: Dict[int, Segment] = {}
+        self._deleted: Dict[int, FrozenSet[int]] = {}
+        
+        # Bookkeeping guarded by the write lock
+        self._lock = threading.RLock()
+        self._live: Dict[str, Tuple[int, int]] = {}
+        self._by_source: Dict[str, Set[str]] = {}
+        self._next_segment_id = 1
+        # The manifest as this process last saw it
+        self._manifest_version = None
+        self._epoch = 0
+        self.merges = 0
+        
+        self._merge_event = threading.Event()
+        self._closed = False
+        # Searches and writes in progress; a retired index closes after the last
+        self._users = 0
+        self._retired = False
+        self._users_lock = threading.Lock()
+        self._merge_thread = None
+        if background_merge:
+            self._merge_thread = threading.Thread(
+                target=self._merge_loop,
+                name="sparse-merger",
+                daemon=True
+            )
+            self._merge_thread.start()
+    
+    def load(self) -> bool:
+        """Load the manifest and its segments; migrates the legacy single-file format"""
+        if not self.manifest_path.exists():
+            return False
+        
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        
+        if "chunks" in manifest:
+            log.info("Migrating legacy sparse index {} to segments", self.manifest_path)
+            self.replace_all(manifest["chunks"])
+            return True
+        
+        with self._lock, self._exclusive():
+            self._reload()
+        
+        self._merge_event.set()
+        return True
+    
+    def _exclusive(self):
+        """File lock that keeps writers in other processes out"""
+        return exclusive_lock(str(self.manifest_path.with_name(self.manifest_path.name + ".lock")))
+    
+    def _disk_version(self):
+        try:
+            stat = self.manifest_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+    
+    def refresh(self) -> bool:
+        """Pick up changes another process made to the index; returns True if there were any"""
+        if self._disk_version() == self._manifest_version:
+            return False
+        with self._lock, self._exclusive():
+            return self._reload()
+    
+    def _reload(self) -> bool:
+        """Bring segments and tombstones up to date with the manifest (both locks held)"""
+        self.store.refresh()
+        version = self._disk_version()
+        if version == self._manifest_version:
+            return False
+        
+        manifest = {"segments": []}
+        if version is not None:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        
+        segments = {}
+        # A legacy single-file index has no segments until it is migrated
+        for entry in manifest.get("segments", []):
+            # Segments are immutable, so one already loaded is still current
+            segment = self._segments.get(entry["id"])
+            if segment is None:
+                with open(self.segment_dir / entry["file"], "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                # Version 1 segments embedded the chunks themselves
+                legacy = "rows" not in data
+                rows = self.store.put(data["chunks"]) if legacy else data["rows"]
+                segment = Segment(entry["id"], rows, self.store, self.tokenize)
+                if legacy:
+                    self._write_segment(segment)
+            segments[entry["id"]] = segment
+        
+        deleted = {
+            int(segment_id): frozenset(local_ids)
+            for segment_id, local_ids in manifest.get("deleted", {}).items()
+        }
+        removed = [segment for segment_id, segment in self._segments.items() if segment_id not in segments]
+        self._install(segments, deleted)
+        for segment in removed:
+            self._unregister(segment)
+        self._next_segment_id = max(
+            self._next_segment_id,
+            manifest.get("next_segment_id", max(segments, default=0) + 1)
+        )
+        self._manifest_version = version
+        return True
+    
+    def _install(self, segments: Dict[int, Segment], deleted: Dict[int, FrozenSet[int]]):
+        """Register the segments not installed yet and rebuild the live-chunk bookkeeping"""
+        for segment_id, segment in segments.items():
+            if segment_id not in self._segments:
+                self._register(segment)
+        self._segments = segments
+        self._deleted = deleted
+        
+        self._live = {}
+        self._by_source = {}
+        for segment_id in sorted(segments):
+            dead = deleted.get(segment_id, frozenset())
+            for local_id, row in enumerate(segments[segment_id].rows.tolist()):
+                if local_id not in dead:
+                    self._track(row, segment_id, local_id)
+    
+    def _register(self, segment: Segment):
+        self.statistics.add(segment.summary)
+        self.scorer.add(segment.segment_id, segment.shard)
+        if self.scorer.is_parallel:
+            segment.shard = None  # The worker process owns the postings
+    
+    def _unregister(self, segment: Segment):
+        self.scorer.remove(segment.segment_id, len(segment))
+        self.statistics.remove(segment.summary)
+    
+    def _track(self, row: int, segment_id: int, local_id: int):
+        chunk_id = self.store.chunk_id(row)
+        self._live[chunk_id] = (segment_id, local_id)
+        self._by_source.setdefault(self.store.meta(row, "source"), set()).add(chunk_id)
+    
+    def _write_segment(self, segment: Segment):
+        self.segment_dir.mkdir(parents=True, exist_ok=True)
+        self._atomic_write(self.segment_dir / segment.file_name, {"rows": segment.rows.tolist()})
+    
+    def _write_manifest(self):
+        self._atomic_write(self.manifest_path, {
+            "version": MANIFEST_VERSION,
+            "next_segment_id": self._next_segment_id,
+            "segments": [
+                {"id": segment.segment_id, "file": segment.file_name, "count": len(segment)}
+                for segment in self._segments.values()
+            ],
+            "deleted": {
+                str(segment_id): sorted(local_ids)
+                for segment_id, local_ids in self._deleted.items()
+                if local_ids
+            },
+        })
+        self._manifest_version = self._disk_version()
+    
+    @staticmethod
+    def _atomic_write(path: Path, data: Dict):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    
+    def _drop_files(self, segments: List[Segment]):
+        for segment in segments:
+            try:
+                (self.segment_dir / segment.file_name).unlink(missing_ok=True)
+            except OSError as e:
+                log.warning("Failed to delete segment file {}: {}", segment.file_name, e)
+    
+    def _new_segment(self, rows: List[int]) -> Segment:
+        # Tokenized without any lock; the id is assigned when it is committed
+        return Segment(None, rows, self.store, self.tokenize)
+    
+    def _assign(self, segment: Segment):
+        """Number a new segment and write its file (both locks held, after _reload)"""
+        segment.assign(self._next_segment_id)
+        self._next_segment_id += 1
+        self._write_segment(segment)
+    
+    def replace_all(self, chunks: List[Dict]):
+        """Replace the whole index with num_shards fresh segments"""
+        rows = self.store.put(chunks)
+        size = math.ceil(len(rows) / self.num_shards) if rows else 0
+        new_segments = [
+            self._new_segment(rows[start:start + size])
+            for start in range(0, len(rows), size or 1)
+        ]
+        
+        with self._lock, self._exclusive():
+            self._reload()
+            for segment in new_segments:
+                self._assign(segment)
+            old_segments = list(self._segments.values())
+            self._epoch += 1
+            # Swap first so concurrent searches never see an empty index
+            self._install({s.segment_id: s for s in new_segments}, {})
+            for segment in old_segments:
+                self._unregister(segment)
+            self._write_manifest()
+        
+        self._drop_files(old_segments)
+    
+    def add(self, chunks: List[Dict]):
+        """Add chunks as a new segment; chunks with existing ids replace the old copies"""
+        self.replace_source(None, chunks)
+    
+    def replace_source(self, source: Optional[str], chunks: List[Dict]):
+        """
+        Atomically swap in new chunks for a source document
+        
+        Chunk ids that already exist are updated. When source is given, its
+        other live chunks (e.g. a document that got shorter) are deleted.
+        """
+        rows = self.store.put(chunks)
+        segment = self._new_segment(rows) if rows else None
+        
+        with self._lock, self._exclusive():
+            self._reload()
+            if segment is not None:
+                self._assign(segment)
+            tombstones: Dict[int, Set[int]] = {}
+            new_ids = {chunk["metadata"]["chunk_id"] for chunk in chunks}
+            stale = set(new_ids)
+            if source is not None:
+                stale |= self._by_source.get(source, set())
+            
+            for chunk_id in stale:
+                self._forget(chunk_id, tombstones)
+            self.store.discard(stale - new_ids)
+            
+            if segment is not None:
+                self._register(segment)
+                segments = dict(self._segments)
+                segments[segment.segment_id] = segment
+                self._segments = segments
+                for local_id, row in enumerate(rows):
+                    self._track(row, segment.segment_id, local_id)
+            
+            self._apply_tombstones(tombstones)
+            self._write_manifest()
+        
+        self._merge_event.set()
+    
+    def delete_source(self, source: str) -> int:
+        """Tombstone every live chunk of a source document; returns the count"""
+        with self._lock, self._exclusive():
+            self._reload()
+            tombstones: Dict[int, Set[int]] = {}
+            chunk_ids = list(self._by_source.get(source, ()))
+            for chunk_id in chunk_ids:
+                self._forget(chunk_id, tombstones)
+            self.store.discard(chunk_ids)
+            deleted = sum(len(ids) for ids in tombstones.values())
+            if deleted:
+                self._apply_tombstones(tombstones)
+                self._write_manifest()
+        
+        if deleted:
+            self._merge_event.set()
+        return deleted
+    
+    def _forget(self, chunk_id: str, tombstones: Dict[int, Set[int]]):
+        location = self._live.pop(chunk_id, None)
+        if location is None:
+            return
+        segment_id, local_id = location
+        tombstones.setdefault(segment_id, set()).add(local_id)
+        
+        source = self.store.meta(int(self._segments[segment_id].rows[local_id]), "source")
+        ids = self._by_source.get(source)
+        if ids is not None:
+            ids.discard(chunk_id)
+            if not ids:
+                del self._by_source[source]
+    
+    def _apply_tombstones(self, tombstones: Dict[int, Set[int]]):
+        if not tombstones:
+            return
+        deleted = dict(self._deleted)
+        for segment_id, local_ids in tombstones.items():
+            deleted[segment_id] = deleted.get(segment_id, frozenset()) | local_ids
+        self._deleted = deleted
+    
+    def clear(self):
+        """Drop every segment and delete the index files"""
+        with self._lock, self._exclusive():
+            self._reload()
+            old_segments = list(self._segments.values())
+            self._epoch += 1
+            self._segments = {}
+            self._deleted = {}
+            self._live = {}
+            self._by_source = {}
+            for segment in old_segments:
+                self._unregister(segment)
+            
+            self._drop_files(old_segments)
+            self.manifest_path.unlink(missing_ok=True)
+            self._manifest_version = None
+    
+    def search(self, query_terms: List[str], k: int) -> List[Tuple[int, float]]:
+        """Return (chunk-store row, score) pairs for the k best live chunks"""
+        segments = self._segments
+        deleted = self._deleted
+        if not segments or k <= 0:
+            return []
+        
+        idf = self.statistics.idf(query_terms)
+        if not idf:
+            return []
+        
+        # Ask each segment for enough hits to survive its tombstones
+        requests = [
+            (segment_id, min(len(segment), k + len(deleted.get(segment_id, ()))))
+            for segment_id, segment in segments.items()
+        ]
+        partials = self.scorer.top_k(
+            requests, query_terms, idf,
+            self.statistics.avgdl, self.statistics.k1, self.statistics.b
+        )
+        
+        hits = (
+            (score, segment_id, local_id)
+            for segment_id, segment_hits in partials.items()
+            for local_id, score in segment_hits
+            if local_id not in deleted.get(segment_id, ())
+        )
+        return [
+            (int(segments[segment_id].rows[local_id]), score)
+            for score, segment_id, local_id in heapq.nlargest(k, hits, key=lambda hit: hit[0])
+        ]
+    
+    def _pick_merge(self) -> Optional[List[int]]:
+        """Choose segments to merge: tombstone-heavy ones first, then the smallest"""
+        segments = self._segments
+        deleted = self._deleted
+        
+        heavy = [
+            segment_id for segment_id, segment in segments.items()
+            if len(segment) and len(deleted.get(segment_id, ())) / len(segment) >= self.deletes_ratio
+        ]
+        if heavy:
+            return heavy
+        
+        if len(segments) > self.max_segments:
+            smallest = sorted(segments, key=lambda segment_id: len(segments[segment_id]))
+            count = max(self.merge_factor, len(segments) - self.max_segments + 1)
+            return smallest[:count]
+        
+        return None
+    
+    def merge(self) -> bool:
+        """Run one merge step if the policy asks for one; returns True if merged or compacted"""
+        self.refresh()
+        with self._lock:
+            candidates = self._pick_merge()
+            if not candidates:
+                return self._compact_store()
+            epoch = self._epoch
+            old_segments = [self._segments[segment_id] for segment_id in candidates]
+            snapshot_deleted = {segment_id: self._deleted.get(segment_id, frozenset()) for segment_id in candidates}
+        
+        # Build the merged segment outside the lock; searches and writes continue
+        rows = []
+        origins: List[Tuple[int, int]] = []
+        for segment in old_segments:
+            dead = snapshot_deleted[segment.segment_id]
+            for local_id, row in enumerate(segment.rows.tolist()):
+                if local_id not in dead:
+                    origins.append((segment.segment_id, local_id))
+                    rows.append(row)
+        relocation = {origin: new_id for new_id, origin in enumerate(origins)}
+        
+        merged = self._new_segment(rows) if rows else None
+        
+        with self._lock, self._exclusive():
+            self._reload()
+            if epoch != self._epoch or any(s not in self._segments for s in candidates):
+                # The index was rebuilt or merged elsewhere meanwhile; discard this merge
+                return False
+            if merged is not None:
+                self._assign(merged)
+            
+            # Carry over tombstones added while the merge was running
+            late_tombstones = set()
+            for segment_id in candidates:
+                for local_id in self._deleted.get(segment_id, frozenset()) - snapshot_deleted[segment_id]:
+                    if (segment_id, local_id) in relocation:
+                        late_tombstones.add(relocation[(segment_id, local_id)])
+            
+            segments = {s: seg for s, seg in self._segments.items() if s not in candidates}
+            deleted = {s: ids for s, ids in self._deleted.items() if s not in candidates}
+            if merged is not None:
+                self._register(merged)
+                segments[merged.segment_id] = merged
+                if late_tombstones:
+                    deleted[merged.segment_id] = frozenset(late_tombstones)
+                for new_id, row in enumerate(rows):
+                    chunk_id = self.store.chunk_id(row)
+                    if self._live.get(chunk_id) == origins[new_id]:
+                        self._live[chunk_id] = (merged.segment_id, new_id)
+            
+            self._segments = segments
+            self._deleted = deleted
+            for segment in old_segments:
+                self._unregister(segment)
+            self._write_manifest()
+            self.merges += 1
+        
+        self._drop_files(old_segments)
+        log.info(
+            "Merged {} sparse segments into {} ({} chunks)",
+            len(old_segments), f"segment {merged.segment_id}" if merged else "nothing", len(rows)
+        )
+        return True
+    
+    def _compact_store(self) -> bool:
+        """Reclaim replaced and deleted rows once they make up deletes_ratio of the store"""
+        if self.store.garbage_ratio() < self.deletes_ratio:
+            return False
+        reclaimed = self.store.compact()
+        if reclaimed:
+            log.info("Compacted the chunk store: {} garbage rows reclaimed", reclaimed)
+        return reclaimed > 0
+    
+    def _merge_loop(self):
+        while not self._closed:
+            self._merge_event.wait(timeout=60)
+            self._merge_event.clear()
+            if self._closed:
+                break
+            try:
+                while self.merge():
+                    pass
+            except Exception as e:
+                log.error("Background sparse merge failed: {}", e)
+    
+    def acquire(self) -> bool:
+        """Register a user of the index; False once it is retired"""
+        with self._users_lock:
+            if self._retired:
+                return False
+            self._users += 1
+            return True
+    
+    def release(self):
+        with self._users_lock:
+            self._users -= 1
+            idle = self._retired and not self._users
+        if idle:
+            self.close()
+    
+    def retire(self):
+        """Close the index once the users still holding it are done"""
+        with self._users_lock:
+            self._retired = True
+            idle = not self._users
+        if idle:
+            self.close()
+    
+    def close(self):
+        """Stop the merge thread and shard workers"""
+        self._closed = True
+        self._merge_event.set()
+        self.scorer.close()
+    
+    def live_count(self) -> int:
+        return len(self._live)
+    
+    def memory_bytes(self) -> int:
+        """Estimated memory of postings, statistics and bookkeeping"""
+        return (
+            sum(segment.nbytes for segment in self._segments.values())
+            + len(self.statistics.doc_freqs) * TERM_OVERHEAD_BYTES
+            + len(self._live) * _CHUNK_OVERHEAD_BYTES
+        )
+    
+    def source_chunks(self, source: str) -> List[Dict]:
+        """Live chunks of a source document"""
+        with self._lock:
+            locations = [self._live[chunk_id] for chunk_id in self._by_source.get(source, ())]
+            rows = [int(self._segments[segment_id].rows[local_id]) for segment_id, local_id in locations]
+        return [self.store.get(row) for row in rows]
+    
+    def sources(self) -> List[str]:
+        with self._lock:
+            return sorted(self._by_source)
+    
+    def get_stats(self) -> Dict:
+        segments = self._segments
+        deleted = self._deleted
+        return {
+            "segments": len(segments),
+            "deleted_chunks": sum(len(ids) for ids in deleted.values()),
+            "merges": self.merges,
+            "num_shards": self.num_shards,
+            "parallel": self.scorer.is_parallel,
+            "memory_bytes": self.memory_bytes(),
+            **self.statistics.get_stats(),
+        }
@@ -0,0 +1,172 @@
+"""
+Tenant-scoped corpora with on-demand loading and LRU unloading of sparse indexes
+"""
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, NamedTuple, Optional
+from config.settings import settings
+from src.utils.logger import log
+
+# HybridRetriever (and chromadb) is imported when a tenant is opened, so
+# thin generation workers can use the tenant helpers without the indexes
+
+DEFAULT_TENANT = "default"
+
+# Also a valid Chroma collection name once prefixed
+_TENANT_PATTERN = re.compile(r"^[a-z0-9](?:[a-z0-9_-]{0,30}[a-z0-9])?$")
+
+
+class InvalidTenantError(ValueError):
+    """Tenant id that cannot be used as a directory and collection name"""
+
+
+class UnknownTenantError(KeyError):
+    """Tenant without a data or index directory"""
+
+
+class TenantPaths(NamedTuple):
+    """Where one tenant's documents and indexes live"""
+    collection_prefix: str
+    sparse_index_path: str
+    generations_path: str
+    data_path: str
+
+
+def validate_tenant(tenant: Optional[str]) -> str:
+    """Normalize a tenant id; raises InvalidTenantError for names that are not allowed"""
+    if tenant is None or tenant == DEFAULT_TENANT:
+        return DEFAULT_TENANT
+    if not _TENANT_PATTERN.match(tenant):
+        raise InvalidTenantError(f"Invalid tenant id: {tenant}")
+    return tenant
+
+
+def tenant_paths(tenant: Optional[str]) -> TenantPaths:
+    """The default tenant keeps the original single-corpus layout"""
+    tenant = validate_tenant(tenant)
+    if tenant == DEFAULT_TENANT:
+        return TenantPaths(
+            "documents",
+            settings.bm25_index_path,
+            settings.index_generations_path,
+            settings.data_raw_path
+        )
+    index_dir = Path(settings.tenants_index_path) / tenant
+    return TenantPaths(
+        f"tenant_{tenant}",
+        str(index_dir / "bm25_index.json"),
+        str(index_dir / "generations.json"),
+        str(Path(settings.tenants_data_path) / tenant)
+    )
+
+
+def _open_retriever(paths: TenantPaths):
+    from src.retrieval.hybrid_retriever import HybridRetriever
+    
+    return HybridRetriever(
+        collection_prefix=paths.collection_prefix,
+        sparse_index_path=paths.sparse_index_path,
+        generations_path=paths.generations_path
+    )
+
+
+class TenantRegistry:
+    """
+    One HybridRetriever per tenant, opened on first use
+    
+    A tenant exists once its data directory or index directory exists.
+    Opening a tenant is cheap; its sparse index is only loaded by the
+    first search. After each request the registry totals the estimated
+    memory of loaded sparse indexes. While that exceeds the budget it
+    unloads the least recently used ones (never the tenant just served);
+    they reload from disk when next queried.
+    
+    Chroma keeps the HNSW segments it has loaded for the life of the
+    process, so the budget covers BM25 only.
+    """
+    
+    def __init__(
+        self,
+        default=None,
+        budget_bytes: int = None,
+        factory: Callable[[TenantPaths], object] = None
+    ):
+        if budget_bytes is None:
+            budget_bytes = int(settings.sparse_memory_budget_mb * 1024 * 1024)
+        self.budget_bytes = budget_bytes
+        self.factory = factory or _open_retriever
+        self._lock = threading.Lock()
+        # Least recently used first
+        self._retrievers: OrderedDict = OrderedDict()
+        if default is not None:
+            self._retrievers[DEFAULT_TENANT] = default
+        self.evictions = 0
+    
+    @staticmethod
+    def exists(tenant: str) -> bool:
+        if tenant == DEFAULT_TENANT:
+            return True
+        paths = tenant_paths(tenant)
+        return Path(paths.data_path).is_dir() or Path(paths.generations_path).parent.is_dir()
+    
+    def get(self, tenant: Optional[str] = None):
+        """
+        Retriever of a tenant, marked as most recently used
+        
+        Raises InvalidTenantError or UnknownTenantError.
+        """
+        tenant = validate_tenant(tenant)
+        with self._lock:
+            retriever = self._retrievers.get(tenant)
+            if retriever is not None:
+                self._retrievers.move_to_end(tenant)
+                return retriever
+        
+        if not self.exists(tenant):
+            raise UnknownTenantError(f"Unknown tenant: {tenant}")
+        
+        # Opening touches Chroma and the manifest; do it outside the lock
+        retriever = self.factory(tenant_paths(tenant))
+        with self._lock:
+            retriever = self._retrievers.setdefault(tenant, retriever)
+            self._retrievers.move_to_end(tenant)
+        log.info("Opened tenant {}", tenant)
+        return retriever
+    
+    def enforce_budget(self, keep: Optional[str] = None) -> int:
+        """Unload least recently used sparse indexes until the budget is met"""
+        if self.budget_bytes <= 0:
+            return 0
+        keep = validate_tenant(keep)
+        
+        with self._lock:
+            candidates = list(self._retrievers.items())
+        usage = {tenant: retriever.sparse_memory_bytes() for tenant, retriever in candidates}
+        total = sum(usage.values())
+        
+        unloaded = 0
+        for tenant, retriever in candidates:
+            if total <= self.budget_bytes:
+                break
+            if tenant == keep or not usage[tenant]:
+                continue
+            if retriever.unload_sparse():
+                total -= usage[tenant]
+                unloaded += 1
+                log.info("Unloaded sparse index of tenant {} ({:.1f} MB)", tenant, usage[tenant] / 1e6)
+        self.evictions += unloaded
+        return unloaded
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            candidates = list(self._retrievers.items())
+        loaded = {tenant: retriever.sparse_memory_bytes() for tenant, retriever in candidates}
+        return {
+            "open": [tenant for tenant, _ in candidates],
+            "sparse_loaded": [tenant for tenant, nbytes in loaded.items() if nbytes],
+            "sparse_memory_bytes": sum(loaded.values()),
+            "budget_bytes": self.budget_bytes,
+            "evictions": self.evictions,
+        }
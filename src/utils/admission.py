@@ -0,0 +1,155 @@
+"""
+Admission control for calls to external providers
+"""
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+from src.utils.deadline import DeadlineExceeded, current_deadline
+
+INTERACTIVE = 0
+BATCH = 1
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+_priority = contextvars.ContextVar("admission_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(value: int):
+    """Run provider calls made in this context with the given priority class"""
+    token = _priority.set(value)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a call could not be admitted within its maximum wait"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounded concurrency with a priority queue in front of a provider
+
+    At most max_concurrency calls run at once. Further callers wait in a
+    FIFO queue per priority class; interactive callers are always admitted
+    before batch ones, and batch calls may hold at most batch_share of the
+    slots so a reindex cannot starve queries. A caller that would make the
+    queue longer than max_queue, or that waits longer than its class's
+    maximum wait, is rejected with AdmissionRejected instead of piling up.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int = 32,
+        max_wait: float = 2.0,
+        batch_max_wait: float = 120.0,
+        batch_share: float = 0.5
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_limit = max(1, int(self.max_concurrency * batch_share))
+        self.max_queue = max_queue
+        self.max_wait = {INTERACTIVE: max_wait, BATCH: batch_max_wait}
+        self._cond = threading.Condition()
+        self._queues = {INTERACTIVE: deque(), BATCH: deque()}
+        self._in_flight = {INTERACTIVE: 0, BATCH: 0}
+        self.admitted = {INTERACTIVE: 0, BATCH: 0}
+        self.rejected = {INTERACTIVE: 0, BATCH: 0}
+        self._total_wait = 0.0
+
+    def _eligible(self, priority_class: int) -> bool:
+        if sum(self._in_flight.values()) >= self.max_concurrency:
+            return False
+        if priority_class == BATCH:
+            return not self._queues[INTERACTIVE] and self._in_flight[BATCH] < self.batch_limit
+        return True
+
+    def _reject(self, priority_class: int, reason: str):
+        self.rejected[priority_class] += 1
+        raise AdmissionRejected(
+            f"{self.name}: {reason}; try again later",
+            retry_after=max(1.0, math.ceil(self.max_wait[INTERACTIVE]))
+        )
+
+    def acquire(self, priority_class: int = None):
+        """Take a slot, waiting in line if needed"""
+        priority_class = _priority.get() if priority_class is None else priority_class
+        started = time.monotonic()
+        with self._cond:
+            queue = self._queues[priority_class]
+            if not queue and self._eligible(priority_class):
+                self._admit(priority_class, started)
+                return
+            if sum(len(q) for q in self._queues.values()) >= self.max_queue:
+                self._reject(priority_class, "queue is full")
+
+            ticket = object()
+            queue.append(ticket)
+            deadline = started + self.max_wait[priority_class]
+            # A request deadline that ends sooner cuts the wait short
+            request_deadline = current_deadline()
+            try:
+                while not (queue[0] is ticket and self._eligible(priority_class)):
+                    now = time.monotonic()
+                    if request_deadline is not None and request_deadline <= min(now, deadline):
+                        raise DeadlineExceeded(f"{self.name}: request deadline reached waiting for a slot")
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._reject(priority_class, "timed out waiting for a slot")
+                    if request_deadline is not None:
+                        remaining = min(remaining, request_deadline - now)
+                    self._cond.wait(remaining)
+            except BaseException:
+                queue.remove(ticket)
+                self._cond.notify_all()
+                raise
+            queue.popleft()
+            self._admit(priority_class, started)
+            # The next caller in line may fit into a remaining slot
+            self._cond.notify_all()
+
+    def _admit(self, priority_class: int, started: float):
+        self._in_flight[priority_class] += 1
+        self.admitted[priority_class] += 1
+        self._total_wait += time.monotonic() - started
+
+    def release(self, priority_class: int):
+        with self._cond:
+            self._in_flight[priority_class] -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        priority_class = _priority.get()
+        self.acquire(priority_class)
+        try:
+            yield
+        finally:
+            self.release(priority_class)
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self.slot():
+            return fn(*args, **kwargs)
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            admitted = sum(self.admitted.values())
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": {_PRIORITY_NAMES[p]: n for p, n in self._in_flight.items()},
+                "queued": {_PRIORITY_NAMES[p]: len(q) for p, q in self._queues.items()},
+                "admitted": {_PRIORITY_NAMES[p]: n for p, n in self.admitted.items()},
+                "rejected": {_PRIORITY_NAMES[p]: n for p, n in self.rejected.items()},
+                "avg_wait_ms": self._total_wait / admitted * 1000 if admitted else 0.0,
+            }
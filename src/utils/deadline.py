@@ -0,0 +1,52 @@
+"""
+Per-request deadlines propagated to provider and service calls
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when work cannot finish in time: the request's budget ran out or a call timed out"""
+
+
+def after(seconds: Optional[float]) -> Optional[float]:
+    """Absolute deadline (time.monotonic()) `seconds` from now; None for no budget"""
+    return time.monotonic() + seconds if seconds and seconds > 0 else None
+
+
+@contextmanager
+def scope(at: Optional[float]):
+    """Run the enclosed work under an absolute deadline; an earlier enclosing deadline wins"""
+    current = _deadline.get()
+    if at is None or (current is not None and current <= at):
+        yield
+        return
+    token = _deadline.set(at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current deadline, or None without one"""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def bound(timeout: float) -> float:
+    """Shorten a call timeout to the remaining budget; DeadlineExceeded if nothing is left"""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(timeout, left)
@@ -1,23 +1,32 @@
 """
 Logging Configuration using Loguru
 """
+import itertools
 import sys
 from loguru import logger
 from config.settings import settings
 
+# Lowest level any sink accepts; set by setup_logger
+_min_level_no = 0
+
 
 def setup_logger():
     """Configure logger with custom format and handlers"""
+    global _min_level_no
     
     # Remove default handler
     logger.remove()
     
+    # Sinks write from a background thread so the request path only enqueues
+    enqueue = settings.log_enqueue
+    
     # Console handler with custom format
     logger.add(
         sys.stdout,
         format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan> - <level>{message}</level>",
         level=settings.log_level,
         colorize=True,
+        enqueue=enqueue,
     )
     
     # File handler for errors
@@ -28,20 +37,105 @@ def setup_logger():
         rotation="10 MB",
         retention="30 days",
         compression="zip",
+        delay=True,  # Open the file on first write, not at import
+        enqueue=enqueue,
+        serialize=settings.log_json,
     )
     
     # File handler for all logs
     logger.add(
         "logs/app.log",
         format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-        level="DEBUG",
+        level=settings.log_file_level,
         rotation="50 MB",
         retention="7 days",
         compression="zip",
+        delay=True,
+        enqueue=enqueue,
+        serialize=settings.log_json,
+    )
+    
+    _min_level_no = min(
+        logger.level(settings.log_level.upper()).no,
+        logger.level(settings.log_file_level.upper()).no,
     )
     
     return logger
 
 
+def _parse_sample_rates(spec: str) -> dict:
+    """Parse "module=rate,module=rate" into a dict"""
+    rates = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, rate = item.split("=", 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def _sample_rate(name: str) -> float:
+    """Debug sample rate for a module (longest matching prefix wins)"""
+    rates = _parse_sample_rates(settings.log_sample_rates)
+    matches = [prefix for prefix in rates if name == prefix or name.startswith(prefix + ".")]
+    if matches:
+        return rates[max(matches, key=len)]
+    return settings.log_debug_sample_rate
+
+
+class SampledLogger:
+    """
+    Logger for hot paths that keeps debug output cheap
+    
+    Debug and trace calls are dropped before any formatting when no sink
+    accepts them, and otherwise only every Nth call (1 / sample rate) is
+    emitted. Other levels always pass through. Pass arguments instead of
+    f-strings, log.debug("found {} hits", len(hits)), so messages are only
+    formatted for emitted records.
+    """
+    
+    def __init__(self, name: str, rate: float = None):
+        self.name = name
+        rate = _sample_rate(name) if rate is None else rate
+        self.every = 0 if rate <= 0 else max(1, round(1 / rate))
+        self._counter = itertools.count()
+        self._logger = logger.opt(depth=1)
+    
+    def _sampled(self, level_no: int) -> bool:
+        if level_no < _min_level_no or not self.every:
+            return False
+        return next(self._counter) % self.every == 0
+    
+    def trace(self, message, *args, **kwargs):
+        if self._sampled(5):
+            self._logger.trace(message, *args, **kwargs)
+    
+    def debug(self, message, *args, **kwargs):
+        if self._sampled(10):
+            self._logger.debug(message, *args, **kwargs)
+    
+    def info(self, message, *args, **kwargs):
+        self._logger.info(message, *args, **kwargs)
+    
+    def success(self, message, *args, **kwargs):
+        self._logger.success(message, *args, **kwargs)
+    
+    def warning(self, message, *args, **kwargs):
+        self._logger.warning(message, *args, **kwargs)
+    
+    def error(self, message, *args, **kwargs):
+        self._logger.error(message, *args, **kwargs)
+    
+    def exception(self, message, *args, **kwargs):
+        self._logger.exception(message, *args, **kwargs)
+    
+    def critical(self, message, *args, **kwargs):
+        self._logger.critical(message, *args, **kwargs)
+
+
+def get_logger(name: str) -> SampledLogger:
+    """Sampled, lazily formatting logger for modules on the query path"""
+    return SampledLogger(name)
+
+
 # Initialize logger
 log = setup_logger()
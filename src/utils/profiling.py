@@ -0,0 +1,283 @@
+"""
+On-demand profiling of live requests
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+
+class ProfilingBusy(RuntimeError):
+    """Raised when a profiling session is started while another one runs"""
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class ProfileSession:
+    """
+    Profile of the next `requests` requests, or of every request for `seconds`
+
+    deterministic: cProfile in each profiled request's thread (exact call
+        counts, pstats output; slows the profiled requests noticeably)
+    sampling: a background thread samples the stacks of the threads serving
+        profiled requests every sample_interval seconds (collapsed stacks
+        for flame graphs; low overhead)
+    memory: tracemalloc for the whole process while the session runs
+        (allocations of other requests are included)
+
+    A session lives in the worker process that started it and only sees the
+    requests that worker serves; pid identifies that worker.
+    """
+
+    def __init__(
+        self,
+        requests: Optional[int] = None,
+        seconds: Optional[float] = None,
+        deterministic: bool = True,
+        sampling: bool = True,
+        memory: bool = False,
+        sample_interval: float = 0.005
+    ):
+        if not requests and not seconds:
+            raise ValueError("Give a number of requests or a time window")
+        self.requests = requests
+        self.seconds = seconds
+        self.deterministic = deterministic
+        self.sampling = sampling
+        self.memory = memory
+        self.sample_interval = max(0.001, sample_interval)
+
+        self.pid = os.getpid()
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._deadline = time.monotonic() + seconds if seconds else None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self.admitted = 0
+        self.captured = 0
+        self.cpu_seconds = 0.0
+        self._threads: Dict[int, int] = {}
+        self._profiles: List[cProfile.Profile] = []
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.memory_stats: Optional[Dict] = None
+        self._owns_tracemalloc = False
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def _expired(self) -> bool:
+        return self._deadline is not None and time.monotonic() >= self._deadline
+
+    def _begin(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self._owns_tracemalloc = True
+        if self.memory:
+            tracemalloc.reset_peak()
+        threading.Thread(target=self._monitor, name="profiler", daemon=True).start()
+
+    def _monitor(self):
+        """Sample profiled threads and end the session when its window closes"""
+        interval = self.sample_interval if self.sampling else 0.1
+        while not self._done.wait(interval):
+            if self._expired():
+                with self._lock:
+                    idle = not self._threads
+                if idle:
+                    self._finish()
+                    return
+            if not self.sampling:
+                continue
+            with self._lock:
+                thread_ids = list(self._threads)
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[";".join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def admit(self) -> bool:
+        """Whether the calling request is profiled; registers its thread"""
+        with self._lock:
+            if self.finished or self._expired():
+                return False
+            if self.requests and self.admitted >= self.requests:
+                return False
+            self.admitted += 1
+            thread_id = threading.get_ident()
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+            return True
+
+    def release(self, profile: Optional[cProfile.Profile], cpu_seconds: float):
+        thread_id = threading.get_ident()
+        with self._lock:
+            self.captured += 1
+            self.cpu_seconds += cpu_seconds
+            if profile is not None:
+                self._profiles.append(profile)
+            self._threads[thread_id] -= 1
+            if not self._threads[thread_id]:
+                del self._threads[thread_id]
+            complete = (self.requests and self.captured >= self.requests) or (self._expired() and not self._threads)
+        if complete:
+            self._finish()
+
+    def _finish(self):
+        with self._lock:
+            if self.finished:
+                return
+            if self.memory and tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+                top = snapshot.statistics("lineno")[:25]
+                self.memory_stats = {
+                    "current_bytes": current,
+                    "peak_bytes": peak,
+                    "top_allocations": [
+                        {"location": str(stat.traceback[0]), "size_bytes": stat.size, "count": stat.count}
+                        for stat in top
+                    ],
+                }
+                if self._owns_tracemalloc:
+                    tracemalloc.stop()
+            self.finished_at = time.time()
+            self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def pstats(self) -> Optional[pstats.Stats]:
+        """Merged cProfile statistics of the captured requests"""
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0], stream=io.StringIO())
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+    def pstats_bytes(self) -> Optional[bytes]:
+        """The file format of pstats.Stats.dump_stats (readable by pstats, snakeviz, ...)"""
+        stats = self.pstats()
+        return marshal.dumps(stats.stats) if stats is not None else None
+
+    def pstats_text(self, limit: int = 40, sort: str = "cumulative") -> str:
+        stats = self.pstats()
+        if stats is None:
+            return ""
+        stats.stream = io.StringIO()
+        stats.sort_stats(sort).print_stats(limit)
+        return stats.stream.getvalue()
+
+    def collapsed(self) -> str:
+        """Sampled stacks in collapsed format ("frame;frame;frame count" per line)"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def get_stats(self) -> Dict:
+        return {
+            "pid": self.pid,
+            "finished": self.finished,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "requests": self.requests,
+            "seconds": self.seconds,
+            "deterministic": self.deterministic,
+            "sampling": self.sampling,
+            "memory": self.memory,
+            "admitted": self.admitted,
+            "captured": self.captured,
+            "cpu_seconds": self.cpu_seconds,
+            "samples": self.samples,
+            "memory_stats": self.memory_stats,
+        }
+
+
+_lock = threading.Lock()
+_active: Optional[ProfileSession] = None
+_last: Optional[ProfileSession] = None
+_capturing = threading.local()
+
+
+def start(**kwargs) -> ProfileSession:
+    """Start a session (see ProfileSession); only one runs at a time"""
+    global _active, _last
+    with _lock:
+        if _active is not None and not _active.finished:
+            raise ProfilingBusy(f"A profiling session is already running in this worker (pid {_active.pid})")
+        session = ProfileSession(**kwargs)
+        session._begin()
+        _active = _last = session
+        return session
+
+
+def stop() -> Optional[ProfileSession]:
+    """End the running session early and keep what it captured"""
+    global _active
+    with _lock:
+        session, _active = _active, None
+    if session is not None:
+        session._finish()
+    return session
+
+
+def last_session() -> Optional[ProfileSession]:
+    """The running session, or else the most recent one"""
+    return _last
+
+
+@contextmanager
+def capture():
+    """Profile the enclosed request if a session wants it (one attribute check otherwise)"""
+    session = _active
+    if session is None or session.finished or getattr(_capturing, "active", False) or not session.admit():
+        yield
+        return
+
+    _capturing.active = True
+    profile = cProfile.Profile() if session.deterministic else None
+    started = time.thread_time()
+    try:
+        if profile is not None:
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler (a debugger, sys.setprofile) owns this thread
+                profile = None
+        yield
+    finally:
+        if profile is not None:
+            profile.disable()
+        _capturing.active = False
+        session.release(profile, time.thread_time() - started)
+
+
+def profiled(fn: Callable) -> Callable:
+    """fn wrapped in capture(), for handing request work to a thread pool"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _active is None:
+            return fn(*args, **kwargs)
+        with capture():
+            return fn(*args, **kwargs)
+    return wrapper
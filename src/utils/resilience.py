@@ -0,0 +1,180 @@
+"""
+Circuit breaking and hedged requests for calls to external providers
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Fail fast while a provider is degraded
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    fail immediately with CircuitOpenError. Once reset_timeout has passed, a
+    single trial call is let through (half-open): success closes the
+    circuit, failure opens it again. Only exceptions for which is_failure
+    returns True count; e.g. a bad request says nothing about provider health.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        is_failure: Callable[[BaseException], bool] = None
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure or (lambda e: True)
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def _admit(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if time.monotonic() - self._opened_at >= self.reset_timeout and not self._trial_in_flight:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"{self.name} circuit is open; failing fast")
+
+    def _on_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def _on_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn unless the circuit is open, recording the outcome"""
+        self._admit()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            if self.is_failure(e):
+                self._on_failure()
+            else:
+                self._on_success()
+            raise
+        self._on_success()
+        return result
+
+    def get_stats(self) -> Dict:
+        """Get circuit statistics"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "rejected": self.rejected,
+        }
+
+
+class Hedger:
+    """
+    Hedged requests for latency-sensitive idempotent calls
+
+    The call is started once. If it has not completed after the observed
+    latency percentile (p95 by default), an identical backup call is sent,
+    and whichever succeeds first wins. This cuts tail latency for about
+    (1 - percentile) extra requests. Errors are not hedged; they propagate.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        window: int = 200,
+        min_samples: int = 20,
+        initial_delay: float = 1.0,
+        min_delay: float = 0.05,
+        max_workers: int = 8
+    ):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self.calls = 0
+        self.hedged = 0
+        self.backup_wins = 0
+
+    def delay(self) -> float:
+        """Seconds to wait before sending the backup request"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return max(self.min_delay, ordered[index])
+
+    def _record(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn, sending one backup copy if it is slower than the hedge delay"""
+        self.calls += 1
+        started = time.perf_counter()
+        primary = self._executor.submit(fn, *args, **kwargs)
+
+        done, _ = wait([primary], timeout=self.delay())
+        if done:
+            result = primary.result()
+            self._record(time.perf_counter() - started)
+            return result
+
+        self.hedged += 1
+        backup = self._executor.submit(fn, *args, **kwargs)
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is backup:
+                        self.backup_wins += 1
+                    self._record(time.perf_counter() - started)
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def get_stats(self) -> Dict:
+        """Get hedging statistics"""
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "backup_wins": self.backup_wins,
+            "delay_seconds": round(self.delay(), 4),
+        }
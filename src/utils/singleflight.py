@@ -0,0 +1,86 @@
+"""
+Single-flight request coalescing
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class WaitTimeout(TimeoutError):
+    """Raised to a waiting caller whose timeout ran out before the shared call finished"""
+
+
+class _Call:
+    """A single in-flight computation shared by concurrent callers"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share the same key
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait for it and receive the same result (or exception).
+    A waiter can bound its wait with a timeout; the shared call keeps running
+    for the others. Nothing is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.timed_out = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """Run fn once per in-flight key and share its outcome (WaitTimeout if a waiter's timeout runs out)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            if not call.done.wait(None if timeout is None else max(timeout, 0)):
+                with self._lock:
+                    self.timed_out += 1
+                raise WaitTimeout(f"Gave up waiting for in-flight call {key!r} after {timeout:.2f}s")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+        return call.result
+
+    def in_flight(self) -> int:
+        """Number of keys currently being computed"""
+        with self._lock:
+            return len(self._calls)
+
+    def get_stats(self) -> Dict:
+        """Get coalescing statistics"""
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "timed_out": self.timed_out,
+            "in_flight": self.in_flight(),
+        }
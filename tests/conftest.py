@@ -0,0 +1,130 @@
+"""
+Shared fixtures and fakes for the test suite
+"""
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from config.settings import settings
+from src.utils import admission
+
+# Chunks of one travel policy document, as retrieval would return them
+TRAVEL_CHUNKS = [
+    {
+        "text": "출장비는 귀임 후 7일 이내에 정산해야 합니다. 영수증 원본을 첨부합니다. 사내 식당은 12시에 엽니다.",
+        "metadata": {"chunk_id": "travel_1", "source": "travel.docx", "section_title": "정산"},
+    },
+    {
+        "text": "해외 출장은 사전 승인이 필요합니다. 승인권자는 본부장입니다.",
+        "metadata": {"chunk_id": "travel_2", "source": "travel.docx", "section_title": "승인"},
+    },
+]
+
+
+class FakeEmbeddings:
+    """Deterministic embeddings without calling the provider"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def embed_texts(self, texts, batch_size=100):
+        self.calls += 1
+        return [[float(len(t) % 7), float(len(t) % 5), 1.0] for t in texts]
+    
+    def embed_text(self, text):
+        return self.embed_texts([text])[0]
+
+
+class NodeStub:
+    """Stands in for the RAG chain of a node that only serves retrieval"""
+    
+    def __init__(self, tenants):
+        self.tenants = tenants
+
+
+class _StaticRetriever:
+    def __init__(self, chunks):
+        self.chunks = chunks
+    
+    def search(self, question, top_k=None, **kwargs):
+        return [dict(chunk) for chunk in self.chunks]
+
+
+class _StaticTenants:
+    def __init__(self, chunks):
+        self.retriever = _StaticRetriever(chunks)
+    
+    def get(self, tenant=None):
+        return self.retriever
+    
+    def enforce_budget(self, keep=None):
+        return 0
+
+
+def stub_chain(client, chunks=TRAVEL_CHUNKS, compressor=None):
+    """RAGChain with a fake chat client over fixed retrieval results (no indexes, no provider)"""
+    from src.generation.rag_chain import RAGChain
+    from src.utils.singleflight import SingleFlight
+    
+    chain = RAGChain.__new__(RAGChain)
+    chain.client = client
+    chain.remote = False
+    chain.tenants = _StaticTenants(chunks)
+    chain.retriever = chain.tenants.retriever
+    chain.model = "test-model"
+    chain._inflight = SingleFlight()
+    chain.compressor = compressor
+    return chain
+
+
+def hold_slot(controller, release: threading.Event, priority_class=admission.INTERACTIVE):
+    """Occupy one admission slot from a background thread until release is set"""
+    started = threading.Event()
+    
+    def run():
+        with admission.priority(priority_class):
+            controller.call(lambda: (started.set(), release.wait(5)))
+    
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert started.wait(2)
+    return thread
+
+
+@pytest.fixture
+def index_dirs(tmp_path, monkeypatch):
+    """Keep every index and corpus directory under tmp_path, with sparse merges run inline"""
+    index_dir = tmp_path / "index"
+    monkeypatch.setattr(settings, "chroma_db_path", str(index_dir / "chroma"))
+    monkeypatch.setattr(settings, "bm25_index_path", str(index_dir / "bm25_index.json"))
+    monkeypatch.setattr(settings, "index_generations_path", str(index_dir / "generations.json"))
+    monkeypatch.setattr(settings, "tenants_index_path", str(index_dir / "tenants"))
+    monkeypatch.setattr(settings, "tenants_data_path", str(tmp_path / "data"))
+    monkeypatch.setattr(settings, "data_raw_path", str(tmp_path / "raw"))
+    monkeypatch.setattr(settings, "bm25_background_merge", False)
+    return tmp_path
+
+
+@pytest.fixture
+def service(index_dirs, monkeypatch):
+    """A retrieval node serving tenant "hr" in process, and a remote client talking to it"""
+    from api.main import app
+    from api.routers import rag
+    from src.retrieval.remote_retriever import RemoteRetriever, _ServiceConnection
+    from src.retrieval.tenants import TenantRegistry
+    
+    monkeypatch.setattr(settings, "retrieval_service_key", "test-service-key")
+    (index_dirs / "data" / "hr").mkdir(parents=True)
+    registry = TenantRegistry()
+    local = registry.get("hr")
+    local.dense_retriever.embedding_manager = FakeEmbeddings()
+    local.index_chunks([
+        {"text": f"인사 규정 {i} term{i} " * (i % 3 + 1), "metadata": {"chunk_id": f"hr_{i}", "source": "hr.docx"}}
+        for i in range(12)
+    ])
+    monkeypatch.setattr(rag, "get_rag_chain", lambda: NodeStub(registry))
+    
+    remote = RemoteRetriever(
+        tenant="hr",
+        connection=_ServiceConnection("http://testserver", client=TestClient(app))
+    )
+    return local, remote
@@ -0,0 +1,101 @@
+"""
+Test cases for admission control
+"""
+import threading
+import time
+import pytest
+from src.utils import admission
+from src.utils.admission import AdmissionController, AdmissionRejected
+from tests.conftest import hold_slot
+
+
+def test_concurrency_is_bounded():
+    controller = AdmissionController("test", max_concurrency=2, max_wait=5)
+    lock = threading.Lock()
+    running = []
+    peak = []
+    
+    def work():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+    
+    threads = [threading.Thread(target=controller.call, args=(work,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert max(peak) == 2
+    assert controller.get_stats()["admitted"]["interactive"] == 6
+
+
+def test_full_queue_rejects_fast():
+    controller = AdmissionController("test", max_concurrency=1, max_queue=0, max_wait=5)
+    release = threading.Event()
+    holder = hold_slot(controller, release)
+    
+    started = time.perf_counter()
+    with pytest.raises(AdmissionRejected) as info:
+        controller.call(lambda: None)
+    assert time.perf_counter() - started < 0.5
+    assert info.value.retry_after >= 1
+    
+    release.set()
+    holder.join()
+    assert controller.get_stats()["rejected"]["interactive"] == 1
+
+
+def test_wait_is_bounded():
+    controller = AdmissionController("test", max_concurrency=1, max_wait=0.1)
+    release = threading.Event()
+    holder = hold_slot(controller, release)
+    
+    with pytest.raises(AdmissionRejected):
+        controller.call(lambda: None)
+    
+    release.set()
+    holder.join()
+    assert controller.call(lambda: "ok") == "ok"
+    assert controller.get_stats()["queued"] == {"interactive": 0, "batch": 0}
+
+
+def test_interactive_goes_before_batch():
+    controller = AdmissionController("test", max_concurrency=1, max_wait=5, batch_max_wait=5)
+    release = threading.Event()
+    holder = hold_slot(controller, release)
+    order = []
+    
+    def call(priority_class, label):
+        with admission.priority(priority_class):
+            controller.call(order.append, label)
+    
+    batch = threading.Thread(target=call, args=(admission.BATCH, "batch"))
+    batch.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(target=call, args=(admission.INTERACTIVE, "interactive"))
+    interactive.start()
+    time.sleep(0.05)
+    
+    release.set()
+    for thread in (holder, batch, interactive):
+        thread.join()
+    assert order == ["interactive", "batch"]
+
+
+def test_batch_cannot_take_every_slot():
+    controller = AdmissionController("test", max_concurrency=2, batch_share=0.5, batch_max_wait=0.1)
+    release = threading.Event()
+    holder = hold_slot(controller, release, admission.BATCH)
+    
+    with admission.priority(admission.BATCH):
+        with pytest.raises(AdmissionRejected):
+            controller.call(lambda: None)
+    # The remaining slot stays available to interactive calls
+    assert controller.call(lambda: "ok") == "ok"
+    
+    release.set()
+    holder.join()
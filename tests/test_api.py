@@ -1,9 +1,11 @@
 """
 Test cases for Hybrid RAG System
 """
+import time
 import pytest
 from fastapi.testclient import TestClient
 from api.main import app
+from benchmarks.import_time import DEFAULT_FORBIDDEN, profile_imports, summarize
 
 client = TestClient(app)
 
@@ -22,6 +24,24 @@ def test_root_endpoint():
     assert "status" in response.json()
 
 
+def test_readiness_probe_after_warmup(index_dirs, monkeypatch):
+    """Readiness probe turns ready once startup warmup completes"""
+    from api.routers import rag
+    
+    # Warm up a chain over the temporary index, not the shared one
+    monkeypatch.setattr(rag, "_rag_chain", None)
+    with TestClient(app) as warm_client:
+        deadline = time.time() + 30
+        response = warm_client.get("/ready")
+        while response.status_code != 200 and time.time() < deadline:
+            assert response.status_code == 503
+            time.sleep(0.1)
+            response = warm_client.get("/ready")
+        
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+
+
 def test_stats_endpoint():
     """Test statistics endpoint"""
     response = client.get("/api/v1/stats")
@@ -68,5 +88,76 @@ def test_query_endpoint_valid():
     assert "confidence" in data
 
 
+def test_serving_import_is_lightweight():
+    """Importing the API must not load query- or ingestion-only dependencies"""
+    report = summarize(profile_imports("api.main"), "api.main", 5, DEFAULT_FORBIDDEN)
+    assert report["forbidden_loaded"] == []
+
+
+def test_document_endpoints_reject_paths():
+    """Single-document endpoints only accept plain .docx/.pdf file names"""
+    response = client.delete("/api/v1/documents/notes.txt")
+    assert response.status_code == 400
+
+
+def test_query_rejected_under_overload(monkeypatch):
+    """Admission control rejections surface as 503 with Retry-After"""
+    from api.routers import rag
+    from src.utils.admission import AdmissionRejected
+    
+    class Overloaded:
+        class tenants:
+            get = staticmethod(lambda tenant: None)
+        
+        def query(self, **kwargs):
+            raise AdmissionRejected("openai-chat: queue is full; try again later", retry_after=2)
+    
+    monkeypatch.setattr(rag, "get_rag_chain", lambda: Overloaded())
+    response = client.post("/api/v1/query", json={"question": "테스트 질문입니다"})
+    
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "2"
+
+
+def test_warmup_retries_until_ready(monkeypatch):
+    """A failed warmup is retried with backoff instead of leaving /ready at 503"""
+    import threading
+    from api.routers import rag
+    from config.settings import settings
+    
+    class Flaky:
+        attempts = 0
+        
+        def warmup(self):
+            Flaky.attempts += 1
+            if Flaky.attempts < 3:
+                raise RuntimeError("index not built yet")
+    
+    monkeypatch.setattr(settings, "warmup_retry_seconds", 0.01)
+    monkeypatch.setattr(rag, "_ready", threading.Event())
+    monkeypatch.setattr(rag, "get_rag_chain", lambda: Flaky())
+    
+    rag.warmup()
+    
+    assert Flaky.attempts == 3
+    assert rag.is_ready() and rag.get_warmup_error() is None
+
+
+def test_provider_warmup_is_best_effort():
+    """An embedding provider error during warmup is logged, not raised"""
+    from types import SimpleNamespace
+    from src.generation.rag_chain import RAGChain
+    
+    def fail(text):
+        raise ConnectionError("provider unreachable")
+    
+    embeddings = SimpleNamespace(client=object(), embed_text=fail)
+    chain = RAGChain.__new__(RAGChain)
+    chain.remote = False
+    chain.retriever = SimpleNamespace(warmup=lambda: None, dense_retriever=SimpleNamespace(embedding_manager=embeddings))
+    
+    chain.warmup()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,198 @@
+"""
+Test cases for the segmented BM25 index
+"""
+import json
+import random
+import pytest
+from rank_bm25 import BM25Okapi
+from src.retrieval.chunk_store import ChunkStore
+from src.retrieval.sparse_segments import SegmentedIndex
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = random.Random(7)
+    vocab = [f"term{i}" for i in range(400)]
+    weights = [1 / (i + 1) for i in range(len(vocab))]
+    return [rng.choices(vocab, weights=weights, k=rng.randint(5, 60)) for _ in range(600)]
+
+
+def _chunk(chunk_id: str, text: str, source: str = "doc.docx"):
+    return {"text": text, "metadata": {"chunk_id": chunk_id, "source": source}}
+
+
+def _filler(count: int = 10):
+    # Unrelated chunks so shared terms keep a positive IDF in tiny corpora
+    return [_chunk(f"filler_{i}", f"filler{i} padding{i}", "filler.docx") for i in range(count)]
+
+
+def _chunks(tokenized_corpus):
+    return [_chunk(f"doc_{i}", " ".join(tokens)) for i, tokens in enumerate(tokenized_corpus)]
+
+
+def _index(tmp_path, **kwargs):
+    kwargs.setdefault("background_merge", False)
+    return SegmentedIndex(
+        str(tmp_path / "bm25_index.json"),
+        tokenize=str.split,
+        store=ChunkStore(str(tmp_path / "chunks")),
+        **kwargs
+    )
+
+
+def _ids(index, hits):
+    return [index.store.chunk_id(row) for row, _ in hits]
+
+
+def _reference_top_k(reference: BM25Okapi, query, k):
+    scores = reference.get_scores(query)
+    ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+    return [round(scores[i], 6) for i in ranked if scores[i] > 0]
+
+
+@pytest.mark.parametrize("num_shards,processes", [(1, False), (5, False), (3, True)])
+def test_sharded_scores_match_monolithic_bm25(tmp_path, corpus, num_shards, processes):
+    """Global IDF keeps sharded scores identical to a single BM25Okapi index"""
+    reference = BM25Okapi(corpus)
+    index = _index(tmp_path, num_shards=num_shards, processes=processes)
+    index.replace_all(_chunks(corpus))
+    
+    try:
+        assert index.get_stats()["segments"] == num_shards
+        for query in (["term1", "term30"], ["term3", "term3", "term250"], ["term399"]):
+            hits = index.search(query, 10)
+            assert [round(score, 6) for _, score in hits] == _reference_top_k(reference, query, 10)
+    finally:
+        index.close()
+
+
+def test_unknown_terms_return_nothing(tmp_path, corpus):
+    index = _index(tmp_path, num_shards=2)
+    index.replace_all(_chunks(corpus))
+    assert index.search(["missing"], 5) == []
+
+
+def test_more_shards_than_documents(tmp_path):
+    index = _index(tmp_path, num_shards=8)
+    index.replace_all(_chunks([["a", "b"], ["b", "c"], ["a", "d"]]))
+    assert index.get_stats()["segments"] == 3
+    assert _ids(index, index.search(["c"], 5))[0] == "doc_1"
+
+
+def test_add_and_delete_source(tmp_path):
+    """Incremental adds are searchable and deletes hide a document at once"""
+    index = _index(tmp_path)
+    index.replace_all([_chunk("a_0", "alpha beta", "a.docx"), _chunk("b_0", "beta gamma", "b.docx")] + _filler())
+    index.add([_chunk("c_0", "gamma delta", "c.docx")])
+    
+    assert index.get_stats()["segments"] == 2
+    assert _ids(index, index.search(["delta"], 5)) == ["c_0"]
+    
+    assert index.delete_source("b.docx") == 1
+    assert index.delete_source("b.docx") == 0
+    assert _ids(index, index.search(["gamma"], 5)) == ["c_0"]
+    assert index.sources() == ["a.docx", "c.docx", "filler.docx"]
+    assert index.live_count() == 12
+
+
+def test_replace_source_swaps_chunks(tmp_path):
+    """Updating a document replaces changed chunks and drops removed ones"""
+    index = _index(tmp_path)
+    index.replace_all([
+        _chunk("a_0", "old intro", "a.docx"),
+        _chunk("a_1", "old appendix", "a.docx"),
+        _chunk("b_0", "other text", "b.docx"),
+    ] + _filler())
+    
+    index.replace_source("a.docx", [_chunk("a_0", "new intro", "a.docx")])
+    
+    assert index.search(["old"], 5) == []
+    assert [index.store.text(row) for row, _ in index.search(["intro"], 5)] == ["new intro"]
+    assert index.live_count() == 12
+
+
+def test_merge_compacts_tombstones_and_small_segments(tmp_path):
+    index = _index(tmp_path, max_segments=2, merge_factor=2, deletes_ratio=0.5)
+    index.replace_all(_filler())
+    for i in range(4):
+        index.add([_chunk(f"d{i}_0", f"shared word{i}", f"d{i}.docx")])
+    index.delete_source("d0.docx")
+    
+    while index.merge():
+        pass
+    
+    stats = index.get_stats()
+    assert stats["segments"] <= 2
+    assert stats["deleted_chunks"] == 0
+    assert index.live_count() == 13
+    assert len(index.search(["shared"], 10)) == 3
+    assert len(list((tmp_path / "bm25_index_segments").glob("*.json"))) == stats["segments"]
+
+
+def test_merge_reclaims_replaced_chunk_store_rows(tmp_path):
+    index = _index(tmp_path, deletes_ratio=0.3)
+    index.replace_all([_chunk("a_0", "draft 0", "a.docx")] + _filler())
+    for version in range(1, 6):
+        index.replace_source("a.docx", [_chunk("a_0", f"draft {version}", "a.docx")])
+    assert index.store.garbage_ratio() > 0.3
+    
+    while index.merge():
+        pass
+    
+    assert index.store.garbage_ratio() == 0
+    live_texts = ["draft 5"] + [chunk["text"] for chunk in _filler()]
+    assert index.store.get_stats()["text_bytes"] == sum(len(text) for text in live_texts)
+    assert [index.store.text(row) for row, _ in index.search(["draft"], 5)] == ["draft 5"]
+    
+    reloaded = _index(tmp_path)
+    assert reloaded.load()
+    assert _ids(reloaded, reloaded.search(["draft"], 5)) == ["a_0"]
+
+
+def test_reload_restores_segments_and_tombstones(tmp_path):
+    index = _index(tmp_path)
+    index.replace_all([_chunk("a_0", "alpha", "a.docx"), _chunk("b_0", "alpha beta", "b.docx")] + _filler())
+    index.add([_chunk("c_0", "alpha gamma", "c.docx")])
+    index.delete_source("a.docx")
+    
+    reloaded = _index(tmp_path)
+    assert reloaded.load()
+    assert reloaded.live_count() == 12
+    assert set(_ids(reloaded, reloaded.search(["alpha"], 5))) == {"b_0", "c_0"}
+
+
+def test_legacy_index_is_migrated(tmp_path):
+    legacy = {"chunks": [_chunk("a_0", "alpha beta"), _chunk("a_1", "gamma")] + _filler()}
+    (tmp_path / "bm25_index.json").write_text(json.dumps(legacy), encoding="utf-8")
+    
+    index = _index(tmp_path)
+    assert index.load()
+    assert index.live_count() == 12
+    assert _ids(index, index.search(["gamma"], 5)) == ["a_1"]
+    assert "segments" in json.loads((tmp_path / "bm25_index.json").read_text(encoding="utf-8"))
+
+
+def test_changes_from_another_process_are_picked_up(tmp_path):
+    # Two instances on one manifest stand in for an API worker and the folder watcher
+    watcher = _index(tmp_path)
+    watcher.replace_all([_chunk("a_0", "alpha", "a.docx")] + _filler())
+    worker = _index(tmp_path)
+    assert worker.load()
+    assert not worker.refresh()
+    
+    watcher.add([_chunk("b_0", "alpha beta", "b.docx")])
+    watcher.delete_source("a.docx")
+    assert worker.refresh()
+    assert _ids(worker, worker.search(["alpha"], 5)) == ["b_0"]
+    assert worker.sources() == ["b.docx", "filler.docx"]
+    
+    # A segment added by the worker gets an id of its own
+    worker.add([_chunk("c_0", "alpha gamma", "c.docx")])
+    assert watcher.refresh()
+    assert set(_ids(watcher, watcher.search(["alpha"], 5))) == {"b_0", "c_0"}
+    assert watcher.get_stats()["segments"] == 3
+    
+    worker.replace_all([_chunk("d_0", "delta", "d.docx")] + _filler())
+    assert watcher.refresh()
+    assert _ids(watcher, watcher.search(["delta"], 5)) == ["d_0"]
+    assert watcher.search(["alpha"], 5) == []
@@ -0,0 +1,140 @@
+"""
+Test cases for the columnar chunk store
+"""
+import os
+from src.retrieval.chunk_store import ChunkStore
+
+
+def _chunk(chunk_id: str, text: str, source: str = "doc.docx", **metadata):
+    return {"text": text, "metadata": {"chunk_id": chunk_id, "source": source, **metadata}}
+
+
+def test_put_and_materialize(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    rows = store.put([_chunk("a_0", "첫 번째 청크"), _chunk("a_1", "second", section_title="개요")])
+    
+    assert rows == [0, 1]
+    assert store.get(1) == {
+        "text": "second",
+        "metadata": {"chunk_id": "a_1", "source": "doc.docx", "section_title": "개요"},
+    }
+    # Columns added later are absent for earlier rows
+    assert store.metadata(0) == {"chunk_id": "a_0", "source": "doc.docx"}
+    assert store.row_of("a_1") == 1
+    assert store.meta(0, "source") == "doc.docx"
+
+
+def test_unchanged_chunks_keep_their_row(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.put([_chunk("a_0", "alpha"), _chunk("a_1", "beta")])
+    
+    assert store.put([_chunk("a_0", "alpha"), _chunk("a_1", "beta v2")]) == [0, 2]
+    assert store.row_of("a_1") == 2
+    assert len(store) == 3
+
+
+def test_repeated_metadata_is_interned(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.put([_chunk(f"a_{i}", f"text {i}", section_title="같은 절") for i in range(100)])
+    
+    # One source and one section title, however many chunks
+    assert store.get_stats()["interned_values"] == 2
+
+
+def test_reopen_and_recover_partial_append(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.put([_chunk("a_0", "alpha"), _chunk("a_1", "beta")])
+    
+    # An append interrupted before its end offsets were written
+    with open(tmp_path / "text.bin", "ab") as f:
+        f.write("orphan".encode("utf-8"))
+    
+    reopened = ChunkStore(str(tmp_path))
+    assert len(reopened) == 2
+    assert reopened.text(1) == "beta"
+    assert os.path.getsize(tmp_path / "text.bin") == len("alphabeta")
+    assert reopened.put([_chunk("b_0", "gamma")]) == [2]
+    assert reopened.text(2) == "gamma"
+
+
+def test_clear(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.put([_chunk("a_0", "alpha")])
+    store.clear()
+    
+    assert len(store) == 0
+    assert store.row_of("a_0") is None
+    assert store.put([_chunk("b_0", "beta")]) == [0]
+
+
+def test_compaction_reclaims_replaced_and_discarded_rows(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.put([_chunk("a_0", "alpha", section_title="서론"), _chunk("a_1", "beta"), _chunk("b_0", "gamma", "b.docx")])
+    store.put([_chunk("a_1", "beta v2")])
+    store.discard(["b_0"])
+    assert store.garbage_ratio() == 0.5
+    
+    assert store.compact() == 2
+    
+    # Live rows keep their ids; the garbage is gone from the files and value tables
+    assert store.get(0) == {"text": "alpha", "metadata": {"chunk_id": "a_0", "source": "doc.docx", "section_title": "서론"}}
+    assert store.text(3) == "beta v2" and store.row_of("a_1") == 3
+    assert store.text(1) == "" and store.row_of("b_0") is None
+    assert os.path.getsize(tmp_path / "text.bin") == len("alphabeta v2")
+    assert store.get_stats()["interned_values"] == 2
+    assert store.compact() == 0
+    
+    reopened = ChunkStore(str(tmp_path))
+    assert len(reopened) == 4 and reopened.get_stats()["live_chunks"] == 2
+    assert reopened.metadata(3) == {"chunk_id": "a_1", "source": "doc.docx"}
+    assert reopened.put([_chunk("b_0", "gamma", "b.docx")]) == [4]
+
+
+def test_interrupted_compaction_is_completed_on_open(tmp_path, monkeypatch):
+    store = ChunkStore(str(tmp_path))
+    store.put([_chunk("a_0", "alpha"), _chunk("a_1", "beta")])
+    store.put([_chunk("a_0", "alpha v2")])
+    
+    # Stop after the journal is written, before any file is swapped in
+    monkeypatch.setattr(ChunkStore, "_finish_compaction", lambda self: None)
+    store.compact()
+    monkeypatch.undo()
+    
+    reopened = ChunkStore(str(tmp_path))
+    assert not (tmp_path / "compaction.json").exists()
+    assert reopened.texts([0, 1, 2]) == ["", "beta", "alpha v2"]
+
+
+def test_readers_keep_a_consistent_snapshot(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.put([_chunk(f"a_{i}", f"text {i}") for i in range(3)])
+    store.put([_chunk("a_0", "replaced")])
+    
+    # Maps a reader picked up before a compaction still read the old files
+    maps = store._maps
+    store.compact()
+    ends = store._array("text_end", maps)
+    assert bytes(store._array("text", maps)[int(ends[0]):int(ends[1])]) == b"text 1"
+    assert store.text(1) == "text 1"
+
+
+def test_stores_sharing_files_stay_in_step(tmp_path):
+    # Two instances on one directory stand in for two worker processes
+    writer = ChunkStore(str(tmp_path))
+    reader = ChunkStore(str(tmp_path))
+    writer.put([_chunk("a_0", "alpha"), _chunk("a_1", "beta")])
+    
+    # A row added elsewhere is picked up when it is read, not an IndexError
+    assert reader.text(1) == "beta"
+    assert reader.row_of("a_1") == 1
+    
+    writer.discard(["a_0"])
+    assert reader.refresh()
+    assert reader.row_of("a_0") is None
+    
+    # Writes catch up first, so rows are never handed out twice
+    assert reader.put([_chunk("a_2", "gamma")]) == [2]
+    assert writer.compact() == 1
+    assert reader.refresh() and not reader.refresh()
+    assert reader.texts([0, 1, 2]) == ["", "beta", "gamma"]
+    assert reader.garbage_ratio() == 0
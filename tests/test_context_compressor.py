@@ -0,0 +1,83 @@
+"""
+Test cases for query-focused context compression
+"""
+from types import SimpleNamespace
+from src.generation.context_compressor import GAP_MARKER, ContextCompressor
+from tests.conftest import FakeEmbeddings, stub_chain
+
+_POLICY = (
+    "본 규정은 전 직원에게 적용됩니다. 규정의 개정은 인사위원회가 의결합니다. "
+    "연차 휴가는 입사 1년 후 15일이 부여됩니다. 미사용 연차는 다음 해로 이월되지 않습니다. "
+    "사내 동호회는 분기별로 지원금을 받습니다. 동호회 신청은 총무팀에 합니다. "
+    "주차장은 오전 7시에 개방됩니다. 방문객 주차는 2시간까지 무료입니다."
+)
+
+
+class _Embeddings(FakeEmbeddings):
+    client = object()
+
+
+class _FailingEmbeddings(_Embeddings):
+    def embed_texts(self, texts, batch_size=100):
+        raise TimeoutError("embeddings timed out")
+
+
+class _RecordingClient:
+    """Chat client that answers immediately and keeps the prompts it was sent"""
+    
+    def __init__(self):
+        self.prompts = []
+        self.chat = self
+        self.completions = self
+    
+    def create(self, **kwargs):
+        self.prompts.append(kwargs["messages"][-1]["content"])
+        message = SimpleNamespace(content="7일 이내에 정산합니다 [문서 1]")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def test_keeps_best_sentences_and_neighbours():
+    compressor = ContextCompressor(sentences=1, neighbors=1, semantic_weight=0)
+    chunk = {"text": _POLICY, "metadata": {"chunk_id": "hr_1", "source": "hr.docx"}}
+    
+    [result] = compressor.compress("미사용 연차 이월 되나요", [chunk])
+    
+    assert result["text"] == (
+        f"{GAP_MARKER} 연차 휴가는 입사 1년 후 15일이 부여됩니다. 미사용 연차는 다음 해로 이월되지 않습니다. "
+        f"사내 동호회는 분기별로 지원금을 받습니다. {GAP_MARKER}"
+    )
+    assert result["metadata"] == chunk["metadata"]
+    assert chunk["text"] == _POLICY
+    assert compressor.get_stats()["ratio"] < 0.6
+
+
+def test_citations_keep_pointing_at_their_chunks():
+    client = _RecordingClient()
+    chain = stub_chain(client, compressor=ContextCompressor(sentences=1, neighbors=0, semantic_weight=0))
+    
+    result = chain.query("출장비 정산 기한은 언제인가요?")
+    
+    prompt = client.prompts[0]
+    assert "[문서 1: travel.docx - 정산]\n출장비는 귀임 후 7일 이내에 정산해야 합니다." in prompt
+    assert "[문서 2: travel.docx - 승인]" in prompt
+    assert "식당" not in prompt
+    assert not result["degraded"]
+
+
+def test_sentence_embeddings_are_cached():
+    embeddings = _Embeddings()
+    compressor = ContextCompressor(embedding_manager=embeddings, sentences=2, neighbors=0, semantic_weight=0.5)
+    chunk = {"text": _POLICY, "metadata": {"chunk_id": "hr_1", "source": "hr.docx"}}
+    
+    first = compressor.compress("연차 휴가 일수", [chunk])
+    second = compressor.compress("연차 휴가 일수", [chunk])
+    
+    assert first == second
+    assert embeddings.calls == 1
+    assert compressor.get_stats()["cache_hits"] == 9
+    
+    # Without embeddings the selection falls back to BM25 alone
+    failing = ContextCompressor(embedding_manager=_FailingEmbeddings(), sentences=1, neighbors=0)
+    [result] = failing.compress("미사용 연차 이월 되나요", [chunk])
+    assert "미사용 연차는 다음 해로 이월되지 않습니다." in result["text"]
+    assert failing.get_stats()["semantic_failures"] == 1
@@ -0,0 +1,184 @@
+"""
+Test cases for per-request deadlines and the extractive fallback answer
+"""
+import threading
+import time
+from types import SimpleNamespace
+import httpx
+import openai
+import pytest
+from config.settings import settings
+from src.retrieval.remote_retriever import DEADLINE_HEADER
+from src.utils import deadline
+from src.utils.admission import AdmissionController
+from src.utils.deadline import DeadlineExceeded
+from tests.conftest import FakeEmbeddings, hold_slot, stub_chain
+
+
+class _TimingOutClient:
+    """Chat client whose completions time out after recording the timeout it was given"""
+    
+    def __init__(self):
+        self.timeouts = []
+        self.chat = self
+        self.completions = self
+    
+    def create(self, **kwargs):
+        self.timeouts.append(kwargs["timeout"])
+        raise openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+
+def test_scope_and_bound():
+    assert deadline.remaining() is None
+    assert deadline.bound(30) == 30
+    
+    with deadline.scope(deadline.after(5)):
+        assert 4 < deadline.remaining() <= 5
+        assert deadline.bound(30) <= 5 and deadline.bound(1) == 1
+        # An enclosing deadline that ends sooner wins
+        with deadline.scope(deadline.after(60)):
+            assert deadline.remaining() <= 5
+    
+    with deadline.scope(time.monotonic() - 1):
+        with pytest.raises(DeadlineExceeded):
+            deadline.bound(30)
+
+
+def test_admission_wait_ends_at_the_deadline():
+    controller = AdmissionController("test", max_concurrency=1, max_wait=10)
+    release = threading.Event()
+    holder = hold_slot(controller, release)
+    try:
+        started = time.monotonic()
+        with deadline.scope(deadline.after(0.1)):
+            with pytest.raises(DeadlineExceeded):
+                controller.call(lambda: None)
+        assert time.monotonic() - started < 2
+    finally:
+        release.set()
+        holder.join()
+
+
+def test_small_budget_skips_generation():
+    client = _TimingOutClient()
+    result = stub_chain(client).query("출장비 정산 기한은 언제인가요?", deadline=deadline.after(0.5))
+    
+    assert client.timeouts == []
+    assert result["degraded"] and result["degraded_reason"] == "deadline"
+    assert "- 출장비는 귀임 후 7일 이내에 정산해야 합니다." in result["answer"]
+    # Only the sentences closest to the question are kept
+    assert "식당" not in result["answer"]
+    assert "[문서 2]" in result["answer"]
+    assert result["confidence"] <= 0.5
+    assert result["sources"][0]["file_name"] == "travel.docx"
+
+
+def test_llm_timeout_returns_extractive_answer(monkeypatch):
+    monkeypatch.setattr(settings, "circuit_breaker_enabled", False)
+    client = _TimingOutClient()
+    result = stub_chain(client).query("출장비 정산 기한은 언제인가요?", deadline=deadline.after(8))
+    
+    # The chat call only gets what is left of the budget
+    assert len(client.timeouts) == 1 and client.timeouts[0] <= 8
+    assert result["degraded"] and result["degraded_reason"] == "timeout"
+    assert result["model"] == "extractive"
+    assert "[문서 1]" in result["answer"]
+
+
+def test_sdk_retries_stay_within_the_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "circuit_breaker_enabled", False)
+    monkeypatch.setattr(settings, "query_min_generation_seconds", 0.1)
+    attempts = []
+    
+    def hang(request):
+        attempts.append(request)
+        time.sleep(0.5)
+        raise httpx.ReadTimeout("timed out", request=request)
+    
+    # A real SDK client that would retry twice with backoff on its own
+    client = openai.OpenAI(
+        api_key="test",
+        http_client=httpx.Client(transport=httpx.MockTransport(hang)),
+        max_retries=2
+    )
+    started = time.monotonic()
+    result = stub_chain(client).query("출장비 정산 기한은 언제인가요?", deadline=deadline.after(1.0))
+    
+    assert time.monotonic() - started < 1.0
+    assert len(attempts) == 1
+    assert result["degraded"] and result["degraded_reason"] == "timeout"
+
+
+class _GatedClient:
+    """Chat client whose first completion blocks until released"""
+    
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+        self.chat = self
+        self.completions = self
+    
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            self.started.set()
+            self.release.wait(5)
+        message = SimpleNamespace(content="출장비는 7일 이내에 정산합니다 [문서 1]")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def test_coalesced_waiter_keeps_its_own_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "query_coalescing_enabled", True)
+    client = _GatedClient()
+    chain = stub_chain(client)
+    question = "출장비 정산 기한은 언제인가요?"
+    results = []
+    
+    leader = threading.Thread(target=lambda: results.append(chain.query(question, deadline=deadline.after(8))))
+    leader.start()
+    assert client.started.wait(2)
+    
+    # Joins the slow in-flight answer, but stops waiting when its own budget runs out
+    begun = time.monotonic()
+    result = chain.query(question, deadline=deadline.after(0.3))
+    assert time.monotonic() - begun < 2
+    assert result["degraded_reason"] == "deadline"
+    assert "[문서 1]" in result["answer"]
+    
+    client.release.set()
+    leader.join()
+    assert not results[0]["degraded"]
+    assert chain._inflight.get_stats()["timed_out"] == 1
+
+
+def test_dense_leg_is_skipped_past_the_deadline(service, monkeypatch):
+    local, remote = service
+    
+    class _SlowEmbeddings(FakeEmbeddings):
+        def embed_texts(self, texts, batch_size=100):
+            deadline.bound(settings.openai_embedding_timeout)
+            return super().embed_texts(texts, batch_size)
+    
+    local.dense_retriever.embedding_manager = _SlowEmbeddings()
+    query = "인사 규정 내용을 자세히 알려주세요"
+    with deadline.scope(time.monotonic() - 1):
+        results = local.search(query, top_k=3)
+    
+    assert results
+    assert all(r["retrieval_method"] == "sparse_fallback" for r in results)
+    
+    # The remote client forwards the remaining budget to the retrieval service
+    sent = []
+    connection = remote.connection
+    monkeypatch.setattr(connection.client, "request", _recording(connection.client.request, sent))
+    with deadline.scope(deadline.after(3)):
+        remote.search("term3", top_k=3)
+    assert 0 < int(sent[0][DEADLINE_HEADER]) <= 3000
+
+
+def _recording(request, sent):
+    def wrapper(*args, **kwargs):
+        sent.append(kwargs.get("headers", {}))
+        return request(*args, **kwargs)
+    return wrapper
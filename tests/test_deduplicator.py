@@ -0,0 +1,114 @@
+"""
+Test cases for ingest-time deduplication
+"""
+from src.core.deduplicator import ChunkDeduplicator, get_source_refs, hand_off_chunks
+from tests.conftest import FakeEmbeddings
+
+POLICY = (
+    "제3조 (근무시간) 직원의 근무시간은 1일 8시간, 1주 40시간을 원칙으로 한다. "
+    "다만 업무상 필요한 경우 근로자와 합의하여 연장할 수 있다. "
+) * 4
+
+
+def _chunk(source: str, text: str) -> dict:
+    return {
+        "text": text,
+        "metadata": {"chunk_id": f"{source}_chunk_0", "source": source, "section_title": "근무"},
+    }
+
+
+def test_exact_and_near_duplicates_collapse():
+    """Revised copies of the same chunk collapse into one with all source refs"""
+    chunks = [
+        _chunk("policy_v1.docx", POLICY),
+        _chunk("policy_v2.docx", POLICY.replace("8시간", "9시간", 1)),
+        _chunk("policy_final.docx", POLICY),
+        _chunk("vacation.docx", "연차 휴가는 입사일 기준으로 부여하며 미사용 연차는 수당으로 지급한다. " * 4),
+    ]
+    
+    result = ChunkDeduplicator(threshold=0.9).deduplicate_chunks(chunks)
+    
+    assert len(result) == 2
+    refs = get_source_refs(result[0]["metadata"])
+    assert [r["source"] for r in refs] == ["policy_v1.docx", "policy_v2.docx", "policy_final.docx"]
+    assert result[0]["metadata"]["duplicate_count"] == 2
+    assert "source_refs" not in result[1]["metadata"]
+
+
+def test_distinct_chunks_are_kept():
+    """Chunks below the similarity threshold are all indexed"""
+    chunks = [_chunk(f"doc{i}.docx", f"문서 {i}번의 고유한 내용입니다. " * (i + 3)) for i in range(5)]
+    assert len(ChunkDeduplicator().deduplicate_chunks(chunks)) == 5
+
+
+def test_identical_documents_dropped():
+    """Documents with the same full text are indexed once"""
+    docs = [
+        {"file_name": "a.docx", "full_text": "같은 내용", "metadata": {}},
+        {"file_name": "a_copy.docx", "full_text": "같은  내용", "metadata": {}},
+        {"file_name": "b.docx", "full_text": "다른 내용", "metadata": {}},
+    ]
+    
+    kept = ChunkDeduplicator().deduplicate_documents(docs)
+    
+    assert [d["file_name"] for d in kept] == ["a.docx", "b.docx"]
+    assert kept[0]["metadata"]["duplicate_files"] == ["a_copy.docx"]
+
+
+def test_dropped_documents_are_kept_as_source_refs():
+    """Chunks of a kept document also cite its identical copies"""
+    deduplicator = ChunkDeduplicator()
+    docs = [
+        {"file_name": "a.docx", "full_text": POLICY, "metadata": {}},
+        {"file_name": "a_copy.docx", "full_text": POLICY, "metadata": {}},
+    ]
+    deduplicator.deduplicate_documents(docs)
+    
+    result = deduplicator.deduplicate_chunks([_chunk("a.docx", POLICY)])
+    
+    refs = get_source_refs(result[0]["metadata"])
+    assert [r["chunk_id"] for r in refs] == ["a.docx_chunk_0", "a_copy.docx_chunk_0"]
+
+
+def test_removed_chunks_are_handed_to_their_other_sources():
+    """Refs of a replaced chunk move to an identical replacement, or the chunk moves to the next file"""
+    [kept] = ChunkDeduplicator(threshold=0.9).deduplicate_chunks([
+        _chunk("policy_v1.docx", POLICY),
+        _chunk("policy_v2.docx", POLICY.replace("8시간", "9시간", 1)),
+    ])
+    
+    [handed] = hand_off_chunks([kept], "policy_v1.docx")
+    assert handed["metadata"]["source"] == "policy_v2.docx"
+    assert handed["metadata"]["chunk_id"] == "policy_v2.docx_chunk_0"
+    assert "source_refs" not in handed["metadata"]
+    
+    replacement = _chunk("policy_v1.docx", POLICY)
+    assert hand_off_chunks([kept], "policy_v1.docx", [replacement]) == []
+    refs = get_source_refs(replacement["metadata"])
+    assert [r["source"] for r in refs] == ["policy_v1.docx", "policy_v2.docx"]
+
+
+def test_document_endpoints_keep_identical_copies_indexed(index_dirs):
+    from src.retrieval.hybrid_retriever import HybridRetriever
+    
+    deduplicator = ChunkDeduplicator()
+    deduplicator.deduplicate_documents([
+        {"file_name": "a.docx", "full_text": POLICY, "metadata": {}},
+        {"file_name": "a_copy.docx", "full_text": POLICY, "metadata": {}},
+    ])
+    retriever = HybridRetriever()
+    retriever.dense_retriever.embedding_manager = FakeEmbeddings()
+    retriever.index_chunks(deduplicator.deduplicate_chunks([_chunk("a.docx", POLICY)]))
+    sparse = retriever.sparse_retriever
+    
+    # Re-uploading the kept copy keeps citing the dropped one
+    retriever.upsert_document("a.docx", [_chunk("a.docx", POLICY)])
+    [chunk] = sparse.source_chunks("a.docx")
+    assert [r["source"] for r in get_source_refs(chunk["metadata"])] == ["a.docx", "a_copy.docx"]
+    
+    # Deleting it leaves the copy searchable on its own
+    retriever.delete_document("a.docx")
+    [chunk] = sparse.source_chunks("a_copy.docx")
+    assert chunk["metadata"]["chunk_id"] == "a_copy.docx_chunk_0"
+    assert retriever.dense_retriever._ids_for_source("a_copy.docx") == ["a_copy.docx_chunk_0"]
+    assert retriever.search("근무시간은 원칙으로", top_k=1)[0]["metadata"]["source"] == "a_copy.docx"
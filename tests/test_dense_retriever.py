@@ -0,0 +1,144 @@
+"""
+Test cases for dense indexing
+"""
+import json
+import sys
+import numpy as np
+import pytest
+from benchmarks import hnsw_sweep
+from benchmarks.hnsw_sweep import cheapest, exact_neighbors, split_queries, sweep, synthetic_embeddings
+from config.settings import settings
+from src.retrieval.dense_retriever import DenseRetriever, _WriteBatchTuner
+from tests.conftest import FakeEmbeddings
+
+
+def _chunks(count: int):
+    return [
+        {
+            "text": f"문서 내용 {i} " * (i % 5 + 1),
+            "metadata": {"chunk_id": f"doc.docx_chunk_{i}", "source": "doc.docx", "section_title": "S"},
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def retriever(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "embedding_batch_size", 40)
+    monkeypatch.setattr(settings, "dense_write_batch_size", 30)
+    dense = DenseRetriever(persist_directory=str(tmp_path / "chroma"))
+    dense.embedding_manager = FakeEmbeddings()
+    return dense
+
+
+def test_pipelined_indexing_writes_every_chunk(retriever):
+    """All chunks are written even when embed and write batch sizes differ"""
+    retriever.index_chunks(_chunks(250))
+    
+    assert retriever.collection.count() == 250
+    assert retriever.embedding_manager.calls == 7
+    assert retriever.write_tuner.throughput is not None
+
+
+def test_reindexing_is_idempotent(retriever):
+    """Rerunning an interrupted index job does not duplicate chunks"""
+    retriever.index_chunks(_chunks(120))
+    retriever.index_chunks(_chunks(150))
+    
+    assert retriever.collection.count() == 150
+
+
+def test_write_batch_tuner_follows_throughput():
+    tuner = _WriteBatchTuner(initial=100, minimum=10, maximum=1000, target_seconds=0.5, adaptive=True)
+    
+    tuner.record(100, 0.05)  # 2000 chunks/s -> 1000 per 0.5s, capped
+    assert tuner.batch_size == 1000
+    
+    for _ in range(20):
+        tuner.record(100, 1.0)  # 100 chunks/s -> 50 per 0.5s
+    assert 45 <= tuner.batch_size <= 60
+
+
+def test_replace_and_delete_by_source(retriever):
+    """Updating one document touches only its chunks and drops its stale ones"""
+    other = [{"text": "다른 문서", "metadata": {"chunk_id": "other.docx_chunk_0", "source": "other.docx"}}]
+    retriever.index_chunks(_chunks(10) + other)
+    
+    retriever.replace_source("doc.docx", _chunks(4))
+    assert retriever.collection.count() == 5
+    
+    assert retriever.delete_by_source("doc.docx") == 4
+    assert retriever.collection.get(include=[])["ids"] == ["other.docx_chunk_0"]
+
+
+def test_hnsw_params_are_set_per_collection(tmp_path, monkeypatch):
+    """Settings give the defaults, a collection may override them, and reopening keeps what it was built with"""
+    monkeypatch.setattr(settings, "hnsw_m", 24)
+    path = str(tmp_path / "chroma")
+    
+    tuned = DenseRetriever(persist_directory=path, collection_name="tuned", hnsw_params={"search_ef": 64})
+    assert tuned.get_stats()["hnsw"] == {"M": 24, "construction_ef": 100, "search_ef": 64}
+    
+    monkeypatch.setattr(settings, "hnsw_m", 8)
+    reopened = DenseRetriever(persist_directory=path, collection_name="tuned")
+    assert reopened.get_stats()["hnsw"]["M"] == 24
+    
+    reopened.reset_collection()
+    assert reopened.get_stats()["hnsw"] == {"M": 8, "construction_ef": 100, "search_ef": 10}
+
+
+def test_collections_from_before_the_chunk_store_are_migrated_on_load(tmp_path):
+    """Chunks stored only in Chroma are copied into the chunk store when the collection is opened"""
+    path = str(tmp_path / "chroma")
+    legacy = DenseRetriever(persist_directory=path, collection_name="legacy")
+    legacy.collection.add(
+        ids=["a_0", "a_1"],
+        embeddings=[[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]],
+        documents=["출장비 정산", "휴가 신청"],
+        metadatas=[{"source": "a.docx"}, {"source": "a.docx"}]
+    )
+    
+    reopened = DenseRetriever(persist_directory=path, collection_name="legacy")
+    reopened.embedding_manager = FakeEmbeddings()
+    
+    assert reopened.chunk_store.get(reopened.chunk_store.row_of("a_1")) == {
+        "text": "휴가 신청",
+        "metadata": {"chunk_id": "a_1", "source": "a.docx"},
+    }
+    assert {result["chunk_id"] for result in reopened.search("질문", top_k=2)} == {"a_0", "a_1"}
+
+
+def test_hnsw_sweep_reports_recall_against_brute_force():
+    base, queries = split_queries(synthetic_embeddings(2000, 16, seed=1), 50)
+    truth = exact_neighbors(base, queries, k=5)
+    
+    # The exact neighbour of a query is its most similar vector
+    normalized = base / np.linalg.norm(base, axis=1, keepdims=True)
+    assert truth[0][0] == int(np.argmax(normalized @ queries[0]))
+    
+    rows = sweep(base, queries, k=5, ms=[8], construction_efs=[50], search_efs=[5, 100], threads=1)
+    assert len(rows) == 2
+    assert rows[1]["recall"] >= rows[0]["recall"]
+    assert rows[1]["recall"] > 0.9
+    assert all(row["index_bytes"] > 0 and row["p99_ms"] >= row["p50_ms"] for row in rows)
+    
+    assert cheapest(rows, target_recall=0.9) in rows
+    assert cheapest(rows, target_recall=1.01) is None
+
+
+def test_hnsw_sweep_reports_the_effective_search_ef(monkeypatch, capsys):
+    """search_ef values below k run as k and are reported once, under the value measured"""
+    monkeypatch.setattr(sys, "argv", [
+        "hnsw_sweep", "--synthetic", "300", "--dim", "8", "--queries", "20", "--k", "5",
+        "--m", "8", "--construction-ef", "32", "--search-ef", "2", "5", "40",
+        "--threads", "1", "--target-recall", "0.5", "--json"
+    ])
+    with pytest.raises(SystemExit) as exit_info:
+        hnsw_sweep.main()
+    
+    assert exit_info.value.code == 0
+    captured = capsys.readouterr()
+    report = json.loads(captured.out)
+    assert [row["search_ef"] for row in report["results"]] == [5, 40]
+    assert report["chosen"]["search_ef"] in (5, 40)
+    assert "below k=5" in captured.err
@@ -0,0 +1,137 @@
+"""
+Test cases for the watch-folder ingestion
+"""
+import json
+import threading
+import time
+import pytest
+from src.core.folder_watcher import FolderWatcher, acquire_owner_lock, watchfiles_available
+
+
+class _Recorder:
+    """apply() callback that records calls and lets tests wait for them"""
+    
+    def __init__(self):
+        self.calls = []
+        self._changed = threading.Condition()
+    
+    def __call__(self, name, exists):
+        with self._changed:
+            self.calls.append((name, exists))
+            self._changed.notify_all()
+    
+    def wait_for(self, count, timeout=10.0):
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.calls) >= count, timeout)
+        return self.calls
+
+
+@pytest.fixture
+def polling_watcher(tmp_path):
+    recorder = _Recorder()
+    watcher = FolderWatcher(str(tmp_path), recorder, debounce=0.3, poll_interval=0.05, force_polling=True)
+    watcher.start()
+    yield watcher, recorder
+    watcher.stop()
+
+
+def test_bursts_are_applied_once(polling_watcher, tmp_path):
+    watcher, recorder = polling_watcher
+    
+    # A document written in several steps, plus files that are not documents
+    for i in range(5):
+        (tmp_path / "규정.docx").write_bytes(b"x" * (i + 1))
+        time.sleep(0.06)
+    (tmp_path / "~$규정.docx").write_bytes(b"lock")
+    (tmp_path / "notes.txt").write_text("memo")
+    
+    assert recorder.wait_for(1) == [("규정.docx", True)]
+    time.sleep(0.5)
+    assert len(recorder.calls) == 1
+    
+    (tmp_path / "규정.docx").unlink()
+    assert recorder.wait_for(2)[-1] == ("규정.docx", False)
+    assert watcher.get_stats()["applied"] == 2
+
+
+def test_batches_are_bounded_and_failures_do_not_stop_the_watcher(tmp_path):
+    applied = _Recorder()
+    
+    def apply(name, exists):
+        if name == "broken.pdf":
+            raise ValueError("cannot parse")
+        applied(name, exists)
+    
+    watcher = FolderWatcher(str(tmp_path), apply, debounce=0.1, max_batch=2, force_polling=True, poll_interval=60)
+    watcher.start()
+    try:
+        watcher.notify(["a.docx", "broken.pdf", "b.docx", "c.docx", "d.pdf"])
+        assert len(applied.wait_for(4)) == 4
+        stats = watcher.get_stats()
+        assert stats["batches"] == 3 and stats["failed"] == 1
+        assert "broken.pdf" in stats["last_error"]
+    finally:
+        watcher.stop()
+
+
+def test_changes_made_while_stopped_are_queued_on_start(tmp_path):
+    folder = tmp_path / "raw"
+    folder.mkdir()
+    for name in ["changed.docx", "same.docx", "new.docx", "indexed.docx"]:
+        (folder / name).write_bytes(b"v1")
+    same = (folder / "same.docx").stat()
+    state_path = tmp_path / "watch_folder.json"
+    state_path.write_text(json.dumps({
+        "changed.docx": [1, 2],
+        "same.docx": [same.st_mtime_ns, same.st_size],
+        "gone.docx": [1, 2],
+    }))
+    indexed = {"same.docx", "indexed.docx", "removed.pdf"}
+    
+    recorder = _Recorder()
+    watcher = FolderWatcher(
+        str(folder), recorder, debounce=0.1, force_polling=True, poll_interval=60,
+        state_path=str(state_path), indexed=lambda: indexed
+    )
+    watcher.start()
+    try:
+        calls = recorder.wait_for(4)
+    finally:
+        watcher.stop()
+    
+    assert sorted(calls) == [
+        ("changed.docx", True), ("gone.docx", False), ("new.docx", True), ("removed.pdf", False)
+    ]
+    assert watcher.get_stats()["reconciled"] == 4
+    assert sorted(json.loads(state_path.read_text())) == ["changed.docx", "indexed.docx", "new.docx", "same.docx"]
+    
+    # Nothing changed since: a restart queues nothing
+    indexed = {"changed.docx", "same.docx", "new.docx", "indexed.docx"}
+    restarted = FolderWatcher(str(folder), recorder, state_path=str(state_path), indexed=lambda: indexed)
+    assert restarted.reconcile() == []
+
+
+@pytest.mark.skipif(not watchfiles_available(), reason="watchfiles is not installed")
+def test_native_events(tmp_path):
+    recorder = _Recorder()
+    watcher = FolderWatcher(str(tmp_path), recorder, debounce=0.2)
+    assert watcher.backend == "watchfiles"
+    watcher.start()
+    try:
+        time.sleep(0.3)
+        (tmp_path / "new.pdf").write_bytes(b"%PDF")
+        assert recorder.wait_for(1) == [("new.pdf", True)]
+    finally:
+        watcher.stop()
+
+
+def test_one_worker_owns_the_folder(tmp_path):
+    lock_path = str(tmp_path / "watch_folder.lock")
+    owner = acquire_owner_lock(lock_path)
+    assert owner is not None
+    assert acquire_owner_lock(lock_path) is None
+    
+    owner.close()
+    successor = acquire_owner_lock(lock_path)
+    assert successor is not None
+    successor.close()
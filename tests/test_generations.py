@@ -0,0 +1,82 @@
+"""
+Test cases for blue/green index generations
+"""
+import pytest
+from src.retrieval.hybrid_retriever import HybridRetriever
+from tests.conftest import FakeEmbeddings
+
+
+def _chunks(word: str, count: int = 12):
+    return [
+        {
+            "text": f"{word} 문서 {i} filler{i}",
+            "metadata": {"chunk_id": f"{word}.docx_chunk_{i}", "source": f"{word}.docx", "section_title": "S"},
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def make_retriever(index_dirs):
+    def make():
+        retriever = HybridRetriever()
+        retriever.dense_retriever.embedding_manager = FakeEmbeddings()
+        return retriever
+    
+    return make
+
+
+def _sources(retriever, query):
+    return {r["metadata"]["source"] for r in retriever.search(query, top_k=20)}
+
+
+def test_rebuild_switches_only_when_complete(make_retriever):
+    retriever = make_retriever()
+    retriever.index_chunks(_chunks("alpha"))
+    
+    assert retriever.rebuild(_chunks("beta")) == 1
+    assert retriever.generation == 1
+    assert _sources(retriever, "beta") == {"beta.docx"}
+    assert retriever.get_stats()["generation"] == {"current": 1, "previous": 0}
+
+
+def test_failed_rebuild_keeps_serving(make_retriever, monkeypatch):
+    retriever = make_retriever()
+    retriever.index_chunks(_chunks("alpha"))
+    
+    def fail(*args, **kwargs):
+        raise RuntimeError("provider down")
+    
+    monkeypatch.setattr(retriever.dense_retriever.embedding_manager, "embed_texts", fail)
+    with pytest.raises(RuntimeError):
+        retriever.rebuild(_chunks("beta"))
+    
+    assert retriever.generation == 0
+    assert retriever.get_stats()["sparse"]["total_chunks"] == 12
+
+
+def test_rollback_and_retention(make_retriever, tmp_path):
+    retriever = make_retriever()
+    retriever.index_chunks(_chunks("alpha"))
+    retriever.rebuild(_chunks("beta"))
+    retriever.rebuild(_chunks("gamma"))
+    
+    # Only the live and the previous generation are kept
+    names = {c.name for c in retriever.dense_retriever.client.list_collections()}
+    assert names == {"documents_g1", "documents_g2"}
+    assert not (tmp_path / "index" / "bm25_index.json").exists()
+    
+    assert retriever.rollback() == 1
+    assert _sources(retriever, "beta") == {"beta.docx"}
+    assert retriever.rollback() == 2
+
+
+def test_other_workers_follow_the_switch(make_retriever):
+    serving = make_retriever()
+    serving.index_chunks(_chunks("alpha"))
+    
+    indexer = make_retriever()
+    indexer.rebuild(_chunks("beta"))
+    
+    assert _sources(serving, "beta") == {"beta.docx"}
+    assert serving.generation == 1
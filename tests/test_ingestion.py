@@ -0,0 +1,126 @@
+"""
+Test cases for checkpointed, resumable ingestion
+"""
+import sys
+import pytest
+from docx import Document
+from fastapi.testclient import TestClient
+from api.main import app
+from api.routers import rag
+from config.settings import settings
+from src.core import ingestion
+from src.retrieval.tenants import TenantRegistry
+from tests.conftest import FakeEmbeddings, NodeStub
+
+client = TestClient(app)
+
+
+class _FlakyEmbeddings(FakeEmbeddings):
+    """Fails on one call, like a provider outage in the middle of a long reindex"""
+    
+    def __init__(self, fail_on_call=None):
+        super().__init__()
+        self.fail_on_call = fail_on_call
+        self.embedded = []
+    
+    def embed_texts(self, texts, batch_size=100):
+        if self.calls + 1 == self.fail_on_call:
+            self.calls += 1
+            raise RuntimeError("provider unavailable")
+        self.embedded.extend(texts)
+        return super().embed_texts(texts, batch_size)
+
+
+@pytest.fixture
+def corpus(index_dirs, monkeypatch):
+    monkeypatch.setattr(settings, "embedding_batch_size", 2)
+    monkeypatch.setattr(settings, "chunk_size", 120)
+    monkeypatch.setattr(settings, "chunk_overlap", 0)
+    
+    (index_dirs / "raw").mkdir()
+    for name, topic in [("travel.docx", "출장"), ("leave.docx", "휴가")]:
+        doc = Document()
+        doc.add_heading(f"{topic} 규정", level=1)
+        for i in range(6):
+            doc.add_paragraph(f"{topic} 규정 제{i}조는 {topic} 절차의 {i}번째 단계를 상세하게 설명합니다. " * 2)
+        doc.save(str(index_dirs / "raw" / name))
+    
+    registry = TenantRegistry()
+    retriever = registry.get(None)
+    retriever.dense_retriever.embedding_manager = _FlakyEmbeddings(fail_on_call=3)
+    monkeypatch.setattr(rag, "get_rag_chain", lambda: NodeStub(registry))
+    return retriever
+
+
+def test_failed_run_resumes_without_reembedding(corpus):
+    embeddings = corpus.dense_retriever.embedding_manager
+    with pytest.raises(RuntimeError):
+        ingestion.run_ingestion(corpus, None, reset_existing=False)
+    
+    progress = ingestion.checkpoint_status(None)
+    assert progress["documents_parsed"] == 2
+    assert progress["chunks_embedded"] == len(embeddings.embedded) == 4
+    assert progress["stages"] == {}
+    
+    result = ingestion.run_ingestion(corpus, None, reset_existing=False)
+    
+    assert result.resumed and result.documents == 2
+    # Every chunk was embedded exactly once across both runs
+    assert len(embeddings.embedded) == len(set(embeddings.embedded)) == result.chunks
+    assert corpus.get_stats()["sparse"]["total_chunks"] == result.chunks
+    assert corpus.search("휴가 절차", top_k=3)
+    assert ingestion.checkpoint_status(None) is None
+
+
+def test_interrupted_rebuild_continues_its_generation(corpus, monkeypatch):
+    embeddings = corpus.dense_retriever.embedding_manager
+    embeddings.fail_on_call = None
+    
+    from src.retrieval.sparse_retriever import SparseRetriever
+    
+    original = SparseRetriever.index_chunks
+    
+    def crash(self, chunks):
+        raise RuntimeError("process killed")
+    
+    monkeypatch.setattr(SparseRetriever, "index_chunks", crash)
+    with pytest.raises(RuntimeError):
+        ingestion.run_ingestion(corpus, None, reset_existing=True)
+    
+    progress = ingestion.checkpoint_status(None)
+    assert list(progress["stages"]) == ["dense"]
+    assert corpus.generation == 0
+    
+    monkeypatch.setattr(SparseRetriever, "index_chunks", original)
+    calls = embeddings.calls
+    result = ingestion.run_ingestion(corpus, None, reset_existing=True)
+    
+    # The dense side of the half-built generation is kept, not rebuilt
+    assert embeddings.calls == calls
+    assert result.generation == progress["generation"] == corpus.generation
+    assert corpus.get_stats()["sparse"]["total_chunks"] == result.chunks
+
+
+def test_reindex_api_and_cli(corpus, monkeypatch, capsys):
+    assert client.get("/api/v1/reindex/checkpoint").status_code == 404
+    
+    response = client.post("/api/v1/reindex", json={"reset_existing": False})
+    assert response.status_code == 500
+    assert "resume" in response.json()["detail"]
+    
+    progress = client.get("/api/v1/reindex/checkpoint").json()
+    assert progress["documents_parsed"] == 2 and progress["chunks_embedded"] == 4
+    assert progress["completed_indexes"] == [] and progress["attempts"] == 1
+    
+    monkeypatch.setattr(sys, "argv", ["ingestion", "--status"])
+    ingestion.main()
+    assert '"documents_parsed": 2' in capsys.readouterr().out
+    
+    # resume=false starts over: every chunk is embedded again
+    embeddings = corpus.dense_retriever.embedding_manager
+    embedded = len(embeddings.embedded)
+    response = client.post("/api/v1/reindex", json={"reset_existing": False, "resume": False})
+    body = response.json()
+    assert response.status_code == 200 and not body["resumed"]
+    assert len(embeddings.embedded) - embedded == body["total_chunks"]
+    assert client.get("/api/v1/reindex/checkpoint").status_code == 404
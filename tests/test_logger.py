@@ -0,0 +1,53 @@
+"""
+Test cases for sampled hot-path logging
+"""
+import pytest
+from loguru import logger
+import src.utils.logger as logger_module
+from src.utils.logger import SampledLogger, _sample_rate
+
+
+@pytest.fixture
+def records():
+    captured = []
+    sink_id = logger.add(lambda message: captured.append(message.record), level="DEBUG")
+    yield captured
+    logger.remove(sink_id)
+
+
+def test_debug_lines_are_sampled(records):
+    log = SampledLogger("tests.hot", rate=0.25)
+    for i in range(8):
+        log.debug("hit {}", i)
+    log.info("always")
+    
+    messages = [r["message"] for r in records if r["name"] == __name__]
+    assert messages == ["hit 0", "hit 4", "always"]
+    assert records[0]["function"] == "test_debug_lines_are_sampled"
+
+
+def test_disabled_debug_skips_formatting(records, monkeypatch):
+    monkeypatch.setattr(logger_module, "_min_level_no", 20)
+    log = SampledLogger("tests.hot", rate=1.0)
+    calls = []
+    
+    class Expensive:
+        def __format__(self, spec):
+            calls.append(1)
+            return "value"
+    
+    log.debug("expensive {}", Expensive())
+    
+    assert calls == []
+    assert not [r for r in records if r["name"] == __name__]
+
+
+def test_sample_rate_prefix_match(monkeypatch):
+    monkeypatch.setattr(
+        logger_module.settings, "log_sample_rates", "src.retrieval=0.1, src.retrieval.dense_retriever=0.01"
+    )
+    monkeypatch.setattr(logger_module.settings, "log_debug_sample_rate", 1.0)
+    
+    assert _sample_rate("src.retrieval.dense_retriever") == 0.01
+    assert _sample_rate("src.retrieval.sparse_retriever") == 0.1
+    assert _sample_rate("src.retrievalx") == 1.0
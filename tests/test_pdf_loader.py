@@ -0,0 +1,110 @@
+"""
+Test cases for streaming PDF loading
+"""
+import pytest
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+from src.core.document_loader import DocumentLoader
+from src.core.pdf_loader import PDFLoader, _page_records
+from src.core.semantic_chunker import SemanticChunker
+
+
+def _page_stream(lines):
+    ops = ["BT", "/F1 12 Tf", "14 TL", "72 720 Td"]
+    for line in lines:
+        ops.append(f"({line}) Tj T*")
+    ops.append("ET")
+    stream = DecodedStreamObject()
+    stream.set_data("\n".join(ops).encode("latin-1"))
+    return stream
+
+
+def _write_pdf(path, pages, outline=()):
+    """pages: list of text lines per page; outline: (title, page, parent index)"""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for lines in pages:
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})
+        })
+        page[NameObject("/Contents")] = writer._add_object(_page_stream(lines))
+    
+    items = []
+    for title, page_number, parent in outline:
+        items.append(writer.add_outline_item(title, page_number, parent=items[parent] if parent is not None else None))
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+@pytest.fixture
+def manual_pdf(tmp_path):
+    pages = [[f"Page {i} first paragraph", f"Page {i} second paragraph"] for i in range(6)]
+    pages[0].insert(0, "Overview")
+    _write_pdf(
+        tmp_path / "manual.pdf",
+        pages,
+        outline=[("Overview", 0, None), ("Installation", 2, None), ("Upgrades", 4, 1)],
+    )
+    return tmp_path / "manual.pdf"
+
+
+def test_outline_becomes_sections(manual_pdf):
+    content = list(PDFLoader(pages_per_task=2).iter_content(str(manual_pdf)))
+    
+    headings = [(p["text"], p["heading_level"], p["page"]) for p in content if p["is_heading"]]
+    assert headings == [("Overview", 1, 1), ("Installation", 1, 3), ("Upgrades", 2, 5)]
+    # The heading line in the page text is not repeated as a paragraph
+    assert [p["text"] for p in content[:2]] == ["Overview", "Page 0 first paragraph\nPage 0 second paragraph"]
+    assert [p["paragraph_index"] for p in content] == list(range(len(content)))
+    assert content[-1]["section"] == "Upgrades"
+
+
+def test_only_the_title_line_above_the_body_is_dropped():
+    text = "Overview\nThe overview lists the steps.\nOverview\n\nNext block"
+    records = _page_records(0, text, [(1, "Overview")])
+    
+    assert records == [
+        (0, 1, "Overview"),
+        (0, 0, "The overview lists the steps.\nOverview"),
+        (0, 0, "Next block"),
+    ]
+
+
+def test_page_count_comes_from_the_outline_pass(manual_pdf, monkeypatch):
+    from src.core import pdf_loader
+    
+    opened = []
+    
+    def counting_reader(path):
+        opened.append(path)
+        return PdfReader(path)
+    
+    monkeypatch.setattr(pdf_loader, "PdfReader", counting_reader)
+    doc = PDFLoader(pages_per_task=100).load_document(str(manual_pdf))
+    
+    assert doc["metadata"]["total_pages"] == 6
+    # One reader for the outline and page count, one for the single page range
+    assert len(opened) == 2
+
+
+def test_parallel_ranges_keep_page_order(manual_pdf):
+    serial = list(PDFLoader(pages_per_task=2, parallel_min_pages=1000).iter_content(str(manual_pdf)))
+    parallel = list(PDFLoader(pages_per_task=2, parallel_min_pages=1, workers=2).iter_content(str(manual_pdf)))
+    
+    assert parallel == serial
+
+
+def test_document_loader_reads_pdf(manual_pdf):
+    docs = DocumentLoader(data_path=str(manual_pdf.parent)).load_all_documents()
+    
+    assert [d["file_name"] for d in docs] == ["manual.pdf"]
+    assert docs[0]["metadata"]["total_pages"] == 6
+    
+    chunks = SemanticChunker(workers=1).chunk_documents(docs)
+    assert {c["metadata"]["section_title"] for c in chunks} == {"Overview", "Installation", "Upgrades"}
+    assert "Page 5 second paragraph" in chunks[-1]["text"]
@@ -0,0 +1,101 @@
+"""
+Test cases for on-demand request profiling
+"""
+import os
+import pstats
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from api.main import app
+from api.routers import rag
+from config.settings import settings
+from src.utils import profiling
+
+client = TestClient(app)
+
+
+def _busy_retrieval(seconds=0.05):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(200))
+    return total
+
+
+@pytest.fixture(autouse=True)
+def no_session():
+    yield
+    profiling.stop()
+
+
+def test_next_requests_are_profiled():
+    session = profiling.start(requests=2, sample_interval=0.001)
+    work = profiling.profiled(_busy_retrieval)
+    threads = [threading.Thread(target=work) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert session.wait(5)
+    assert session.admitted == 2 and session.captured == 2
+    assert session.cpu_seconds > 0
+    assert "_busy_retrieval" in session.pstats_text()
+    assert "test_profiling:_busy_retrieval" in session.collapsed()
+    
+    # Requests after the session are not profiled
+    work()
+    assert session.captured == 2
+
+
+def test_time_window_ends_without_traffic():
+    session = profiling.start(seconds=0.1, deterministic=False, memory=True)
+    assert session.wait(5)
+    assert session.captured == 0
+    assert session.memory_stats["peak_bytes"] >= 0
+    
+    # A finished session makes room for the next one, a running one does not
+    profiling.start(requests=1)
+    with pytest.raises(profiling.ProfilingBusy):
+        profiling.start(requests=1)
+
+
+def test_admin_endpoints_need_the_key(monkeypatch):
+    assert client.get("/admin/v1/profile").status_code == 404
+    
+    monkeypatch.setattr(settings, "admin_api_key", "secret")
+    assert client.get("/admin/v1/profile").status_code == 401
+    assert client.get("/admin/v1/profile", headers={"X-Admin-Key": "wrong"}).status_code == 401
+
+
+def test_profile_live_query(monkeypatch, tmp_path):
+    class _Chain:
+        class tenants:
+            get = staticmethod(lambda tenant: None)
+        
+        def query(self, **kwargs):
+            _busy_retrieval()
+            return {"answer": "답변", "sources": [], "confidence": 0.5, "retrieved_chunks": 0, "model": "test"}
+    
+    monkeypatch.setattr(settings, "admin_api_key", "secret")
+    monkeypatch.setattr(rag, "get_rag_chain", lambda: _Chain())
+    headers = {"X-Admin-Key": "secret"}
+    
+    response = client.post("/admin/v1/profile", json={"requests": 1, "memory": True, "sample_interval_ms": 1}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["pid"] == os.getpid()
+    assert client.post("/admin/v1/profile", json={"requests": 1}, headers=headers).status_code == 409
+    assert client.get("/admin/v1/profile/pstats", headers=headers).status_code == 409
+    
+    assert client.post("/api/v1/query", json={"question": "테스트 질문입니다"}).status_code == 200
+    
+    status = client.get("/admin/v1/profile", headers=headers).json()
+    assert status["finished"] and status["captured"] == 1
+    assert status["memory_stats"]["top_allocations"]
+    
+    profile_path = tmp_path / "profile.pstats"
+    profile_path.write_bytes(client.get("/admin/v1/profile/pstats", headers=headers).content)
+    functions = {name for _, _, name in pstats.Stats(str(profile_path)).stats}
+    assert "_busy_retrieval" in functions
+    assert "_busy_retrieval" in client.get("/admin/v1/profile/collapsed", headers=headers).text
@@ -0,0 +1,71 @@
+"""
+Test cases for adaptive query routing
+"""
+import pytest
+from config.settings import settings
+from src.retrieval.hybrid_retriever import HybridRetriever
+from src.retrieval.query_router import QueryFeatures, QueryRouter
+from tests.conftest import FakeEmbeddings
+
+
+def test_router_decisions():
+    router = QueryRouter(max_terms=4, min_rare_idf=0.6, min_score_gap=1.5)
+    keyword = QueryFeatures(terms=1, known_terms=1, rare_idf_mass=0.9)
+    
+    assert router.route(QueryFeatures(3, 0, 0.0), []).route == QueryRouter.DENSE
+    assert router.route(QueryFeatures(8, 8, 0.9), [(0, 9.0)]).route == QueryRouter.HYBRID
+    assert router.route(QueryFeatures(2, 2, 0.2), [(0, 9.0)]).route == QueryRouter.HYBRID
+    assert router.route(keyword, [(0, 9.0), (1, 3.0)]).route == QueryRouter.SPARSE
+    assert router.route(keyword, [(0, 9.0), (1, 8.0)]).route == QueryRouter.HYBRID
+    assert router.route(keyword, []).route == QueryRouter.HYBRID
+
+
+class _CountingEmbeddings(FakeEmbeddings):
+    def __init__(self):
+        super().__init__()
+        self.queries = 0
+    
+    def embed_text(self, text):
+        self.queries += 1
+        return super().embed_text(text)
+
+
+@pytest.fixture
+def retriever(index_dirs):
+    hybrid = HybridRetriever()
+    hybrid.dense_retriever.embedding_manager = _CountingEmbeddings()
+    hybrid.index_chunks([
+        {
+            "text": f"오류 코드 ERR-{4000 + i} 조치 방법 안내 문서",
+            "metadata": {"chunk_id": f"codes.docx_chunk_{i}", "source": "codes.docx"},
+        }
+        for i in range(20)
+    ])
+    return hybrid
+
+
+def test_keyword_query_skips_embedding(retriever):
+    results = retriever.search("err-4007", top_k=3)
+    
+    assert results[0]["chunk_id"] == "codes.docx_chunk_7"
+    assert results[0]["retrieval_method"] == "sparse"
+    assert retriever.dense_retriever.embedding_manager.queries == 0
+
+
+def test_routing_is_metered(retriever):
+    retriever.search("err-4007")
+    retriever.search("휴가는 며칠까지 쓸 수 있나요")
+    retriever.search("오류 코드 조치 방법")
+    
+    stats = retriever.get_stats()["routing"]
+    assert stats["routes"] == {"sparse": 1, "dense": 1, "hybrid": 1}
+    assert stats["embedding_skip_ratio"] == pytest.approx(1 / 3)
+    assert retriever.dense_retriever.embedding_manager.queries == 2
+
+
+def test_routing_can_be_disabled(retriever, monkeypatch):
+    monkeypatch.setattr(settings, "query_routing_enabled", False)
+    results = retriever.search("err-4007", top_k=3)
+    
+    assert results[0]["retrieval_method"] == "hybrid"
+    assert retriever.dense_retriever.embedding_manager.queries == 1
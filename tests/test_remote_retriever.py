@@ -0,0 +1,67 @@
+"""
+Test cases for the retrieval service and its remote client
+"""
+import pytest
+from fastapi.testclient import TestClient
+from api.main import app
+from config.settings import settings
+from src.retrieval.tenants import UnknownTenantError
+from src.utils.admission import AdmissionRejected
+
+
+def test_remote_search_matches_local(service):
+    local, remote = service
+    queries = ["term3", "인사 규정 내용을 자세히 알려주세요", "연차 휴가 규정 요약 부탁드립니다"]
+    
+    assert remote.search("term3", top_k=3) == local.search("term3", top_k=3)
+    
+    # Dense-routed queries of a batch share one embedding call
+    embeddings = local.dense_retriever.embedding_manager
+    calls = embeddings.calls
+    batch = remote.search_batch(queries, top_k=3)
+    assert embeddings.calls == calls + 1
+    assert batch == [local.search(query, top_k=3) for query in queries]
+    
+    stats = remote.get_stats()
+    assert stats["sparse"]["total_chunks"] == 12
+    assert stats["tenants"]["open"] == ["hr"]
+    assert stats["remote"]["requests"] == 3
+
+
+def test_remote_errors_keep_their_meaning(service, monkeypatch):
+    local, remote = service
+    
+    with pytest.raises(UnknownTenantError):
+        remote.for_tenant("finance").search("term3")
+    
+    def overloaded(*args, **kwargs):
+        raise AdmissionRejected("openai-embeddings: queue is full; try again later", retry_after=3)
+    
+    monkeypatch.setattr(local, "search_batch", overloaded)
+    with pytest.raises(AdmissionRejected) as rejected:
+        remote.search("term3")
+    assert rejected.value.retry_after == 3
+
+
+def test_thin_worker_rejects_index_management(monkeypatch):
+    """A generation worker using a retrieval service holds no indexes to manage or serve"""
+    monkeypatch.setattr(settings, "retrieval_service_url", "http://retrieval:8001")
+    monkeypatch.setattr(settings, "retrieval_service_key", "test-service-key")
+    client = TestClient(app)
+    
+    assert client.post("/api/v1/reindex", json={"reset_existing": True}).status_code == 409
+    assert client.delete("/api/v1/documents/doc.docx").status_code == 409
+    response = client.post("/retrieval/v1/search", json={"query": "테스트"}, headers={"X-Retrieval-Key": "test-service-key"})
+    assert response.status_code == 409
+
+
+def test_service_endpoints_require_the_shared_key(service, monkeypatch):
+    """Only callers with RETRIEVAL_SERVICE_KEY reach the indexes; without a key the service is off"""
+    client = TestClient(app)
+    
+    assert client.post("/retrieval/v1/search", json={"query": "term3"}).status_code == 401
+    wrong = client.post("/retrieval/v1/search", json={"query": "term3"}, headers={"X-Retrieval-Key": "guess"})
+    assert wrong.status_code == 401
+    
+    monkeypatch.setattr(settings, "retrieval_service_key", "")
+    assert client.get("/retrieval/v1/stats").status_code == 404
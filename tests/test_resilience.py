@@ -0,0 +1,90 @@
+"""
+Test cases for circuit breaking and hedged requests
+"""
+import threading
+import time
+import pytest
+from src.utils.resilience import CircuitBreaker, CircuitOpenError, Hedger
+
+
+def _fail():
+    raise ConnectionError("provider down")
+
+
+def test_circuit_opens_and_recovers():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.1)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Fails fast without calling the provider
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: calls.append(1))
+    assert calls == []
+
+    time.sleep(0.15)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_reopens_circuit():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.05)
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail)
+
+    time.sleep(0.1)
+    with pytest.raises(ConnectionError):
+        breaker.call(_fail)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "ok")
+
+
+def test_client_errors_do_not_trip_circuit():
+    breaker = CircuitBreaker(
+        "test",
+        failure_threshold=1,
+        is_failure=lambda e: isinstance(e, ConnectionError)
+    )
+
+    def bad_request():
+        raise ValueError("invalid input")
+
+    with pytest.raises(ValueError):
+        breaker.call(bad_request)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_hedged_backup_wins_over_slow_primary():
+    hedger = Hedger(initial_delay=0.05, min_samples=100)
+    attempts = []
+    lock = threading.Lock()
+
+    def first_call_stalls():
+        with lock:
+            attempts.append(1)
+            attempt = len(attempts)
+        if attempt == 1:
+            time.sleep(1.0)
+        return attempt
+
+    started = time.perf_counter()
+    assert hedger.call(first_call_stalls) == 2
+    assert time.perf_counter() - started < 0.5
+    assert hedger.get_stats()["backup_wins"] == 1
+
+
+def test_fast_calls_are_not_hedged():
+    hedger = Hedger(initial_delay=0.5)
+    assert hedger.call(lambda x: x * 2, 21) == 42
+    assert hedger.get_stats()["hedged"] == 0
+
+
+def test_hedge_delay_tracks_latency_percentile():
+    hedger = Hedger(percentile=0.9, min_samples=10, min_delay=0.0)
+    for latency in [0.01] * 18 + [0.5, 0.6]:
+        hedger._record(latency)
+    assert hedger.delay() == pytest.approx(0.5)
@@ -0,0 +1,59 @@
+"""
+Test cases for the retrieval-only search endpoint
+"""
+import pytest
+from fastapi.testclient import TestClient
+from api.main import app
+from api.routers import rag
+from config.settings import settings
+from src.retrieval.tenants import TenantRegistry
+from tests.conftest import FakeEmbeddings, NodeStub
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def retriever(index_dirs, monkeypatch):
+    registry = TenantRegistry()
+    retriever = registry.get(None)
+    retriever.dense_retriever.embedding_manager = FakeEmbeddings()
+    retriever.index_chunks([
+        {"text": f"출장 규정 {i} 정산 절차 " * (i % 3 + 1), "metadata": {"chunk_id": f"travel_{i}", "source": "travel.docx"}}
+        for i in range(30)
+    ])
+    monkeypatch.setattr(rag, "get_rag_chain", lambda: NodeStub(registry))
+    return retriever
+
+
+def test_pages_follow_the_ranking(retriever):
+    query = "출장 정산 절차는 어떻게 되나요"
+    first = client.post("/api/v1/search", json={"query": query, "top_k": 4}).json()
+    assert len(first["results"]) == 4 and first["next_offset"] == 4
+    
+    second = client.post("/api/v1/search", json={"query": query, "top_k": 4, "offset": 4}).json()
+    ranking = [r["chunk_id"] for r in retriever.search(query, top_k=8, depth=settings.search_max_depth)]
+    assert [r["chunk_id"] for r in first["results"] + second["results"]] == ranking
+    
+    # Past the last candidate there is no next page
+    last = client.post("/api/v1/search", json={"query": query, "top_k": 10, "offset": 50}).json()
+    assert last["next_offset"] is None
+
+
+def test_results_without_text(retriever):
+    response = client.post("/api/v1/search", json={"query": "정산", "top_k": 3, "include_text": False})
+    
+    assert response.status_code == 200
+    result = response.json()["results"][0]
+    assert "text" not in result
+    assert result["chunk_id"].startswith("travel_")
+    assert result["metadata"]["source"] == "travel.docx"
+    assert {"rrf_score", "dense_rank", "sparse_rank", "retrieval_method"} <= result.keys()
+
+
+def test_search_depth_is_bounded(retriever):
+    response = client.post("/api/v1/search", json={"query": "정산", "top_k": 100, "offset": settings.search_max_depth})
+    assert response.status_code == 422
+    
+    # A deeper page is allowed when the request asks for that depth
+    response = client.post("/api/v1/search", json={"query": "정산", "top_k": 5, "offset": 100, "depth": 200})
+    assert response.status_code == 200
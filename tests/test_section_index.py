@@ -0,0 +1,148 @@
+"""
+Test cases for two-stage retrieval with document and section centroids
+"""
+import threading
+import zlib
+import numpy as np
+import pytest
+from config.settings import settings
+from src.retrieval.hybrid_retriever import HybridRetriever
+from src.retrieval.section_index import SectionIndex
+
+
+class _BagOfWordsEmbeddings:
+    """Hashed bag-of-words vectors: texts sharing words are close"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def _embed(self, text):
+        vector = np.zeros(32)
+        for word in text.split():
+            vector[zlib.crc32(word.encode("utf-8")) % 32] += 1.0
+        return vector.tolist()
+    
+    def embed_texts(self, texts, batch_size=100):
+        self.calls += 1
+        return [self._embed(t) for t in texts]
+    
+    def embed_text(self, text):
+        return self.embed_texts([text])[0]
+
+
+TOPICS = {
+    "hr.docx": {"휴가": "연차 휴가 신청 승인", "급여": "급여 지급 월급 계좌"},
+    "it.docx": {"보안": "비밀번호 보안 계정 잠금", "장비": "노트북 장비 지급 반납"},
+    "finance.docx": {"예산": "예산 편성 집행 결산", "출장": "출장비 정산 영수증 제출"},
+}
+
+
+def _chunks():
+    chunks = []
+    for source, sections in TOPICS.items():
+        for title, words in sections.items():
+            for i in range(3):
+                chunks.append({
+                    "text": f"{words} 항목{i}",
+                    "metadata": {
+                        "chunk_id": f"{source}_{title}_{i}",
+                        "source": source,
+                        "section_title": title,
+                    },
+                })
+    # An error code that only appears in one chunk of the IT security section
+    chunks[6]["text"] += " ERR-7731"
+    return chunks
+
+
+def test_sections_select_nearby_and_matching_sections(tmp_path):
+    chunks = _chunks()
+    embeddings = _BagOfWordsEmbeddings()
+    index = SectionIndex(str(tmp_path / "sections"), top_documents=1, top_sections=1)
+    index.build(
+        rows=list(range(len(chunks))),
+        embeddings=np.array(embeddings.embed_texts([c["text"] for c in chunks])),
+        sources=[c["metadata"]["source"] for c in chunks],
+        sections=[c["metadata"]["section_title"] for c in chunks],
+        tokenized=[c["text"].split() for c in chunks]
+    )
+    snapshot = index.current()
+    assert snapshot.chunk_count == 18 and len(snapshot.lengths) == 6
+    
+    query = "출장비 정산"
+    positions = index.select(snapshot, embeddings.embed_text(query), query.split())
+    rows = SectionIndex.rows(snapshot, positions)
+    assert {chunks[row]["metadata"]["section_title"] for row in rows} == {"출장"}
+    
+    hits = SectionIndex.dense_hits(snapshot, embeddings.embed_text(query), positions, k=2)
+    assert len(hits) == 2 and hits[0][1] >= hits[1][1]
+    
+    # The term statistics add the section holding the code, whatever the centroids say
+    positions = index.select(snapshot, embeddings.embed_text(query), ["ERR-7731"])
+    rows = SectionIndex.rows(snapshot, positions)
+    assert 6 in rows and 15 in rows
+    assert index.get_stats()["avg_candidate_fraction"] < 1.0
+    
+    index.invalidate()
+    assert index.current() is None
+
+
+@pytest.fixture
+def hierarchical(index_dirs, monkeypatch):
+    monkeypatch.setattr(settings, "hierarchical_retrieval_enabled", True)
+    monkeypatch.setattr(settings, "hierarchical_min_chunks", 0)
+    monkeypatch.setattr(settings, "hierarchical_top_documents", 1)
+    monkeypatch.setattr(settings, "hierarchical_top_sections", 1)
+    retriever = HybridRetriever()
+    retriever.dense_retriever.embedding_manager = _BagOfWordsEmbeddings()
+    retriever.index_chunks(_chunks())
+    return retriever
+
+
+def test_hybrid_search_runs_inside_selected_sections(hierarchical):
+    results = hierarchical.search("노트북 장비 반납 절차를 알려주세요", top_k=3)
+    
+    assert results
+    assert {r["metadata"]["section_title"] for r in results} == {"장비"}
+    stats = hierarchical.get_stats()["sections"]
+    assert stats["built"] and stats["sections"] == 6
+    assert stats["avg_candidate_fraction"] < 0.5
+
+
+def test_document_updates_rebuild_sections(hierarchical):
+    hierarchical.upsert_document("legal.docx", [
+        {"text": f"계약서 검토 법무 {i}", "metadata": {"chunk_id": f"legal_{i}", "source": "legal.docx", "section_title": "계약"}}
+        for i in range(2)
+    ])
+    assert hierarchical.rebuild_sections()
+    assert hierarchical.get_stats()["sections"]["sections"] == 7
+    assert hierarchical.search("계약서 법무 검토 요청 방법", top_k=1)[0]["metadata"]["source"] == "legal.docx"
+    
+    hierarchical.delete_document("legal.docx")
+    assert hierarchical.rebuild_sections()
+    assert hierarchical.get_stats()["sections"]["sections"] == 6
+
+
+def test_document_updates_leave_the_rebuild_to_the_background(hierarchical, monkeypatch):
+    readers = []
+    dense = hierarchical.dense_retriever
+    iter_embeddings = dense.iter_embeddings
+    
+    def recording(*args, **kwargs):
+        readers.append(threading.current_thread())
+        return iter_embeddings(*args, **kwargs)
+    
+    monkeypatch.setattr(dense, "iter_embeddings", recording)
+    hierarchical.delete_document("hr.docx")
+    assert threading.current_thread() not in readers
+
+
+def test_small_corpus_skips_the_section_index(index_dirs, monkeypatch):
+    monkeypatch.setattr(settings, "hierarchical_retrieval_enabled", True)
+    monkeypatch.setattr(settings, "hierarchical_min_chunks", 100)
+    retriever = HybridRetriever()
+    retriever.dense_retriever.embedding_manager = _BagOfWordsEmbeddings()
+    retriever.index_chunks(_chunks())
+    
+    assert not retriever.get_stats()["sections"]["built"]
+    assert retriever.search("노트북 장비 반납", top_k=1)[0]["metadata"]["source"] == "it.docx"
@@ -0,0 +1,86 @@
+"""
+Test cases for single-flight request coalescing
+"""
+import threading
+import time
+import pytest
+from src.utils.singleflight import SingleFlight, WaitTimeout
+
+
+def test_concurrent_calls_share_one_execution():
+    """Concurrent callers with the same key run the function once"""
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return {"answer": "ok"}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("q", slow)))
+    leader.start()
+    started.wait()
+
+    followers = [
+        threading.Thread(target=lambda: results.append(flight.do("q", slow)))
+        for _ in range(5)
+    ]
+    for t in followers:
+        t.start()
+    for t in [leader] + followers:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{"answer": "ok"}] * 6
+    assert flight.get_stats()["coalesced"] == 5
+    assert flight.in_flight() == 0
+
+
+def test_completed_calls_are_not_cached():
+    """A new call after completion runs the function again"""
+    flight = SingleFlight()
+    counter = iter(range(10))
+
+    assert flight.do("q", lambda: next(counter)) == 0
+    assert flight.do("q", lambda: next(counter)) == 1
+
+
+def test_errors_propagate_to_caller():
+    """Exceptions raised by the function reach the caller"""
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("provider down")
+
+    with pytest.raises(ValueError):
+        flight.do("q", fail)
+    assert flight.in_flight() == 0
+
+
+def test_waiter_gives_up_after_its_timeout():
+    """A waiter stops waiting at its timeout while the shared call keeps running"""
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    leader = threading.Thread(target=lambda: results.append(flight.do("q", slow)))
+    leader.start()
+    started.wait()
+
+    begun = time.monotonic()
+    with pytest.raises(WaitTimeout):
+        flight.do("q", slow, timeout=0.1)
+    assert time.monotonic() - begun < 1
+
+    release.set()
+    leader.join()
+    assert results == ["done"]
+    assert flight.get_stats()["timed_out"] == 1
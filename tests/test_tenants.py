@@ -0,0 +1,108 @@
+"""
+Test cases for tenant-scoped corpora and LRU unloading of sparse indexes
+"""
+import threading
+import pytest
+from src.retrieval.tenants import (
+    InvalidTenantError, TenantRegistry, UnknownTenantError, tenant_paths, validate_tenant
+)
+from tests.conftest import FakeEmbeddings
+
+
+class _FakeRetriever:
+    def __init__(self, nbytes: int):
+        self.nbytes = nbytes
+        self.loaded = True
+    
+    def sparse_memory_bytes(self):
+        return self.nbytes if self.loaded else 0
+    
+    def unload_sparse(self):
+        was_loaded, self.loaded = self.loaded, False
+        return was_loaded
+
+
+@pytest.fixture
+def tenant_dirs(index_dirs):
+    for tenant in ("hr", "legal", "sales"):
+        (index_dirs / "data" / tenant).mkdir(parents=True)
+    return index_dirs
+
+
+def test_tenant_ids_are_validated():
+    assert validate_tenant(None) == "default"
+    for bad in ("../etc", "HR", "", "a" * 40, "hr-"):
+        with pytest.raises(InvalidTenantError):
+            validate_tenant(bad)
+
+
+def test_unknown_tenant(tenant_dirs):
+    registry = TenantRegistry(factory=lambda paths: _FakeRetriever(1))
+    with pytest.raises(UnknownTenantError):
+        registry.get("finance")
+
+
+def test_least_recently_used_tenant_is_unloaded(tenant_dirs):
+    registry = TenantRegistry(budget_bytes=250, factory=lambda paths: _FakeRetriever(100))
+    hr, legal, sales = registry.get("hr"), registry.get("legal"), registry.get("sales")
+    registry.get("hr")  # hr is now the most recently used
+    
+    assert registry.enforce_budget(keep="hr") == 1
+    assert not legal.loaded
+    assert hr.loaded and sales.loaded
+    assert registry.get_stats()["sparse_loaded"] == ["sales", "hr"]
+
+
+def test_unloaded_index_reloads_on_search(tenant_dirs):
+    registry = TenantRegistry(budget_bytes=1)
+    
+    for tenant in ("hr", "legal"):
+        retriever = registry.get(tenant)
+        retriever.dense_retriever.embedding_manager = FakeEmbeddings()
+        retriever.index_chunks([
+            {"text": f"{tenant} 규정 {i} term{i}", "metadata": {"chunk_id": f"{tenant}_{i}", "source": f"{tenant}.docx"}}
+            for i in range(12)
+        ])
+    
+    assert tenant_paths("hr").collection_prefix == "tenant_hr"
+    registry.enforce_budget(keep="legal")
+    assert registry.get("hr").sparse_memory_bytes() == 0
+    assert registry.get("legal").sparse_memory_bytes() > 0
+    
+    # Tenants only see their own corpus, and the unloaded index comes back from disk
+    results = registry.get("hr").search("term3", top_k=3)
+    assert results[0]["chunk_id"] == "hr_3"
+    assert registry.get("hr").sparse_memory_bytes() > 0
+
+
+def test_unload_waits_for_searches_in_progress(tenant_dirs):
+    registry = TenantRegistry(budget_bytes=1)
+    retriever = registry.get("hr")
+    retriever.dense_retriever.embedding_manager = FakeEmbeddings()
+    retriever.index_chunks([
+        {"text": f"규정 {i} term{i}", "metadata": {"chunk_id": f"hr_{i}", "source": "hr.docx"}}
+        for i in range(12)
+    ])
+    sparse = retriever.sparse_retriever
+    index = sparse.index
+    
+    # Hold a search inside the index while another tenant's request unloads it
+    searching, unloaded = threading.Event(), threading.Event()
+    search = index.search
+    
+    def held_search(terms, k):
+        searching.set()
+        assert unloaded.wait(5)
+        return search(terms, k)
+    
+    index.search = held_search
+    results = []
+    thread = threading.Thread(target=lambda: results.extend(sparse.search_ids("term3", top_k=3)))
+    thread.start()
+    assert searching.wait(5)
+    assert registry.enforce_budget(keep="legal") == 1
+    unloaded.set()
+    thread.join()
+    
+    assert results and sparse.chunk_store.chunk_id(results[0][0]) == "hr_3"
+    assert index._closed
@@ -0,0 +1,100 @@
+"""
+Test cases for the boundary-aware text splitter and semantic chunker
+"""
+import pytest
+from src.core import text_splitter
+from src.core.text_splitter import TextSplitter, split_sentences
+from src.core.semantic_chunker import SemanticChunker
+
+
+def _make_document(name: str, paragraphs: int) -> dict:
+    content = [{"text": "개요", "is_heading": True}]
+    content += [
+        {"text": f"제{i}조. 이 조항은 테스트 문장입니다. 직원은 규정을 준수해야 한다.", "is_heading": False}
+        for i in range(paragraphs)
+    ]
+    return {"file_name": name, "file_path": f"/data/{name}", "content": content}
+
+
+def test_split_sentences_keeps_separators():
+    """Units concatenate back to the original text"""
+    text = "첫 문장입니다. 두 번째 문장! 세 번째?\n새 문단"
+    units = split_sentences(text)
+    assert "".join(units) == text
+    assert len(units) == 4
+
+
+@pytest.mark.parametrize("unit", ["chars", "tokens"])
+def test_chunks_respect_size_limit(unit):
+    """Every chunk fits within chunk_size in the configured unit"""
+    splitter = TextSplitter(chunk_size=120, chunk_overlap=20, length_unit=unit)
+    text = " ".join(f"문장 번호 {i} 입니다." for i in range(200))
+    
+    chunks = splitter.split_text(text)
+    
+    assert len(chunks) > 1
+    assert all(splitter.length_function(c) <= 120 for c in chunks)
+
+
+def test_consecutive_chunks_overlap():
+    """The tail of one chunk is repeated at the head of the next"""
+    splitter = TextSplitter(chunk_size=60, chunk_overlap=25)
+    text = " ".join(f"Sentence {i}." for i in range(30))
+    
+    chunks = splitter.split_text(text)
+    last_sentence = chunks[0].rsplit(". ", 1)[-1]
+    
+    assert last_sentence in chunks[1]
+
+
+def test_oversized_words_are_hard_split():
+    """A single word longer than chunk_size is sliced"""
+    splitter = TextSplitter(chunk_size=10, chunk_overlap=0)
+    assert splitter.split_text("a" * 25) == ["a" * 10, "a" * 10, "a" * 5]
+
+
+class _ThreeTokensPerCharacter:
+    """Stand-in for a byte-level BPE where every Hangul syllable costs 3 tokens"""
+    
+    def encode_ordinary(self, text):
+        return [0] * (3 * len(text))
+    
+    def encode_ordinary_batch(self, texts):
+        return [self.encode_ordinary(t) for t in texts]
+
+
+def test_oversized_words_fit_when_characters_cost_several_tokens(monkeypatch):
+    """Hard-split slices are measured in tokens, not cut at chunk_size characters"""
+    monkeypatch.setattr(text_splitter, "_get_encoding", lambda: _ThreeTokensPerCharacter())
+    splitter = TextSplitter(chunk_size=10, chunk_overlap=2, length_unit="tokens")
+    word = "가나다라마바사아자차카타파하" * 3
+    chunks = splitter.split_text(word)
+    
+    assert "".join(chunks) == word
+    assert all(splitter.length_function(chunk) <= 10 for chunk in chunks)
+    assert max(len(chunk) for chunk in chunks) == 3
+
+
+def test_invalid_overlap_rejected():
+    with pytest.raises(ValueError):
+        TextSplitter(chunk_size=10, chunk_overlap=10)
+
+
+def test_parallel_chunking_matches_serial():
+    """Chunking in worker processes gives the same chunks in the same order"""
+    docs = [_make_document(f"doc{i}.docx", 80) for i in range(3)]
+    
+    serial = SemanticChunker(chunk_size=300, chunk_overlap=50, workers=1).chunk_documents(docs)
+    parallel = SemanticChunker(chunk_size=300, chunk_overlap=50, workers=3, parallel_min_chars=0).chunk_documents(docs)
+    
+    assert serial == parallel
+    assert serial[0]["metadata"]["chunk_id"] == "doc0.docx_chunk_0"
+    assert serial[0]["metadata"]["section_title"] == "개요"
+
+
+def test_small_batches_skip_the_process_pool():
+    """A single changed document is chunked in process, whatever CHUNK_WORKERS says"""
+    docs = [_make_document(f"doc{i}.docx", 80) for i in range(3)]
+    
+    assert SemanticChunker(workers=0, parallel_min_chars=10 ** 6)._resolve_workers(docs) == 1
+    assert SemanticChunker(workers=2, parallel_min_chars=100)._resolve_workers(docs) == 2